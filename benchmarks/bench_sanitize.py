@@ -0,0 +1,46 @@
+"""
+Microbenchmark of the LogEntry text sanitizers on a 10 MB input.
+
+Compares the per-character generator used before pyOlog.sanitize with
+the precompiled policies. Run from the repository root:
+
+    python benchmarks/bench_sanitize.py
+"""
+import string
+import timeit
+
+from pyOlog import sanitize
+
+SIZE = 10 * 1024 * 1024
+
+
+def generator_filter(text):
+    """The filter LogEntry used before pyOlog.sanitize"""
+    return ''.join(c for c in text if c in string.printable)
+
+
+def make_text(size):
+    line = (u'Scan 1234 motor th=12.345 det=0.998 µA\t'
+            u'temperature 21.5°C \x07done\n')
+    return (line * (size // len(line) + 1))[:size]
+
+
+def main():
+    text = make_text(SIZE)
+    cases = [('generator (old)', generator_filter),
+             ('ascii', sanitize.ascii_strict),
+             ('unicode', sanitize.unicode_preserving),
+             ('control', sanitize.strip_control)]
+
+    baseline = None
+    print('{:<16} {:>10} {:>10}'.format('policy', 'seconds', 'speedup'))
+    for name, func in cases:
+        seconds = min(timeit.repeat(lambda: func(text), number=1, repeat=3))
+        if baseline is None:
+            baseline = seconds
+        print('{:<16} {:>10.4f} {:>9.1f}x'.format(name, seconds,
+                                                  baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
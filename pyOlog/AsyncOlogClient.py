@@ -0,0 +1,300 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+asyncio client for the Olog. It mirrors the OlogClient interface with
+coroutines sharing a single aiohttp connection pool.
+'''
+from __future__ import (print_function, absolute_import)
+import asyncio
+import logging
+import json
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+    have_aiohttp = False
+else:
+    have_aiohttp = True
+
+from .OlogDataTypes import Property, Attachment
+from .OlogClient import (OlogClient, _get_auth, LogEntryEncoder,
+                         LogEntryDecoder, LogbookEncoder, LogbookDecoder,
+                         TagEncoder, TagDecoder, PropertyEncoder,
+                         PropertyDecoder)
+from .conf import _conf
+from .interning import InternTable
+
+
+class AsyncOlogClient(object):
+    json_header = OlogClient.json_header
+    logs_resource = OlogClient.logs_resource
+    properties_resource = OlogClient.properties_resource
+    tags_resource = OlogClient.tags_resource
+    logbooks_resource = OlogClient.logbooks_resource
+    attachments_resource = OlogClient.attachments_resource
+
+    def __init__(self, url=None, username=None, password=None, ask=True,
+                 old_olog_api=None, limit=100, timeouts=None):
+        '''
+        Initialize AsyncOlogClient
+
+        :param url: The base URL of the Olog glassfish server.
+        :param username: The username for authentication.
+        :param password: The password for authentication.
+        :param old_olog_api: Use the old olog api.
+        :param limit: Maximum number of simultaneous connections.
+        :param timeouts: dict of the (connect, read) timeouts in seconds
+        for the operations 'get', 'put', 'post', 'delete' and 'upload',
+        read from the config file as for OlogClient.
+
+        The parameters are resolved from the config file in the same way
+        as for OlogClient. The connection pool is created on the first
+        request, in the running event loop, and shared by all requests
+        until :func close: is awaited. The client can also be used as an
+        async context manager:
+
+        >>> async with AsyncOlogClient() as client:
+        ...     entries = await client.find(tag='magnets')
+        '''
+        if aiohttp is None:
+            raise ImportError("AsyncOlogClient requires the aiohttp module")
+
+        self._url = _conf.get_value('url', url)
+        username = _conf.get_username(username)
+        password = _conf.get_value('password', password)
+        self._old_olog_api = _conf.get_value('old_olog_api', old_olog_api)
+        self._old_olog_api = (self._old_olog_api == True
+                              or self._old_olog_api == 'True'
+                              or self._old_olog_api == 'true')
+
+        logger.info("Using base URL %s", self._url)
+        _auth = _get_auth(username, password, ask)
+        self._auth = aiohttp.BasicAuth(*_auth) if _auth else None
+        self._limit = limit
+        self.timeouts = dict()
+        for op, default in OlogClient.default_timeouts.items():
+            value = None
+            if timeouts is not None:
+                value = timeouts.get(op)
+            self.timeouts[op] = _conf.get_timeout(op + '_timeout', value,
+                                                  default)
+        self._session = None
+        self._interner = InternTable(OlogClient.intern_size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        '''Close the connection pool'''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._limit, ssl=False)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  auth=self._auth)
+        return self._session
+
+    async def _request(self, method, url, json=True, raw=False, op=None,
+                       **kwargs):
+        """Do an http request and return the decoded body
+
+        :param op: Operation whose timeouts are used, by default the
+        lower case method.
+        """
+        logger.debug("HTTP %s to %s", method, self._url + url)
+        if json:
+            kwargs.update({'headers': self.json_header})
+        timeout = self.timeouts[op or method.lower()]
+        kwargs['timeout'] = _client_timeout(timeout)
+        async with self._get_session().request(method, self._url + url,
+                                               **kwargs) as resp:
+            resp.raise_for_status()
+            if raw:
+                return await resp.read()
+            if resp.content_length == 0:
+                return None
+            return await resp.json(content_type=None)
+
+    async def _get(self, url, **kwargs):
+        return await self._request('GET', url, **kwargs)
+
+    async def _put(self, url, **kwargs):
+        return await self._request('PUT', url, **kwargs)
+
+    async def _post(self, url, **kwargs):
+        return await self._request('POST', url, **kwargs)
+
+    async def _delete(self, url, **kwargs):
+        return await self._request('DELETE', url, **kwargs)
+
+    async def log(self, log_entry):
+        '''
+        Create a log entry
+        :param log_entry: An instance of LogEntry to add to the Olog
+        :returns: The id of the log entry
+        '''
+        resp = await self._post(self.logs_resource,
+                                data=LogEntryEncoder().encode(log_entry))
+        if not self._old_olog_api:
+            resp = resp['log']
+        id = resp[0]['id']
+
+        await self._post_attachments(id, log_entry.attachments)
+        return id
+
+    async def updateLog(self, logId, log_entry):
+        '''
+        Update a log entry
+
+        :param logId: The id of the log to be updated/modified
+        :param log_entry: An instance of the modified version of the LogEntry
+        '''
+        url = "{0}/{1}".format(self.logs_resource, str(logId))
+        data = json.dumps(LogEntryEncoder().default(log_entry)[0])
+        await self._post(url, data=data)
+        await self._post_attachments(logId, log_entry.attachments)
+
+    async def _post_attachments(self, id, attachments):
+        """Upload the attachments of a log entry concurrently"""
+        url = "{0}/{1}".format(self.attachments_resource, id)
+
+        async def post(attachment):
+            filename, f, mime_type = attachment.get_file_post()
+            data = aiohttp.FormData()
+            data.add_field('file', f, filename=filename,
+                           content_type=mime_type)
+            await self._post(url, json=False, op='upload', data=data)
+
+        await asyncio.gather(*[post(a) for a in attachments])
+
+    async def createLogbook(self, logbook):
+        '''
+        Create a Logbook
+        :param logbook: An instance of Logbook to create in the Olog.
+        '''
+        url = "/".join((self.logbooks_resource, logbook.name))
+        await self._put(url, data=LogbookEncoder().encode(logbook))
+
+    async def createTag(self, tag):
+        '''
+        Create a Tag
+        :param tag: An instance of Tag to create in the Olog.
+        '''
+        url = "/".join((self.tags_resource, tag.name))
+        await self._put(url, data=TagEncoder().encode(tag))
+
+    async def createProperty(self, property):
+        '''
+        Create a Property
+        :param property: An instance of Property to create in the Olog.
+        '''
+        url = "/".join((self.properties_resource, property.name))
+        await self._put(url, data=PropertyEncoder().encode(property))
+
+    async def find(self, **kwds):
+        '''
+        Search for logEntries based on one or many search criteria
+
+        See OlogClient.find for the search criteria.
+        '''
+        params = OrderedDict((k, str(v)) for k, v in kwds.items())
+        resp = await self._get(self.logs_resource, params=params)
+        decoder = LogEntryDecoder(self._interner)
+        return [decoder.dictToLogEntry(json_log_entry)
+                for json_log_entry in resp]
+
+    async def list_attachments(self, log_entry_id):
+        '''
+        Search for attachments on a logentry
+        :param log_entry_id: The ID of the log entry to list the attachments.
+
+        The attachments are downloaded concurrently.
+        '''
+        url = "{0}/{1}".format(self.attachments_resource, log_entry_id)
+        resp = await self._get(url)
+        filenames = [a['filename'] for a in resp['attachment']]
+
+        async def get(filename):
+            url = "{0}/{1}/{2}".format(self.attachments_resource,
+                                       log_entry_id, filename)
+            return Attachment(file=await self._get(url, raw=True),
+                              filename=filename)
+
+        return list(await asyncio.gather(*[get(f) for f in filenames]))
+
+    async def list_tags(self):
+        '''
+        List all tags in the Olog.
+        '''
+        resp = await self._get(self.tags_resource)
+        return [TagDecoder().dictToTag(t) for t in resp['tag']]
+
+    async def list_logbooks(self):
+        '''
+        List all logbooks in the Olog.
+        '''
+        resp = await self._get(self.logbooks_resource)
+        return [LogbookDecoder().dictToLogbook(l) for l in resp['logbook']]
+
+    async def list_properties(self):
+        '''
+        List all Properties and their attributes in the Olog.
+        '''
+        resp = await self._get(self.properties_resource)
+        return [PropertyDecoder().dictToProperty(p)
+                for p in resp['property']]
+
+    async def delete(self, **kwds):
+        '''
+        Method to delete a logEntry, logbook, property, tag.
+
+        See OlogClient.delete for the keywords.
+        '''
+        if len(kwds) != 1:
+            raise ValueError('Can only delete a single Logbook/tag/property')
+
+        if 'logbookName' in kwds:
+            url = "/".join((self.logbooks_resource,
+                           kwds['logbookName'].strip()))
+            await self._delete(url)
+
+        elif 'tagName' in kwds:
+            url = "/".join((self.tags_resource,
+                           kwds['tagName'].strip()))
+            await self._delete(url)
+
+        elif 'propertyName' in kwds:
+            url = "/".join((self.properties_resource,
+                           kwds['propertyName'].strip()))
+            data = PropertyEncoder().encode(Property(
+                kwds['propertyName'].strip()))
+            await self._delete(url, data=data)
+
+        elif 'logEntryId' in kwds:
+            url = "/".join((self.logs_resource,
+                           str(kwds['logEntryId'])))
+            await self._delete(url)
+
+        else:
+            raise ValueError('Unknown Key')
+
+
+def _client_timeout(timeout):
+    """aiohttp timeout from a requests style timeout, a number of seconds
+    or a (connect, read) tuple"""
+    if isinstance(timeout, (tuple, list)):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
@@ -10,41 +10,134 @@ import logging
 logger = logging.getLogger(__name__)
 
 KEYRING_NAME = 'olog'
-try:
-    import keyring
-except ImportError:
-    keyring = None
-    logger.warning("No keyring module found")
-    have_keyring = False
-else:
-    have_keyring = True
+
+
+def _import_keyring():
+    """Import keyring when a password is needed, it is slow to import"""
+    try:
+        import keyring
+    except ImportError:
+        logger.warning("No keyring module found")
+        return None
+    return keyring
 
 from getpass import getpass
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.packages import urllib3
 # Disable warning for non verified HTTPS requests
 urllib3.disable_warnings()
 
 from json import JSONEncoder, JSONDecoder
 from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import closing
+from functools import partial
+import threading
+from six.moves import queue
+from six.moves.urllib.parse import urlencode
 import json
+import os
+import re
+import time
+import uuid
 
-from .OlogDataTypes import LogEntry, Logbook, Tag, Property, Attachment
+from .OlogDataTypes import (LogEntry, Logbook, Tag, Property, Attachment,
+                            LazyAttachment, StreamingAttachment)
 from .conf import _conf
-
+from .vocabulary import VocabularyCache
+from .retry import RetryPolicy
+from .interning import InternTable
+from .httpcache import HttpCache
+from .compression import get_compressor
+
+
+class AttachmentUploadError(Exception):
+    """Raised when attachments of a log entry could not be uploaded
+
+    :ivar log_id: The id of the log entry.
+    :ivar failures: List of (Attachment, exception) for each failed upload.
+    """
+    def __init__(self, log_id, failures):
+        self.log_id = log_id
+        self.failures = failures
+        names = ', '.join('{} ({})'.format(
+            a.filename or getattr(a.file, 'name', '<data>'), e)
+            for a, e in failures)
+        super(AttachmentUploadError, self).__init__(
+            'Failed to upload {} attachment(s) to log entry {}: {}'
+            .format(len(failures), log_id, names))
+
+
+class LogManyError(Exception):
+    """Raised when log_many stops before all the log entries are created
+
+    :ivar ids: The ids of the log entries created before the failure, in
+               the order they were given, None for the ones spooled. Not
+               all the attachments of the last ones may be uploaded.
+    :ivar error: The exception which stopped log_many.
+    """
+    def __init__(self, ids, error):
+        self.ids = ids
+        self.error = error
+        super(LogManyError, self).__init__(
+            'Created {} log entries before failing: {}'
+            .format(len(ids), error))
+
+
+class _PoolAdapter(HTTPAdapter):
+    """HTTPAdapter counting the requests made through its connection pool"""
+
+    def __init__(self, pool_connections, pool_maxsize, pool_block):
+        self._stats_lock = threading.Lock()
+        self.in_use = 0
+        self.max_in_use = 0
+        self.requests = 0
+        self.waits = 0
+        super(_PoolAdapter, self).__init__(pool_connections=pool_connections,
+                                           pool_maxsize=pool_maxsize,
+                                           pool_block=pool_block)
+
+    def send(self, request, **kwargs):
+        with self._stats_lock:
+            if self.in_use >= self._pool_maxsize:
+                # Waits for a connection if the pool blocks, otherwise
+                # opens one which is discarded after the request.
+                self.waits += 1
+            self.in_use += 1
+            self.requests += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+        try:
+            return super(_PoolAdapter, self).send(request, **kwargs)
+        finally:
+            with self._stats_lock:
+                self.in_use -= 1
 
 
 class OlogClient(object):
     json_header = {'content-type': 'application/json',
                    'accept': 'application/json'}
+    default_timeouts = {'get': (4.2, 30),
+                        'put': (4.2, 30),
+                        'post': (4.2, 30),
+                        'delete': (4.2, 30),
+                        'upload': (4.2, 30)}
     logs_resource = '/resources/logs'
     properties_resource = '/resources/properties'
     tags_resource = '/resources/tags'
     logbooks_resource = '/resources/logbooks'
     attachments_resource = '/resources/attachments'
-
-    def __init__(self, url=None, username=None, password=None, ask=True, old_olog_api=None):
+    # Maximum number of shared logbooks and of shared tags
+    intern_size = 4096
+
+    def __init__(self, url=None, username=None, password=None, ask=True, old_olog_api=None,
+                 vocabulary_ttl=None, spool=None, defer=None,
+                 upload_workers=None, pool_connections=None,
+                 pool_maxsize=None, pool_block=None, keep_alive=None,
+                 timeouts=None, retry=None, http_cache=None, compress=None,
+                 compress_threshold=None, attachment_cache=None,
+                 cache_find=None):
         '''
         Initialize OlogClient and configure session
         :param url: The base URL of the Olog glassfish server.
@@ -59,6 +152,65 @@ class OlogClient(object):
         If :param old_olog_api: is None, then it will be read from the
         config file. Set to the string "True" or "true" in the config 
         file, any other values will be interpreted as False.
+        :param vocabulary_ttl: Seconds to cache the logbook, tag and
+        property names. If None, it will be read from the config file
+        (default 60). Set to 0 to disable the cache.
+        :param spool: Directory of a spool where log entries that cannot
+        be sent to the Olog are kept and replayed in the background. If
+        None, it will be read from the config file. Without a spool,
+        failures are raised from :func log:.
+        :param defer: If True, every log entry is written to the spool and
+        sent by the background flusher so that :func log: never waits
+        on the Olog. If None, it will be read from the config file.
+        :param upload_workers: Number of attachments uploaded in parallel.
+        If None, it will be read from the config file (default 4).
+        :param pool_connections: Number of hosts connection pools are kept
+        for. If None, it will be read from the config file (default 10).
+        :param pool_maxsize: Maximum number of connections kept per host.
+        If None, it will be read from the config file (default 10).
+        :param pool_block: If True, requests wait for a free connection
+        when all :param pool_maxsize: are in use, otherwise an extra
+        connection is opened and closed after the request. If None, it
+        will be read from the config file (default False).
+        :param keep_alive: If False, connections are closed after every
+        request. If None, it will be read from the config file
+        (default True).
+        :param timeouts: dict of the (connect, read) timeouts in seconds
+        for the operations 'get', 'put', 'post', 'delete' and 'upload'
+        (attachment uploads). Operations which are not given are read
+        from the config file as '<operation>_timeout = connect, read',
+        or use default_timeouts.
+        :param retry: RetryPolicy deciding how failed requests are
+        retried. If None, a policy is made from the 'retries',
+        'retry_backoff' and 'dedupe_property' entries of the config file.
+        Log entries are only created again after a failure if the policy
+        has a dedupe_property.
+        :param http_cache: HttpCache keeping the responses of list_tags,
+        list_logbooks and list_properties, revalidated with conditional
+        requests. If None, a cache is made from the 'http_cache_size'
+        (default 128) and 'http_cache_path' (an SQLite file keeping the
+        cache on disk) entries of the config file, or the 'http_cache'
+        entry if it is false. Set to False to disable.
+        :param cache_find: If True, the results of find are kept in the
+        http_cache as well. Every search is a separate entry holding all
+        its results, so this is only worth it for searches repeated with
+        the same criteria. If None, it will be read from the config file
+        (default False).
+        :param compress: Content-Encoding used to compress the bodies of
+        log entries and other JSON requests: 'gzip', 'deflate' or 'zstd'
+        (needs the zstandard module). True selects gzip. If None, it will
+        be read from the config file (default no compression). When the
+        Olog rejects a compressed request with 415, or with 400 saying the
+        encoding is not supported, the request is sent again uncompressed
+        and compression is turned off.
+        :param compress_threshold: Size in bytes from which bodies are
+        compressed. If None, it will be read from the config file
+        (default 1024).
+        :param attachment_cache: AttachmentCache keeping the attachments
+        read through list_attachments on disk. If None, a cache is made in
+        the directory given by the 'attachment_cache' entry of the config
+        file, with a budget of 'attachment_cache_size' bytes (default
+        1 GiB). Without a directory, attachments are not cached.
         '''
         self._url = _conf.get_value('url', url)
         self.verify = False
@@ -69,106 +221,682 @@ class OlogClient(object):
                               or self._old_olog_api == 'True' 
                               or self._old_olog_api == 'true')
 
-        if username and not password and ask:
-            # try methods for a password
-            if keyring:
-                password = keyring.get_password(KEYRING_NAME, username)
-
-            # If it is not in the keyring, or we don't have that module
-            if not password:
-                logger.info("Password not found in keyring")
-                password = getpass("Olog Password (username = {}):"
-                                   .format(username))
-
         logger.info("Using base URL %s", self._url)
-
-        if username and password:
-            # If we have a valid username and password, setup authentication
-            logger.info("Using username %s for authentication.",
-                        username)
-            _auth = (username, password)
-        else:
-
-            # Don't use authentication
-            logger.info("No authentiation configured.")
-            _auth = None
+        _auth = _get_auth(username, password, ask)
+
+        pool_connections = int(_conf.get_value('pool_connections',
+                                               pool_connections) or 10)
+        pool_maxsize = int(_conf.get_value('pool_maxsize', pool_maxsize) or 10)
+        pool_block = _conf.get_value('pool_block', pool_block)
+        pool_block = (pool_block == True or pool_block == 'True'
+                      or pool_block == 'true')
+        keep_alive = _conf.get_value('keep_alive', keep_alive)
+        keep_alive = not (keep_alive == False or keep_alive == 'False'
+                          or keep_alive == 'false')
+
+        self.timeouts = dict()
+        for op, default in self.default_timeouts.items():
+            value = None
+            if timeouts is not None:
+                value = timeouts.get(op)
+            self.timeouts[op] = _conf.get_timeout(op + '_timeout', value,
+                                                  default)
+
+        if retry is None:
+            retry = RetryPolicy(
+                max_retries=_conf.get_value('retries') or 3,
+                backoff_factor=_conf.get_value('retry_backoff') or 0.5,
+                dedupe_property=_conf.get_value('dedupe_property'))
+        self.retry = retry
+        self._dedupe_checked = False
 
         self._session = requests.Session()
         self._session.auth = _auth
         # self._session.headers.update(self.json_header)
         self._session.verify = self.verify
+        self._adapter = _PoolAdapter(pool_connections, pool_maxsize,
+                                     pool_block)
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+        if not keep_alive:
+            self._session.headers['Connection'] = 'close'
+
+        compress = _conf.get_value('compress', compress)
+        if compress in (None, False, '', 'False', 'false'):
+            self._compression = None
+        else:
+            if compress in ('True', 'true'):
+                compress = True
+            self._compression = get_compressor(compress)
+        compress_threshold = _conf.get_value('compress_threshold',
+                                             compress_threshold)
+        if compress_threshold is None:
+            compress_threshold = 1024
+        self.compress_threshold = int(compress_threshold)
+
+        vocabulary_ttl = _conf.get_value('vocabulary_ttl', vocabulary_ttl)
+        if vocabulary_ttl is None:
+            vocabulary_ttl = 60.0
+        self.vocabulary = VocabularyCache(self, ttl=vocabulary_ttl)
+        # Logbooks and tags shared by the log entries this client decodes
+        self._interner = InternTable(self.intern_size)
+
+        if http_cache is None:
+            enabled = _conf.get_value('http_cache')
+            if enabled in (False, 'False', 'false'):
+                http_cache = False
+            else:
+                http_cache = HttpCache(
+                    int(_conf.get_value('http_cache_size') or 128),
+                    _conf.get_value('http_cache_path'))
+        self.http_cache = http_cache if http_cache is not False else None
+        cache_find = _conf.get_value('cache_find', cache_find)
+        self.cache_find = (cache_find == True or cache_find == 'True'
+                           or cache_find == 'true')
+
+        if attachment_cache is None:
+            path = _conf.get_value('attachment_cache')
+            if path is not None:
+                from .attachment_cache import AttachmentCache
+                attachment_cache = AttachmentCache(
+                    path, int(_conf.get_value('attachment_cache_size')
+                              or 1 << 30))
+        self.attachment_cache = attachment_cache
+        if _auth:
+            self._cache_prefix = '{}@{}'.format(_auth[0], self._url)
+        else:
+            self._cache_prefix = self._url
+
+        upload_workers = _conf.get_value('upload_workers', upload_workers)
+        if upload_workers is None:
+            upload_workers = 4
+        self.upload_workers = int(upload_workers)
+        self._uploader = None
+        self._uploader_lock = threading.Lock()
+
+        spool = _conf.get_value('spool', spool)
+        defer = _conf.get_value('defer', defer)
+        self._defer = (defer == True or defer == 'True' or defer == 'true')
+        if spool is not None:
+            from .spool import Spool, SpoolFlusher
+            self.spool = Spool(spool)
+            self._flusher = SpoolFlusher(self, self.spool)
+            self._flusher.start()
+        else:
+            if self._defer:
+                raise ValueError('Deferred logging requires a spool')
+            self.spool = None
+            self._flusher = None
+
+    def close(self, wait=True):
+        '''
+        Stop the attachment upload threads
+        :param wait: If True, wait for the attachments being uploaded,
+        otherwise the uploads which have not started are cancelled and
+        their Futures raise AttachmentUploadError.
+
+        A later upload starts new threads.
+        '''
+        with self._uploader_lock:
+            uploader, self._uploader = self._uploader, None
+        if uploader is not None:
+            uploader.shutdown(wait=wait, cancel_futures=not wait)
 
-    def _get(self, url, timeout=(4.2, 30), **kwargs):
+    def pool_stats(self):
+        '''
+        Statistics of the connection pool
+        :returns: dict holding the pool size ('maxsize'), the requests
+        in progress ('in_use'), the highest number of requests in
+        progress seen ('max_in_use'), the number of requests made
+        ('requests'), the number of requests started while every pooled
+        connection was busy ('waits') and, for each host, the number of
+        connections opened and the number of idle connections ('hosts').
+        '''
+        adapter = self._adapter
+        with adapter._stats_lock:
+            stats = {'maxsize': adapter._pool_maxsize,
+                     'in_use': adapter.in_use,
+                     'max_in_use': adapter.max_in_use,
+                     'requests': adapter.requests,
+                     'waits': adapter.waits}
+        hosts = dict()
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            idle = 0
+            if pool.pool is not None:
+                idle = sum(1 for conn in list(pool.pool.queue)
+                           if conn is not None)
+            hosts['{}://{}:{}'.format(pool.scheme, pool.host, pool.port)] = {
+                'connections': pool.num_connections,
+                'idle': idle}
+        stats['hosts'] = hosts
+        return stats
+
+    def _get(self, url, timeout=None, stream=False, headers=None,
+             **kwargs):
         """Do an http GET request"""
         logger.debug("HTTP GET to %s", self._url + url)
-        kwargs.update({'headers': self.json_header})
-        resp = self._session.get(self._url + url, timeout=timeout, stream=False, **kwargs)
-        resp.raise_for_status()
-        return resp
-
-    def _put(self, url,timeout=(4.2, 30), **kwargs):
+        if timeout is None:
+            timeout = self.timeouts['get']
+        kwargs['headers'] = dict(self.json_header)
+        if headers:
+            kwargs['headers'].update(headers)
+
+        def request():
+            resp = self._session.get(self._url + url, timeout=timeout, stream=stream, **kwargs)
+            resp.raise_for_status()
+            return resp
+        return self.retry.call('GET', request)
+
+    def _get_json(self, url, params=None, parse=None, stream=False):
+        """GET url and return the JSON of the response
+
+        :param parse: Function reading the JSON of the response, by
+        default resp.json().
+
+        The JSON is kept in the http_cache and returned again when the
+        Olog answers a conditional request with 304 Not Modified, so
+        callers decode it without modifying it.
+        """
+        if parse is None:
+            parse = _read_json
+        cache = self.http_cache
+        if cache is None:
+            return parse(self._get(url, params=params, stream=stream))
+
+        key = self._cache_prefix + url
+        if params:
+            key += '?' + urlencode(sorted(params.items()), doseq=True)
+        entry = cache.get(key)
+        if entry is not None and entry.fresh:
+            cache.hits += 1
+            return entry.value
+
+        headers = entry.conditional_headers() if entry is not None else None
+        resp = self._get(url, params=params, stream=stream, headers=headers)
+        if entry is not None and resp.status_code == 304:
+            resp.close()
+            cache.revalidated += 1
+            cache.refresh(key, entry, resp)
+            return entry.value
+
+        cache.misses += 1
+        value = parse(resp)
+        cache.store(key, resp, value)
+        return value
+
+    def _changed(self):
+        """Make the cached GET responses be revalidated"""
+        if self.http_cache is not None:
+            self.http_cache.expire()
+
+    def _put(self, url, timeout=None, **kwargs):
         """Do an http put request"""
         logger.debug("HTTP PUT to %s", self._url + url)
+        if timeout is None:
+            timeout = self.timeouts['put']
         kwargs.update({'headers': self.json_header})
-        resp = self._session.put(self._url + url, timeout=timeout, stream=False, **kwargs)
-        resp.raise_for_status()
+
+        def request(**kwargs):
+            resp = self._session.put(self._url + url, timeout=timeout, stream=False, **kwargs)
+            resp.raise_for_status()
+            return resp
+        resp = self._send('PUT', request, kwargs)
+        self._changed()
         return resp
 
-    def _post(self, url, timeout=(4.2, 30), json=True, **kwargs):
+    def _post(self, url, timeout=None, json=True, idempotent=None, **kwargs):
         """Do an http post request"""
         logger.debug("HTTP POST to %s", self._url + url)
+        if timeout is None:
+            timeout = self.timeouts['post']
         if json:
             kwargs.update({'headers': self.json_header})
-        resp = self._session.post(self._url + url, timeout=timeout, stream=False, **kwargs)
-        resp.raise_for_status()
+
+        def request(**kwargs):
+            resp = self._session.post(self._url + url, timeout=timeout, stream=False, **kwargs)
+            resp.raise_for_status()
+            return resp
+        resp = self._send('POST', request, kwargs, idempotent)
+        self._changed()
         return resp
 
-    def _delete(self, url, **kwargs):
+    def _send(self, method, request, kwargs, idempotent=None):
+        """Call request(**kwargs) with the retry policy, compressing the
+        data when it is larger than compress_threshold
+
+        The files sent are rewound before every attempt. A request whose
+        body is read from a stream is only sent once.
+        """
+        rewind = _body_rewinder(kwargs)
+        if rewind is None:
+            return request(**kwargs)
+
+        def attempt(**kwargs):
+            rewind()
+            return request(**kwargs)
+
+        compressed = self._compress(kwargs)
+        if compressed is None:
+            return self.retry.call(method, partial(attempt, **kwargs),
+                                   idempotent)
+
+        try:
+            return self.retry.call(method, partial(attempt, **compressed),
+                                   idempotent)
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or not _encoding_rejected(e.response):
+                raise
+            resp = self.retry.call(method, partial(attempt, **kwargs),
+                                   idempotent)
+            # Only blamed on the compression once the plain request worked
+            logger.warning("The Olog rejected a %s compressed request, "
+                           "sending requests uncompressed",
+                           compressed['headers']['Content-Encoding'])
+            self._compression = None
+            return resp
+
+    def _compress(self, kwargs):
+        """Return kwargs with the data compressed, or None"""
+        data = kwargs.get('data')
+        if self._compression is None or data is None:
+            return None
+        if not isinstance(data, bytes):
+            if not isinstance(data, str):
+                return None
+            data = data.encode('utf-8')
+        if len(data) < self.compress_threshold:
+            return None
+
+        encoding, compressor = self._compression
+        compressed = dict(kwargs)
+        compressed['data'] = compressor(data)
+        compressed['headers'] = dict(kwargs.get('headers') or {})
+        compressed['headers']['Content-Encoding'] = encoding
+        logger.debug("Compressed %d bytes to %d with %s", len(data),
+                     len(compressed['data']), encoding)
+        return compressed
+
+    def _delete(self, url, timeout=None, **kwargs):
         """Do an http delete request"""
         logger.debug("HTTP DELETE to %s", self._url + url)
+        if timeout is None:
+            timeout = self.timeouts['delete']
         kwargs.update({'headers': self.json_header})
-        resp = self._session.delete(self._url + url, **kwargs)
-        resp.raise_for_status()
+
+        def request():
+            resp = self._session.delete(self._url + url, timeout=timeout, **kwargs)
+            resp.raise_for_status()
+            return resp
+        resp = self.retry.call('DELETE', request)
+        self._changed()
         return resp
 
-    def log(self, log_entry):
+    def log(self, log_entry, wait=True):
         '''
         Create a log entry
         :param log_entry: An instance of LogEntry to add to the Olog
+        :param wait: If False, return as soon as the log entry is created
+        while its attachments are still being uploaded.
+        :returns: The id of the log entry, or None if the log entry was
+        written to the spool to be sent later. If :param wait: is False,
+        a tuple of the id and a Future which resolves to the id once the
+        attachments are uploaded.
+
+        Failed attachment uploads raise AttachmentUploadError, either
+        from this method or from the Future.
+        '''
+        data = self._encode(log_entry)
+        attachments = list(log_entry.attachments)
+
+        if self.spool is None:
+            id = self._create(data)
+        else:
+            # Keep the order of the entries, anything logged while the spool
+            # holds entries goes to the back of the spool.
+            id = None
+            if self._defer or len(self.spool):
+                self.spool.put(data, attachments)
+                self._flusher.wake()
+            else:
+                try:
+                    id = self._create(data)
+                except Exception as e:
+                    if not _is_transient(e):
+                        raise
+                    logger.warning("Unable to reach the Olog, spooling "
+                                   "log entry: %s", e)
+                    self.spool.put(data, attachments)
+                    self._flusher.wake()
+
+            if id is None:
+                future = Future()
+                future.set_result(None)
+                return None if wait else (None, future)
+
+        future = self._upload_attachments(id, attachments)
+        if self.spool is not None:
+            future = self._spool_failed_uploads(data, future)
+
+        if wait:
+            future.result()
+            return id
+        return id, future
+
+    def _encode(self, log_entry):
+        """Encode a log entry with LogEntryEncoder
+
+        If the retry policy has a dedupe_property, the key is added here,
+        once, so that a spooled entry keeps the key of the attempts which
+        may have created it.
+        """
+        data = LogEntryEncoder().encode(log_entry)
+        if self.retry.dedupe_property is not None:
+            data = self._add_dedupe_key(data)[0]
+        return data
+
+    def _create(self, data, since=None):
+        """Create a log entry from its JSON encoding and return its id
+
+        See :func _create_many:.
+        """
+        return self._create_many([data], since)[0]
+
+    def _create_many(self, entries, since=None):
+        """Create log entries in one request and return their ids
+
+        :param entries: List of log entries encoded by LogEntryEncoder.
+        :param since: Time from which the entries may already have been
+        posted, for example by an attempt made before they were spooled.
+        The Olog is searched for their keys before they are posted.
+
+        If the retry policy has a dedupe_property, a unique key is added
+        to every log entry as that property, unless it already holds one.
+        When the request fails in a way that leaves it unknown whether the
+        entries were created, the Olog is searched for the keys and only
+        the entries not found are posted again.
+        """
+        if self.retry.dedupe_property is None:
+            return self._post_entries(entries)
+
+        self._ensure_dedupe_property()
+        entries, keys = zip(*[self._add_dedupe_key(data) for data in entries])
+        ids = [None] * len(entries)
+        if since is None:
+            started = time.time()
+        else:
+            started = since
+            self._find_dedupe_keys(keys, ids, started)
+
+        attempt = 0
+        while None in ids:
+            missing = [n for n, id in enumerate(ids) if id is None]
+            try:
+                created = self._post_entries([entries[n] for n in missing])
+            except Exception as e:
+                attempt += 1
+                if not self.retry.should_retry('POST', e, attempt,
+                                               idempotent=True):
+                    raise
+                time.sleep(self.retry.backoff(attempt))
+                if self._find_dedupe_keys(keys, ids, started):
+                    logger.info("Log entries were created before the "
+                                "failure (%s)", e)
+            else:
+                for n, id in zip(missing, created):
+                    ids[n] = id
+        return ids
+
+    def _post_entries(self, entries):
+        """Post log entries encoded by LogEntryEncoder, return their ids"""
+        if len(entries) == 1:
+            data = entries[0]
+        else:
+            data = json.dumps([json.loads(data)[0] for data in entries])
+        resp = self._post(self.logs_resource, data=data)
+        ids = self._created_ids(resp)
+        if len(ids) != len(entries):
+            raise ValueError('Olog returned {} ids for {} log entries'
+                             .format(len(ids), len(entries)))
+        return ids
+
+    def _add_dedupe_key(self, data):
+        """Add a unique key to a log entry encoded by LogEntryEncoder
+
+        :returns: The encoded log entry and the key. The key already held
+        by data is kept.
+        """
+        name = self.retry.dedupe_property
+        json_log_entries = json.loads(data)
+        properties = json_log_entries[0]['properties']
+        for p in properties:
+            key = (p.get('attributes') or {}).get('key')
+            if p.get('name') == name and key:
+                return data, key
+        key = uuid.uuid4().hex
+        properties.append(PropertyEncoder().default(
+            Property(name, attributes={'key': key})))
+        return json.dumps(json_log_entries), key
+
+    def _ensure_dedupe_property(self):
+        if self._dedupe_checked:
+            return
+        name = self.retry.dedupe_property
+        if not self.vocabulary.contains('properties', name):
+            self.createProperty(Property(name, attributes={'key': ''}))
+        self._dedupe_checked = True
+
+    def _find_dedupe_keys(self, keys, ids, started):
+        """Fill in ids the ids of the log entries holding the dedupe keys
+
+        :returns: The number of log entries found.
+        """
+        name = self.retry.dedupe_property
+        wanted = dict((key, n) for n, key in enumerate(keys)
+                      if ids[n] is None)
+        found = 0
+        params = {'property': name, 'start': int(started) - 60}
+        for log_entry in self.find(**params):
+            for p in log_entry.properties:
+                if p.name != name:
+                    continue
+                n = wanted.pop((p.attributes or {}).get('key'), None)
+                if n is not None:
+                    ids[n] = log_entry.id
+                    found += 1
+        return found
+
+    def _spool_failed_uploads(self, data, future):
+        """Spool attachments which failed to upload for a transient reason
+
+        :returns: A Future which resolves to the log entry id if all the
+        failed attachments could be spooled. A StreamingAttachment, read
+        by the failed upload, cannot be spooled.
+        """
+        result = Future()
+
+        def done(f):
+            exc = f.exception()
+            if (isinstance(exc, AttachmentUploadError)
+                    and all(_is_transient(e)
+                            and not isinstance(a, StreamingAttachment)
+                            for a, e in exc.failures)):
+                logger.warning("Unable to reach the Olog, spooling "
+                               "attachments of log entry %s", exc.log_id)
+                try:
+                    self.spool.put(data, [a for a, e in exc.failures],
+                                   log_id=exc.log_id)
+                except Exception as e:
+                    result.set_exception(e)
+                    return
+                self._flusher.wake()
+                result.set_result(exc.log_id)
+            elif exc is not None:
+                result.set_exception(exc)
+            else:
+                result.set_result(f.result())
+
+        future.add_done_callback(done)
+        return result
+
+    def log_many(self, log_entries, chunk_size=100):
+        '''
+        Create many log entries using as few requests as possible
+        :param log_entries: A sequence of LogEntry instances to add to the Olog
+        :param chunk_size: The maximum number of entries sent in one request.
+        :returns: The ids of the created entries, in the order of
+        :param log_entries:, None for the entries written to the spool.
+
+        The entries of each chunk are posted as a single JSON list, the
+        attachments of every entry are uploaded once its chunk has been
+        created. Entries are spooled and deduplicated as by :func log:.
+
+        A failure raises LogManyError, holding the ids of the entries
+        created before it.
         '''
-        resp = self._post(self.logs_resource,
-                          data=LogEntryEncoder().encode(log_entry))
+        chunk_size = int(chunk_size)
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer')
+
+        log_entries = list(log_entries)
+        ids = []
+        try:
+            entries = [self._encode(log_entry) for log_entry in log_entries]
+            for start in range(0, len(log_entries), chunk_size):
+                if self.spool is not None and (self._defer
+                                               or len(self.spool)):
+                    self._spool_entries(entries[start:],
+                                        log_entries[start:])
+                    ids.extend([None] * (len(log_entries) - start))
+                    break
+                try:
+                    chunk_ids = self._create_many(
+                        entries[start:start + chunk_size])
+                except Exception as e:
+                    if self.spool is None or not _is_transient(e):
+                        raise
+                    logger.warning("Unable to reach the Olog, spooling %d "
+                                   "log entries: %s",
+                                   len(log_entries) - start, e)
+                    self._spool_entries(entries[start:],
+                                        log_entries[start:])
+                    ids.extend([None] * (len(log_entries) - start))
+                    break
+
+                futures = []
+                for id, data, log_entry in zip(chunk_ids, entries[start:],
+                                               log_entries[start:]):
+                    future = self._upload_attachments(id,
+                                                      log_entry.attachments)
+                    if self.spool is not None:
+                        future = self._spool_failed_uploads(data, future)
+                    futures.append(future)
+                ids.extend(chunk_ids)
+                for future in futures:
+                    future.result()
+        except Exception as e:
+            raise LogManyError(ids, e)
+
+        return ids
+
+    def _spool_entries(self, entries, log_entries):
+        """Write encoded log entries to the spool to be sent later"""
+        for data, log_entry in zip(entries, log_entries):
+            self.spool.put(data, list(log_entry.attachments))
+        self._flusher.wake()
+
+    def _created_ids(self, resp):
+        """Return the ids of the log entries in a create response"""
         if self._old_olog_api:
-            id = LogEntryDecoder().dictToLogEntry(resp.json()[0]).id
+            json_log_entries = resp.json()
         else:
-            id = LogEntryDecoder().dictToLogEntry(resp.json()['log'][0]).id
-
-
-        # Handle attachments
-
-        for attachment in log_entry.attachments:
-            url = "{0}/{1}".format(self.attachments_resource, id)
-            resp = self._post(url, json=False,
-                              files={'file': attachment.get_file_post()})
-
-        return id
-
-    def updateLog(self, logId, log_entry):
+            json_log_entries = resp.json()['log']
+        return [json_log_entry['id'] for json_log_entry in json_log_entries]
+
+    def _post_attachments(self, id, attachments):
+        """Upload attachments to the log entry with id"""
+        self._upload_attachments(id, attachments).result()
+
+    def _post_attachment(self, url, attachment):
+        if isinstance(attachment, StreamingAttachment):
+            # Sent with chunked transfer encoding as the stream is read
+            boundary = uuid.uuid4().hex
+            headers = {'content-type': 'multipart/form-data; boundary={}'
+                       .format(boundary)}
+            with closing(attachment.file):
+                self._post(url, json=False, timeout=self.timeouts['upload'],
+                           headers=headers,
+                           data=_multipart_stream(boundary, attachment))
+            return
+        self._post(url, json=False, timeout=self.timeouts['upload'],
+                   files={'file': attachment.get_file_post()})
+
+    def _upload_attachments(self, id, attachments):
+        """Start uploading attachments to the log entry with id
+
+        The attachments are uploaded in parallel by at most
+        `upload_workers` threads.
+
+        :returns: A Future which resolves to the id when all the
+        attachments are uploaded, or raises AttachmentUploadError listing
+        the attachments which failed.
+        """
+        result = Future()
+        attachments = list(attachments)
+        if not attachments:
+            result.set_result(id)
+            return result
+
+        url = "{0}/{1}".format(self.attachments_resource, id)
+        # Submitted under the lock, so close() only shuts down an executor
+        # once nothing more can be submitted to it
+        with self._uploader_lock:
+            if self._uploader is None:
+                self._uploader = ThreadPoolExecutor(self.upload_workers)
+            uploader = self._uploader
+            futures = [(a, uploader.submit(self._post_attachment, url, a))
+                       for a in attachments]
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(f):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            failures = [(a, CancelledError('upload cancelled')
+                         if f.cancelled() else f.exception())
+                        for a, f in futures]
+            failures = [(a, e) for a, e in failures if e is not None]
+            if failures:
+                result.set_exception(AttachmentUploadError(id, failures))
+            else:
+                result.set_result(id)
+
+        for a, f in futures:
+            f.add_done_callback(done)
+        return result
+
+    def updateLog(self, logId, log_entry, wait=True):
         '''
         Update a log entry
 
         :param logId: The id of the log to be updated/modified
         :param log_entry: An instance of the modified version of the LogEntry
+        :param wait: If False, return a Future which resolves to the id
+        once the attachments are uploaded instead of waiting for them.
         '''
         url = "{0}/{1}".format(self.logs_resource, str(logId))
         resp = self._post(url, data=json.dumps(json.loads(LogEntryEncoder().encode(log_entry))[0]))
 
         '''Attachments'''
-        for attachment in log_entry.attachments:
-            url = "{0}/{1}".format(self.attachments_resource, str(logId))
-            resp = self._post(url,
-                              json=False,
-                              files={'file': attachment.get_file_post()})
+        future = self._upload_attachments(logId, log_entry.attachments)
+        if wait:
+            future.result()
+        else:
+            return future
 
     def createLogbook(self, logbook):
         '''
@@ -177,6 +905,7 @@ class OlogClient(object):
         '''
         url = "/".join((self.logbooks_resource, logbook.name))
         self._put(url, data=LogbookEncoder().encode(logbook))
+        self.vocabulary.invalidate('logbooks')
 
     def createTag(self, tag):
         '''
@@ -185,6 +914,7 @@ class OlogClient(object):
         '''
         url = "/".join((self.tags_resource, tag.name))
         self._put(url, data=TagEncoder().encode(tag))
+        self.vocabulary.invalidate('tags')
 
     def createProperty(self, property):
         '''
@@ -194,6 +924,7 @@ class OlogClient(object):
         url = "/".join((self.properties_resource, property.name))
         p = PropertyEncoder().encode(property)
         self._put(url, data=p)
+        self.vocabulary.invalidate('properties')
 
     def find(self, **kwds):
         '''
@@ -216,19 +947,200 @@ class OlogClient(object):
         find all the log entries in logbook 'controls' AND with tag
         named 'magnets'
         '''
-        resp = self._get(self.logs_resource, params=OrderedDict(kwds))
-
-        logs = []
-        for json_log_entry in resp.json():
-            logs.append(LogEntryDecoder().dictToLogEntry(json_log_entry))
-
-        return logs
-
-    def list_attachments(self, log_entry_id):
+        params = OrderedDict(kwds)
+        if self.http_cache is None or not self.cache_find:
+            # Decoded as the response arrives, the JSON of each log entry
+            # is dropped once its LogEntry is made
+            return list(self._iter_log_entries(
+                self._get(self.logs_resource, params=params, stream=True)))
+        json_log_entries = self._get_json(self.logs_resource, params=params,
+                                          parse=_read_json_list, stream=True)
+        decoder = LogEntryDecoder(self._interner)
+        return [decoder.dictToLogEntry(json_log_entry)
+                for json_log_entry in json_log_entries]
+
+    def iter_find(self, page_size=100, **kwds):
+        '''
+        Search for logEntries, yielding them one at a time
+        :param page_size: Number of log entries requested per page.
+
+        Takes the same search criteria as :func find:. The results are
+        requested with the page and limit query parameters, a log entry
+        found on more than one page is only yielded once. A background
+        thread decodes the responses as they arrive and keeps at most
+        :param page_size: decoded log entries ahead of the caller.
+        >> for log_entry in iter_find(logbook='controls', page_size=500):
+        ...     print(log_entry.text)
+        '''
+        page_size = int(page_size)
+        if page_size < 1:
+            raise ValueError('page_size must be a positive integer')
+
+        entries = queue.Queue(maxsize=page_size)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    entries.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                seen = set()
+                page = 1
+                while True:
+                    params = OrderedDict(kwds)
+                    params['page'] = page
+                    params['limit'] = page_size
+                    resp = self._get(self.logs_resource, params=params,
+                                     stream=True)
+                    count = new = 0
+                    for log_entry in self._iter_log_entries(resp):
+                        count += 1
+                        # Entries created while paging shift the pages
+                        if log_entry.id in seen:
+                            continue
+                        seen.add(log_entry.id)
+                        new += 1
+                        if not put((log_entry, None)):
+                            return
+                    # A short page is the last one. A page larger than
+                    # asked for, or holding only log entries already
+                    # seen, means the server does not support paging.
+                    if count != page_size or not new:
+                        break
+                    page += 1
+            except Exception as e:
+                put((None, e))
+            else:
+                put((None, None))
+
+        producer = threading.Thread(target=produce, name='OlogFind')
+        producer.daemon = True
+        producer.start()
+        try:
+            while True:
+                log_entry, exc = entries.get()
+                if exc is not None:
+                    raise exc
+                if log_entry is None:
+                    break
+                yield log_entry
+        finally:
+            stop.set()
+
+    def follow(self, since=None, min_interval=1.0, max_interval=30.0,
+               backoff=2.0, overlap=60, seen_size=10000, **kwds):
+        '''
+        Yield log entries as they are created, oldest first
+        :param since: Epoch time from which log entries are yielded. If
+        None, only the log entries created after the call are yielded.
+        :param min_interval: Seconds between polls while log entries
+        keep arriving.
+        :param max_interval: Longest time in seconds between polls.
+        :param backoff: Factor the poll interval grows by after a poll
+        which found nothing new, or which failed with a transient error.
+        :param overlap: Seconds before the newest log entry seen from
+        which each poll searches, to catch log entries committed late.
+        :param seen_size: Number of log entry ids remembered to skip the
+        log entries already yielded.
+
+        Takes the search criteria of :func find:, except start. Each poll
+        only asks for the log entries created since the newest one seen.
+        A log entry seen within that window is yielded again when its
+        modifiedDate changes. The generator runs until it is closed.
+        >> for log_entry in follow(logbook='Operations'):
+        ...     print(log_entry.text)
+        '''
+        if 'start' in kwds:
+            raise ValueError('Use since instead of start with follow')
+        if since is None:
+            floor = None
+            start = time.time() - overlap
+        else:
+            floor = since * 1000.
+            start = since
+        first = since is None
+        # Newest createdDate in ms and the modifiedDate of the log
+        # entries seen, by id
+        newest = None
+        seen = OrderedDict()
+        interval = min_interval
+
+        while True:
+            try:
+                log_entries = self.find(start=int(start), **kwds)
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                logger.warning("Polling the Olog failed: %s", e)
+                log_entries = None
+
+            new = []
+            for log_entry in log_entries or ():
+                if log_entry.id in seen:
+                    if seen[log_entry.id] == log_entry.modify_time:
+                        continue
+                    del seen[log_entry.id]
+                elif (floor is not None and log_entry.create_time is not None
+                      and log_entry.create_time < floor):
+                    continue
+                seen[log_entry.id] = log_entry.modify_time
+                new.append(log_entry)
+            while len(seen) > seen_size:
+                seen.popitem(last=False)
+
+            if first and log_entries is not None:
+                # The first poll only marks the existing log entries seen
+                first = False
+                new = []
+            created = [l.create_time for l in log_entries or ()
+                       if l.create_time is not None]
+            if created:
+                newest = max(created + [newest or 0])
+                start = newest / 1000. - overlap
+
+            new.sort(key=lambda l: (l.create_time or 0, l.id))
+            for log_entry in new:
+                yield log_entry
+
+            if new:
+                interval = min_interval
+            else:
+                interval = min(interval * backoff, max_interval)
+            time.sleep(interval)
+
+    def _iter_log_entries(self, resp, chunk_size=1 << 16):
+        """Decode a JSON list of log entries as the response arrives"""
+        decoder = LogEntryDecoder(self._interner)
+        with closing(resp):
+            for json_log_entry in _iter_json_list(resp, chunk_size):
+                yield decoder.dictToLogEntry(json_log_entry)
+
+    def list_attachments(self, log_entry_id, metadata_only=False,
+                         modify_time=None):
         '''
         Search for attachments on a logentry
-        :param log_entry_id: The ID of the log entry to list the attachments.
+        :param log_entry_id: The ID of the log entry to list the
+        attachments, or the LogEntry.
+        :param metadata_only: If True, return the listing as dicts holding
+        the filename, the url and the other fields sent by the Olog.
+        :param modify_time: Modification time of the log entry, used to
+        tell if a cached attachment is still valid. Taken from the log
+        entry if one is given, otherwise the size of the attachment is
+        used.
+        :returns: List of LazyAttachment, their contents are downloaded
+        when first read. With an attachment_cache, the contents are an
+        open file of the cached copy instead of bytes.
         '''
+        if isinstance(log_entry_id, LogEntry):
+            if modify_time is None:
+                modify_time = log_entry_id.modify_time
+            log_entry_id = log_entry_id.id
         url = "{0}/{1}".format(self.attachments_resource, log_entry_id)
         resp = self._get(url)
 
@@ -237,43 +1149,153 @@ class OlogClient(object):
             filename = jsonAttachment.pop('filename')
             url = "{0}/{1}/{2}".format(self.attachments_resource, log_entry_id,
                                        filename)
-            f = self._get(url)
-            attachments.append(Attachment(file=f.content, filename=filename))
+            if metadata_only:
+                jsonAttachment.update(filename=filename, url=self._url + url)
+                attachments.append(jsonAttachment)
+                continue
+            if self.attachment_cache is not None:
+                from .attachment_cache import attachment_key
+                version = modify_time
+                if version is None:
+                    version = jsonAttachment.get('fileSize')
+                key = attachment_key(log_entry_id, filename, version)
+                fetch = partial(self.attachment_cache.fetch, key,
+                                partial(self.iter_attachment, log_entry_id,
+                                        filename))
+            else:
+                fetch = partial(self._get_content, url)
+            attachments.append(LazyAttachment(
+                filename, fetch, url=self._url + url,
+                mime_type=jsonAttachment.get('contentType'),
+                metadata=jsonAttachment))
 
         return attachments
 
+    def _get_content(self, url):
+        return self._get(url).content
+
+    def iter_attachment(self, log_entry_id, filename, chunk_size=1 << 20,
+                        offset=0):
+        '''
+        Download an attachment in chunks
+        :param log_entry_id: The ID of the log entry holding the attachment.
+        :param filename: The filename of the attachment.
+        :param chunk_size: The maximum size in bytes of each chunk.
+        :param offset: Number of bytes at the start of the attachment to
+        skip. A Range request is used, if the server ignores it the
+        skipped bytes are downloaded and discarded.
+        :returns: Iterator over the contents of the attachment as bytes.
+        '''
+        resp, start = self._open_attachment(log_entry_id, filename, offset)
+        with closing(resp):
+            for chunk in resp.iter_content(chunk_size):
+                if start < offset:
+                    skip = min(offset - start, len(chunk))
+                    start += skip
+                    chunk = chunk[skip:]
+                    if not chunk:
+                        continue
+                yield chunk
+
+    def download_attachment(self, log_entry_id, filename, dest,
+                            chunk_size=1 << 20, resume=True):
+        '''
+        Download an attachment to disk without holding it in memory
+        :param log_entry_id: The ID of the log entry holding the attachment.
+        :param filename: The filename of the attachment.
+        :param dest: A path, a directory to save :param filename: in, or
+        a writable file object.
+        :param chunk_size: Size in bytes of the chunks written.
+        :param resume: If True, a partial download left from an earlier
+        call is continued with a Range request when the server allows it.
+        :returns: The path of the downloaded file, or :param dest: if it is
+        a file object.
+
+        The data is written to a '.part' file next to the destination,
+        which replaces it once the download is complete. A '.part' file
+        which does not match the length of the attachment is discarded.
+        '''
+        if hasattr(dest, 'write'):
+            for chunk in self.iter_attachment(log_entry_id, filename,
+                                              chunk_size):
+                dest.write(chunk)
+            return dest
+
+        if os.path.isdir(dest):
+            dest = os.path.join(dest, os.path.basename(filename))
+        part = dest + '.part'
+
+        offset = 0
+        if resume and os.path.exists(part):
+            offset = os.path.getsize(part)
+
+        try:
+            resp, start = self._open_attachment(log_entry_id, filename,
+                                                offset)
+        except requests.exceptions.HTTPError as e:
+            if not offset or e.response is None \
+                    or e.response.status_code != 416:
+                raise
+            # The partial file holds the whole attachment only if the
+            # server says it has that length, otherwise start again
+            if _content_length(e.response) == offset:
+                os.replace(part, dest)
+                return dest
+            logger.info("Partial download of %s does not match the "
+                        "attachment, downloading it again", filename)
+            os.remove(part)
+            offset = 0
+            resp, start = self._open_attachment(log_entry_id, filename)
+
+        with closing(resp):
+            if start != offset:
+                logger.info("Server ignored range request, downloading "
+                            "%s from the start", filename)
+            with open(part, 'ab' if start else 'wb') as f:
+                for chunk in resp.iter_content(chunk_size):
+                    f.write(chunk)
+        os.replace(part, dest)
+        return dest
+
+    def _open_attachment(self, log_entry_id, filename, offset=0):
+        """Start a streaming download of an attachment
+
+        :returns: The response and the offset its body starts at.
+        """
+        url = "{0}/{1}/{2}".format(self.attachments_resource, log_entry_id,
+                                   filename)
+        # Ranges are offsets in the encoded body, so ask for the file as is
+        headers = {'accept-encoding': 'identity'}
+        if offset:
+            headers['range'] = 'bytes={}-'.format(offset)
+        resp = self._get(url, stream=True, headers=headers)
+        if resp.status_code == 206:
+            return resp, offset
+        return resp, 0
+
     def list_tags(self):
         '''
         List all tags in the Olog.
         '''
-        resp = self._get(self.tags_resource)
-
-        tags = []
-        for jsonTag in resp.json().pop('tag'):
-            tags.append(TagDecoder().dictToTag(jsonTag))
-        return tags
+        decoder = TagDecoder()
+        return [decoder.dictToTag(t)
+                for t in self._get_json(self.tags_resource)['tag']]
 
     def list_logbooks(self):
         '''
         List all logbooks in the Olog.
         '''
-        resp = self._get(self.logbooks_resource)
-
-        logbooks = []
-        for jsonLogbook in resp.json().pop('logbook'):
-            logbooks.append(LogbookDecoder().dictToLogbook(jsonLogbook))
-        return logbooks
+        decoder = LogbookDecoder()
+        return [decoder.dictToLogbook(l)
+                for l in self._get_json(self.logbooks_resource)['logbook']]
 
     def list_properties(self):
         '''
         List all Properties and their attributes in the Olog.
         '''
-        resp = self._get(self.properties_resource)
-
-        properties = []
-        for jsonProperty in resp.json().pop('property'):
-            properties.append(PropertyDecoder().dictToProperty(jsonProperty))
-        return properties
+        decoder = PropertyDecoder()
+        return [decoder.dictToProperty(p) for p in
+                self._get_json(self.properties_resource)['property']]
 
     def delete(self, **kwds):
         '''
@@ -306,11 +1328,13 @@ class OlogClient(object):
             url = "/".join((self.logbooks_resource,
                            kwds['logbookName'].strip()))
             self._delete(url)
+            self.vocabulary.invalidate('logbooks')
 
         elif 'tagName' in kwds:
             url = "/".join((self.tags_resource,
                            kwds['tagName'].strip()))
             self._delete(url)
+            self.vocabulary.invalidate('tags')
 
         elif 'propertyName' in kwds:
             url = "/".join((self.properties_resource,
@@ -318,6 +1342,7 @@ class OlogClient(object):
             data = PropertyEncoder().encode(Property(
                 kwds['propertyName'].strip()))
             self._delete(url, data=data)
+            self.vocabulary.invalidate('properties')
 
         elif 'logEntryId' in kwds:
             url = "/".join((self.logs_resource,
@@ -328,6 +1353,231 @@ class OlogClient(object):
             raise ValueError('Unknown Key')
 
 
+_json_structure = re.compile(r'["{}\[\]]')
+_json_string_end = re.compile(r'["\\]')
+_json_scalar_end = re.compile(r'[\s,\]]')
+
+
+class _JsonElementScanner(object):
+    """Find where a JSON string, object or array ends as its text arrives
+
+    Each character is looked at once, the string and nesting state is
+    kept from one chunk to the next.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def scan(self, buf, pos):
+        """Scan buf from pos, return the index after the end of the
+        element or None if it continues in the next chunk"""
+        n = len(buf)
+        while pos < n:
+            if self.escape:
+                self.escape = False
+                pos += 1
+            elif self.in_string:
+                m = _json_string_end.search(buf, pos)
+                if m is None:
+                    return None
+                if m.group() == '\\':
+                    self.escape = True
+                    pos = m.end()
+                    continue
+                self.in_string = False
+                pos = m.end()
+                if not self.depth:
+                    return pos
+            else:
+                m = _json_structure.search(buf, pos)
+                if m is None:
+                    return None
+                c = m.group()
+                pos = m.end()
+                if c == '"':
+                    self.in_string = True
+                elif c in '{[':
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if not self.depth:
+                        return pos
+        return None
+
+
+def _iter_json_list(resp, chunk_size):
+    """Yield the elements of a JSON list read incrementally from resp
+
+    The text of an element is kept until it is complete and then decoded
+    once, so elements spanning many chunks are read in linear time.
+    """
+    if resp.encoding is None:
+        resp.encoding = 'utf-8'
+    decoder = JSONDecoder()
+    pieces = []      # Text of the element read from earlier chunks
+    scanner = None   # Scanner of the string, object or array being read
+    scalar = False   # A number or literal is being read
+    started = False
+    for buf in resp.iter_content(chunk_size, decode_unicode=True):
+        pos = 0
+        while True:
+            if scanner is not None or scalar:
+                if scalar:
+                    m = _json_scalar_end.search(buf, pos)
+                    end = m.start() if m is not None else None
+                else:
+                    end = scanner.scan(buf, pos)
+                if end is None:
+                    pieces.append(buf[pos:])
+                    break
+                pieces.append(buf[pos:end])
+                text = ''.join(pieces)
+                pieces = []
+                scanner = None
+                scalar = False
+                pos = end
+                yield decoder.decode(text)
+                continue
+
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buf):
+                break
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError('Expected a JSON list of log entries')
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            if buf[pos] in '"{[':
+                scanner = _JsonElementScanner()
+            else:
+                scalar = True
+    if not started:
+        raise ValueError('Expected a JSON list of log entries')
+    raise ValueError('Truncated JSON list of log entries')
+
+
+def _body_rewinder(kwargs):
+    """Return a function seeking the files sent by a request back to where
+    they start, or None if the body can only be read once"""
+    streams = []
+    data = kwargs.get('data')
+    if data is not None and not isinstance(data, (bytes, str, dict, list,
+                                                  tuple)):
+        streams.append(data)
+    for value in (kwargs.get('files') or {}).values():
+        if isinstance(value, (tuple, list)):
+            value = value[1]
+        if not isinstance(value, (bytes, str)):
+            streams.append(value)
+
+    positions = []
+    for f in streams:
+        try:
+            seekable = getattr(f, 'seekable', None)
+            if seekable is not None and not seekable():
+                return None
+            positions.append((f, f.tell()))
+        except (AttributeError, IOError, OSError, ValueError):
+            return None
+
+    def rewind():
+        for f, position in positions:
+            f.seek(position)
+    return rewind
+
+
+def _multipart_stream(boundary, attachment):
+    """Yield the multipart/form-data body of an attachment in chunks"""
+    filename, f, mime_type = attachment.get_file_post()
+    yield ('--{}\r\nContent-Disposition: form-data; name="file"; '
+           'filename="{}"\r\nContent-Type: {}\r\n\r\n'
+           .format(boundary, filename.replace('"', '%22'), mime_type)
+           .encode('utf-8'))
+    while True:
+        chunk = f.read(attachment.chunk_size)
+        if not chunk:
+            break
+        yield chunk
+    yield '\r\n--{}--\r\n'.format(boundary).encode('utf-8')
+
+
+def _encoding_rejected(resp):
+    """Return True if an error response says the Content-Encoding of the
+    request is not supported"""
+    if resp.status_code == 415:
+        return True
+    if resp.status_code != 400:
+        return False
+    try:
+        text = resp.text.lower()
+    except Exception:
+        return False
+    return 'encoding' in text and any(
+        word in text for word in ('unsupported', 'not supported', 'unknown'))
+
+
+def _content_length(resp):
+    """Length of the whole attachment from the Content-Range of a 416
+    response, or None if the server did not send it"""
+    content_range = resp.headers.get('content-range', '')
+    unit, _, length = content_range.partition(' */')
+    if unit.strip().lower() != 'bytes':
+        return None
+    try:
+        return int(length)
+    except ValueError:
+        return None
+
+
+def _read_json(resp):
+    return resp.json()
+
+
+def _read_json_list(resp, chunk_size=1 << 16):
+    """Read a JSON list as the response arrives"""
+    with closing(resp):
+        return list(_iter_json_list(resp, chunk_size))
+
+
+def _get_auth(username, password, ask):
+    """Return the (username, password) used for authentication or None"""
+    if username and not password and ask:
+        # try methods for a password
+        keyring = _import_keyring()
+        if keyring:
+            password = keyring.get_password(KEYRING_NAME, username)
+
+        # If it is not in the keyring, or we don't have that module
+        if not password:
+            logger.info("Password not found in keyring")
+            password = getpass("Olog Password (username = {}):"
+                               .format(username))
+
+    if username and password:
+        # If we have a valid username and password, setup authentication
+        logger.info("Using username %s for authentication.",
+                    username)
+        return (username, password)
+
+    # Don't use authentication
+    logger.info("No authentiation configured.")
+    return None
+
+
+def _is_transient(exc):
+    """Return True if a request failure may succeed when retried later"""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is not None and exc.response.status_code >= 500
+    return isinstance(exc, (requests.exceptions.ConnectionError,
+                            requests.exceptions.Timeout))
+
+
 class PropertyEncoder(JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Property):
@@ -347,9 +1597,11 @@ class PropertyDecoder(JSONDecoder):
 
     def dictToProperty(self, d):
         if d:
-            return Property(name=d.pop('name'),
-                            attributes=d.pop('attributes'),
-                            )
+            # The attributes are copied, d may be kept by the http_cache
+            attributes = d['attributes']
+            if attributes is not None:
+                attributes = dict(attributes)
+            return Property(name=d['name'], attributes=attributes)
 
 
 class LogbookEncoder(JSONEncoder):
@@ -365,7 +1617,7 @@ class LogbookDecoder(JSONDecoder):
 
     def dictToLogbook(self, d):
         if d:
-            return Logbook(name=d.pop('name'), owner=d.pop('owner'))
+            return Logbook(name=d['name'], owner=d['owner'])
         else:
             return None
 
@@ -383,8 +1635,8 @@ class TagDecoder(JSONDecoder):
 
     def dictToTag(self, d):
         if d:
-            t = Tag(name=d.pop('name'))
-            t.state = d.pop('state')
+            t = Tag(name=d['name'])
+            t.state = d['state']
             return t
         else:
             return None
@@ -410,25 +1662,35 @@ class LogEntryEncoder(JSONEncoder):
 
 
 class LogEntryDecoder(JSONDecoder):
-    def __init__(self):
+    def __init__(self, interner=None):
+        """
+        :param interner: InternTable sharing the logbooks and tags of the
+        decoded log entries. If None, a table is made for this decoder.
+        """
         JSONDecoder.__init__(self, object_hook=self.dictToLogEntry)
+        if interner is None:
+            interner = InternTable()
+        self.interner = interner
+        self._property_decoder = PropertyDecoder()
 
     def dictToLogEntry(self, d):
         if d:
-            logbooks = [LogbookDecoder().dictToLogbook(logbook)
-                        for logbook in d.pop('logbooks')]
+            interner = self.interner
+            logbooks = [interner.logbook(logbook['name'], logbook.get('owner'))
+                        for logbook in d['logbooks'] if logbook]
 
-            tags = [TagDecoder().dictToTag(tag) for tag in d.pop('tags')]
+            tags = [interner.tag(tag['name'], tag['state'])
+                    for tag in d['tags'] if tag]
 
-            properties = [PropertyDecoder().dictToProperty(property)
-                          for property in d.pop('properties')]
+            properties = [self._property_decoder.dictToProperty(property)
+                          for property in d['properties']]
 
-            return LogEntry(text=d.pop('description'),
-                            owner=d.pop('owner'),
+            return LogEntry(text=d['description'],
+                            owner=d['owner'],
                             logbooks=logbooks, tags=tags,
                             properties=properties,
-                            id=d.pop('id'),
-                            create_time=d.pop('createdDate'),
-                            modify_time=d.pop('modifiedDate'))
+                            id=d['id'],
+                            create_time=d['createdDate'],
+                            modify_time=d['modifiedDate'])
         else:
             return None
@@ -9,19 +9,26 @@ Created on Jan 10, 2013
 
 import os
 import mimetypes
-import string
 
 from .conf import _conf
+from .sanitize import get_sanitizer
 
 
 class LogEntry(object):
     """A LogEntry consists of some Text description, an owner and an
     associated logbook It can optionally be associated with one or more
     logbooks and contain one or more tags, properties and attachments
+
+    Log entries are equal if they have the same id. Log entries without
+    an id are only equal to themselves.
     """
+    __slots__ = ('text', 'owner', 'logbooks', 'tags', 'attachments',
+                 'properties', 'id', 'create_time', 'modify_time')
+
     def __init__(self, text=None, owner=None, logbooks=None,
                  tags=None, attachments=None, properties=None,
-                 id=None, create_time=None, modify_time=None):
+                 id=None, create_time=None, modify_time=None,
+                 sanitize=None):
         """ Constructor for log Entry
 
         :param text: Text of log entry
@@ -38,6 +45,9 @@ class LogEntry(object):
         :type properties: list of properties objects
         :param id: numerical id of log entry
         :type id: integer
+        :param sanitize: policy used to clean the text, see pyOlog.sanitize
+                         (default from the config file, or 'ascii')
+        :type sanitize: string or callable
 
         Example:
 
@@ -55,31 +65,30 @@ class LogEntry(object):
                      attachments=[Attachment(open('databrowser.plt'))]
                      )
         """
+        defaults = _conf.resolved()
         if text is not None:
-            text = ''.join(c for c in text if c in string.printable)
+            if sanitize is None:
+                sanitize = defaults.text_policy
+            text = get_sanitizer(sanitize)(text)
         else:
             text = ''
         self.text = text.strip()
-        self.owner = _conf.get_value('username', owner)
+        self.owner = owner if owner is not None else defaults.username
 
         if self.owner is None:
             raise ValueError("You must specify an owner")
 
         if logbooks is None:
-            logbooks = _conf.get_value('logbooks')
-            if logbooks is None:
+            if defaults.logbooks is None:
                 raise ValueError("You must specify a logbook")
 
-            self.logbooks = [Logbook(n) for n in logbooks.split(',')]
+            self.logbooks = [Logbook(n, defaults.owner)
+                             for n in defaults.logbooks]
         else:
             self.logbooks = logbooks
 
         if tags is None:
-            tags = _conf.get_value('tags')
-            if tags is not None:
-                self.tags = [Tag(n) for n in tags.split(',')]
-            else:
-                self.tags = []
+            self.tags = [Tag(n) for n in defaults.tags]
         else:
             self.tags = tags
 
@@ -97,20 +106,33 @@ class LogEntry(object):
         self.create_time = create_time
         self.modify_time = modify_time
 
-    def __cmp__(self, *arg, **kwargs):
-        if arg[0] is None:
-            return 1
-        if self._id:
-            return cmp((self.id), (arg[0].id))
-        else:
-            raise ValueError('Invalid LogEntry: id cannot be None')
+    def __eq__(self, other):
+        if not isinstance(other, LogEntry):
+            return NotImplemented
+        if self.id is None or other.id is None:
+            return self is other
+        return self.id == other.id
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        if self.id is None:
+            return object.__hash__(self)
+        return hash(self.id)
 
 
 class Logbook(object):
     """ A Logbook consist of an unique name and an owner,
     logentries can be added to a logbook so long as the user either the owner
     or a member of the owner group
+
+    Logbooks are equal if they have the same name and owner.
     """
+    __slots__ = ('name', 'owner', 'active')
 
     def __init__(self, name, owner=None, active=True):
         """ Create logbook object
@@ -130,18 +152,30 @@ class Logbook(object):
         >> Logbook('commissioning', 'controls')
         """
         self.name = '{}'.format(name).strip()
-        self.owner = _conf.get_owner(owner)
+        self.owner = owner if owner is not None else _conf.resolved().owner
         self.active = active
 
-    def __cmp__(self, *arg, **kwargs):
-        if arg[0] is None:
-            return 1
-        return cmp((self.name, self.owner), (arg[0].name, arg[0].owner))
+    def __eq__(self, other):
+        if not isinstance(other, Logbook):
+            return NotImplemented
+        return (self.name, self.owner) == (other.name, other.owner)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self.name, self.owner))
 
 
 class Tag(object):
     """ A Tag consists of a unique name, it is used to tag log entries
+
+    Tags are equal if they have the same name and state.
     """
+    __slots__ = ('name', 'state')
 
     def __init__(self, name, active=True):
         """
@@ -173,10 +207,19 @@ class Tag(object):
         else:
             self.state = 'Inactive'
 
-    def __cmp__(self, *arg, **kwargs):
-        if arg[0] is None:
-            return 1
-        return cmp((self.name, self.state), (arg[0].name, arg[0].state))
+    def __eq__(self, other):
+        if not isinstance(other, Tag):
+            return NotImplemented
+        return (self.name, self.state) == (other.name, other.state)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self.name, self.state))
 
 
 class Attachment(object):
@@ -184,6 +227,7 @@ class Attachment(object):
     a file associated with the log entry. This object contains filename and
     mime-type information about the attachment.
     """
+    __slots__ = ('file', 'filename', 'mime_type')
     default_mime_type = 'application/octet-stream'
 
     def __init__(self, file, filename=None, mime_type=None):
@@ -222,14 +266,88 @@ class Attachment(object):
             mtype = mimetypes.guess_type(basename)[0]
             if mtype is None:
                 mtype = self.default_mime_type
+        else:
+            mtype = self.mime_type
         return (basename, self.file, mtype)
 
 
+class LazyAttachment(Attachment):
+    """ An Attachment of a log entry in the Olog. Only the filename and the
+    metadata from the attachment listing are held, the contents are
+    downloaded the first time the file is read and kept afterwards.
+    """
+    __slots__ = ('_fetch', '_file', 'url', 'metadata')
+
+    def __init__(self, filename, fetch, url=None, mime_type=None,
+                 metadata=None):
+        """ Create LazyAttachment
+
+        :param filename: Filename of attachment
+        :type filename: String
+        :param fetch: Callable returning the contents of the attachment
+        :type fetch: callable
+        :param url: URL of the attachment
+        :type url: String
+        :param mime_type: Mime-type of attachment
+        :type mime_type: String
+        :param metadata: Other fields of the attachment listing
+        :type metadata: dict
+        """
+        self._fetch = fetch
+        self._file = None
+        self.url = url
+        self.metadata = metadata if metadata is not None else {}
+        super(LazyAttachment, self).__init__(None, filename, mime_type)
+
+    @property
+    def file(self):
+        if self._file is None:
+            self._file = self._fetch()
+        return self._file
+
+    @file.setter
+    def file(self, value):
+        self._file = value
+
+    @property
+    def loaded(self):
+        """True if the contents have been downloaded"""
+        return self._file is not None
+
+
+class StreamingAttachment(Attachment):
+    """ An Attachment read from a stream, such as the output of a process,
+    which is sent to the Olog in chunks as it is read instead of being
+    held in memory. The stream can only be read once and is closed after
+    the upload.
+    """
+    __slots__ = ('chunk_size',)
+
+    def __init__(self, file, filename, mime_type=None, chunk_size=1 << 16):
+        """ Create StreamingAttachment
+
+        :param file: Readable file object
+        :type file: file object
+        :param filename: Filename of attachment
+        :type filename: String
+        :param mime_type: Mime-type of attachment
+        :type mime_type: String
+        :param chunk_size: Number of bytes read from the stream at a time
+        :type chunk_size: int
+        """
+        super(StreamingAttachment, self).__init__(file, filename, mime_type)
+        self.chunk_size = chunk_size
+
+
 class Property(object):
     """ A class representation of an Olog property. A property consists of
     a unique name and a set of attributes consisting of key value pairs.
     The ket value pairs are represented as a dictionary.
+
+    Properties are equal if they have the same name and attribute names.
     """
+    __slots__ = ('name', 'attributes')
+
     def __init__(self, name, attributes=None):
         """ Create a property with a unique name and attributes
 
@@ -252,8 +370,19 @@ class Property(object):
     def attribute_names(self):
         return self.attributes.keys()
 
-    def __cmp__(self, *arg, **kwargs):
-        if arg[0] is None:
-            return 1
-        return cmp((self.name, set(self.attributes)),
-                   (arg[0].name, set(arg[0].attributes)))
+    def _key(self):
+        return (self.name, frozenset(self.attributes or ()))
+
+    def __eq__(self, other):
+        if not isinstance(other, Property):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(self._key())
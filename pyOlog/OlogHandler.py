@@ -1,25 +1,155 @@
+import copy
 import logging
-from SimpleOlogClient import SimpleOlogClient
+import threading
+import time
+
+from six.moves import queue
+
+from .OlogClient import LogManyError
+from .SimpleOlogClient import SimpleOlogClient
+
+logger = logging.getLogger(__name__)
 
 
 class OlogHandler(logging.Handler):
 
-    def __init__(self, logbooks=None, tags=None):
+    def __init__(self, logbooks=None, tags=None, queued=False,
+                 queue_size=1000, block=False, batch_size=50,
+                 flush_interval=1.0):
         """Initialize the ologhandler
 
         :param logbooks: list of strings of logbooks to add messages to
         :param tags: list of strings of tags to add to all messages
+        :param queued: If True, records are put on a queue and sent to the
+                       Olog in batches by a background thread.
+        :param queue_size: Maximum number of records waiting to be sent.
+        :param block: If True, emit waits for room on a full queue,
+                      otherwise the record is dropped.
+        :param batch_size: Maximum number of records sent in one request.
+        :param flush_interval: Seconds the worker waits to fill a batch.
         """
         super(OlogHandler, self).__init__()
         self.session = SimpleOlogClient()
         self.logbooks = logbooks
         self.tags = tags
 
+        self.queued = queued
+        self.block = block
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue = None
+        self._worker = None
+        if queued:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._worker = threading.Thread(target=self._run,
+                                            name='OlogHandler')
+            self._worker.daemon = True
+            self._worker.start()
+
     def emit(self, record):
+        if self.queued:
+            try:
+                record = self.prepare(record)
+            except Exception:
+                self.failed += 1
+                self.handleError(record)
+                return
+            self._enqueue(record)
+            return
+
         try:
             msg = self.format(record)
             self.session.log(msg,
                              logbooks=self.logbooks,
                              tags=self.tags)
+            self.sent += 1
         except:
             self.handleError(record)
+
+    def prepare(self, record):
+        """Return a copy of the record holding its formatted message
+
+        The message is formatted in the thread logging the record, as its
+        args may have changed and its exception be handled by the time
+        the worker thread sends it.
+        """
+        msg = self.format(record)
+        record = copy.copy(record)
+        record.message = msg
+        record.msg = msg
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+    def _enqueue(self, record):
+        try:
+            self._queue.put(record, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        """Drain the queue into batches until the sentinel is received"""
+        running = True
+        while running:
+            record = self._queue.get()
+            if record is None:
+                self._queue.task_done()
+                break
+
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        record = self._queue.get(timeout=timeout)
+                    else:
+                        record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    running = False
+                    self._queue.task_done()
+                    break
+                batch.append(record)
+
+            self._send(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _send(self, records):
+        entries = [{'text': record.getMessage(),
+                    'logbooks': self.logbooks,
+                    'tags': self.tags} for record in records]
+        try:
+            self.session.log_many(entries, chunk_size=self.batch_size)
+        except LogManyError as e:
+            self.sent += len(e.ids)
+            self.failed += len(entries) - len(e.ids)
+            logger.error("Failed to send %d records to the Olog: %s",
+                         len(entries) - len(e.ids), e.error,
+                         exc_info=e.error)
+        except Exception:
+            self.failed += len(entries)
+            logger.exception("Failed to send %d records to the Olog",
+                             len(entries))
+        else:
+            self.sent += len(entries)
+
+    def flush(self):
+        """Wait until all queued records have been sent"""
+        if self.queued and self._worker.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Send the queued records and stop the worker thread"""
+        if self.queued and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        super(OlogHandler, self).close()
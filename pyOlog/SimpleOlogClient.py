@@ -6,6 +6,7 @@ A simple API to the Olog client in python
 
 import io
 import six
+from collections import OrderedDict
 from .OlogClient import OlogClient
 from .OlogDataTypes import LogEntry, Logbook, Tag, Attachment, Property
 
@@ -48,6 +49,86 @@ def logentry_to_dict(log):
     return rtn
 
 
+def logentries_to_columns(log_entries):
+    """Convert log entries to columns of NumPy arrays
+
+    Parameters
+    ----------
+    log_entries : iterable of LogEntry
+        The log entries, for example the result of `OlogClient.find`.
+
+    Returns
+    -------
+    OrderedDict
+        Maps the column names to arrays with one row per log entry. The
+        columns are
+
+        id
+            int64 id of the log entry.
+        create_time, modify_time
+            datetime64[ms], NaT when not known.
+        owner, text
+            object arrays of strings.
+        logbooks.<name>, tags.<name>
+            bool, one column per logbook and tag, True when the log
+            entry is in the logbook or has the tag.
+        <property>.<attribute>
+            object arrays of the attribute values, None when the log
+            entry does not have the property.
+    """
+    import numpy as np
+
+    nat = np.iinfo(np.int64).min
+    ids, create_times, modify_times, owners, texts = [], [], [], [], []
+    categories = OrderedDict((('logbooks', OrderedDict()),
+                              ('tags', OrderedDict())))
+    members = dict((kind, []) for kind in categories)
+    attributes = OrderedDict()
+
+    for row, log in enumerate(log_entries):
+        ids.append(log.id)
+        create_times.append(nat if log.create_time is None
+                            else log.create_time)
+        modify_times.append(nat if log.modify_time is None
+                            else log.modify_time)
+        owners.append(log.owner)
+        texts.append(log.text)
+        for kind, items in (('logbooks', log.logbooks), ('tags', log.tags)):
+            columns = categories[kind]
+            for item in items:
+                col = columns.setdefault(item.name, len(columns))
+                members[kind].append((row, col))
+        for prop in log.properties:
+            for name in prop.attribute_names:
+                key = '{}.{}'.format(prop.name, name)
+                attributes.setdefault(key, {})[row] = prop.attributes[name]
+
+    n = len(ids)
+    columns = OrderedDict()
+    columns['id'] = np.array(ids, dtype=np.int64)
+    columns['create_time'] = np.array(create_times, dtype=np.int64).view(
+        'datetime64[ms]')
+    columns['modify_time'] = np.array(modify_times, dtype=np.int64).view(
+        'datetime64[ms]')
+    columns['owner'] = np.array(owners, dtype=object)
+    columns['text'] = np.array(texts, dtype=object)
+
+    for kind, names in categories.items():
+        table = np.zeros((n, len(names)), dtype=bool)
+        if members[kind]:
+            rows, cols = zip(*members[kind])
+            table[list(rows), list(cols)] = True
+        for name, col in names.items():
+            columns['{}.{}'.format(kind, name)] = table[:, col]
+
+    for key, values in attributes.items():
+        column = np.full(n, None, dtype=object)
+        column[list(values)] = list(values.values())
+        columns[key] = column
+
+    return columns
+
+
 class SimpleOlogClient(object):
     """
     Client interface to Olog
@@ -221,6 +302,79 @@ class SimpleOlogClient(object):
         results = self.session.find(**kwargs)
         return [logentry_to_dict(result) for result in results]
 
+    def find_frame(self, dataframe=True, **kwargs):
+        """Find log entries and return them as columns
+
+        Takes the same search criteria as `find`. Each log entry is a
+        row, see `logentries_to_columns` for the columns.
+
+        Parameters
+        ----------
+        dataframe : bool, optional
+            If True, return a pandas DataFrame, in which owner is a
+            categorical column. If False, return the NumPy arrays.
+
+        Returns
+        -------
+        pandas.DataFrame or OrderedDict
+            The log entries matching the search criteria.
+
+        Raises
+        ------
+        ImportError
+            If numpy, or pandas when dataframe is True, is not
+            installed.
+
+        Examples
+        --------
+        Count the log entries per day with a tag matching "magnets"::
+
+        >>>soc = SimpleOlogClient()
+        >>>frame = soc.find_frame(tag='magnets')
+        >>>frame.groupby(frame.create_time.dt.date).size()
+
+        """
+        if dataframe:
+            import pandas as pd
+
+        columns = logentries_to_columns(self.session.find(**kwargs))
+        if not dataframe:
+            return columns
+
+        frame = pd.DataFrame(columns)
+        frame['owner'] = frame['owner'].astype('category')
+        return frame
+
+    def iter_find(self, page_size=100, **kwargs):
+        """Iterate over log entries
+
+        Find (search) for log entries based on keyword arguments, fetching
+        the results from the Olog one page at a time.
+
+        Parameters
+        ----------
+        page_size : int
+            Number of log entries fetched in each request.
+
+        The other keyword arguments are the same as for `find`.
+
+        Yields
+        ------
+        dictionary
+            Dictionary of a logbook entry matching seach criteria.
+
+        Examples
+        --------
+        Print the ids of all log entries with a tag matching "magnets"::
+
+        >>>soc = SimpleOlogClient()
+        >>>for result in soc.iter_find(tag='magnets'):
+        ...    print(result['id'])
+
+        """
+        for result in self.session.iter_find(page_size=page_size, **kwargs):
+            yield logentry_to_dict(result)
+
     def log(self, text=None, logbooks=None, tags=None, properties=None,
             attachments=None, verify=True, ensure=False):
         """ Create log entry.
@@ -264,6 +418,56 @@ class SimpleOlogClient(object):
                                       attachments, verify, ensure)
         return self.session.log(log_entry)
 
+    def log_many(self, entries, verify=True, ensure=False, chunk_size=100):
+        """Create many log entries.
+
+        Create log entries in the Olog instance, posting up to
+        `chunk_size` entries in each request.
+
+        Parameters
+        ----------
+        entries : list of dicts or strings
+            The log entries to create. Each dict holds the keyword
+            arguments `text`, `logbooks`, `tags`, `properties` and
+            `attachments` as accepted by `log`. A string is used as the
+            text of an entry with the default logbooks and tags.
+        verify : bool
+            Check that properties, tags and logbooks are in the Olog
+            instance.
+        ensure : bool
+            If a property, tag or logbook is not in the Olog then
+            create the property, tag or logbook before making the log
+            entries. Seting ensure to True will set verify to False.
+        chunk_size : int
+            Maximum number of log entries posted in a single request.
+
+        Raises
+        ------
+
+        ValueError
+            If the property, tag or logbook does not exist and ensure is
+            True.
+        LogManyError
+            If creating the log entries failed. Its `ids` attribute holds
+            the ids of the log entries created before the failure.
+
+        Returns
+        -------
+        list
+            The ids of the log entries created, in the order of `entries`,
+            None for the log entries written to the spool.
+
+        """
+        log_entries = []
+        for entry in entries:
+            if isinstance(entry, six.string_types):
+                entry = {'text': entry}
+            log_entries.append(self._build_entry(
+                entry.get('text'), entry.get('logbooks'), entry.get('tags'),
+                entry.get('properties'), entry.get('attachments'),
+                verify, ensure))
+        return self.session.log_many(log_entries, chunk_size=chunk_size)
+
     def update(self, log_id, text=None, logbooks=None, tags=None,
                properties=None, attachments=None, verify=True, ensure=False):
         """Update an existing log entry. This OVERWRITES; it does not append.
@@ -321,9 +525,11 @@ class SimpleOlogClient(object):
             if isinstance(attachments, (Attachment, io.IOBase)):
                 attachments = [attachments]
 
+        vocabulary = self.session.vocabulary
+
         if logbooks:
             for x in logbooks:
-                if x not in self.logbooks:
+                if not vocabulary.contains('logbooks', x):
                     if ensure:
                         self.create_logbook(x)
                     if verify:
@@ -334,7 +540,7 @@ class SimpleOlogClient(object):
 
         if tags:
             for x in tags:
-                if x not in self.tags:
+                if not vocabulary.contains('tags', x):
                     if ensure:
                         self.create_tag(x)
                     if verify:
@@ -345,7 +551,7 @@ class SimpleOlogClient(object):
 
         if properties:
             for x, y in properties.items():
-                if x not in self.properties:
+                if not vocabulary.contains('properties', x):
                     if ensure:
                         self.create_property(x, y.keys())
                     if verify:
@@ -1,5 +1,6 @@
 import logging
 import sys
+import types
 logger = logging.getLogger("pyOlog")
 logger.setLevel(logging.CRITICAL)
 
@@ -11,6 +12,51 @@ handler.setFormatter(formatter)
 
 logger.addHandler(handler)
 
-from .OlogDataTypes import LogEntry, Logbook, Tag, Property, Attachment
-from .OlogClient import OlogClient
-from .SimpleOlogClient import SimpleOlogClient
+# The clients pull in requests, keyring and aiohttp, which are slow to
+# import. They are imported when first used, see PEP 562.
+_lazy = {'LogEntry': 'OlogDataTypes',
+         'Logbook': 'OlogDataTypes',
+         'Tag': 'OlogDataTypes',
+         'Property': 'OlogDataTypes',
+         'Attachment': 'OlogDataTypes',
+         'LazyAttachment': 'OlogDataTypes',
+         'StreamingAttachment': 'OlogDataTypes',
+         'OlogClient': 'OlogClient',
+         'AttachmentUploadError': 'OlogClient',
+         'LogManyError': 'OlogClient',
+         'SimpleOlogClient': 'SimpleOlogClient',
+         'AsyncOlogClient': 'AsyncOlogClient'}
+
+__all__ = sorted(_lazy)
+
+
+class _Package(types.ModuleType):
+    """The pyOlog module, keeping the exported names bound to the classes
+
+    Importing a submodule binds it as an attribute of the package. The
+    OlogClient, SimpleOlogClient and AsyncOlogClient submodules would then
+    hide the classes of the same name.
+    """
+
+    def __setattr__(self, name, value):
+        if name in _lazy and isinstance(value, types.ModuleType):
+            return
+        super(_Package, self).__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __getattr__(name):
+    if name in _lazy:
+        import importlib
+        module = importlib.import_module('.' + _lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}"
+                         .format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -0,0 +1,218 @@
+"""
+Content addressed cache of downloaded attachments.
+
+Attachments are stored once per content, under the SHA-256 of their
+data, and found through a key made of the log entry id, the filename
+and a version (the modification time of the log entry, or the size of
+the attachment when it is not known). An SQLite index holds the keys
+and the last use of every file, and the least recently used files are
+removed when the cache grows over its byte budget.
+
+Files are written to a temporary file and renamed into place, so that
+processes sharing the cache never see a partial file. Cached files are
+handed out as open files or read-only memory maps rather than being
+read into memory.
+"""
+
+import os
+import mmap
+import time
+import hashlib
+import logging
+import sqlite3
+import tempfile
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+_schema = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keys (
+    key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_used ON blobs (used);
+CREATE INDEX IF NOT EXISTS keys_hash ON keys (hash);
+"""
+
+
+def attachment_key(log_id, filename, version=None):
+    """Key of an attachment in the cache
+
+    :param log_id: Id of the log entry holding the attachment.
+    :param filename: Filename of the attachment.
+    :param version: Changes when the attachment may have changed, the
+                    modification time of the log entry or the size of
+                    the attachment.
+    """
+    return '{}/{}@{}'.format(log_id, filename, version)
+
+
+class AttachmentCache(object):
+    """On disk cache of attachments with a byte budget
+
+    :param path: Directory of the cache. It is created if it does not
+                 exist.
+    :param max_bytes: Total size of the cached files above which the
+                      least recently used ones are removed.
+    """
+
+    def __init__(self, path, max_bytes=1 << 30):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = int(max_bytes)
+        self._objects = os.path.join(self.path, 'objects')
+        if not os.path.isdir(self._objects):
+            os.makedirs(self._objects)
+        self._db = os.path.join(self.path, 'index.db')
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_schema)
+
+    def _connect(self):
+        return sqlite3.connect(self._db, timeout=30)
+
+    def _blob_path(self, hash):
+        return os.path.join(self._objects, hash[:2], hash)
+
+    def status(self):
+        """Number of keys and files and total size of the cache"""
+        with closing(self._connect()) as conn:
+            files, size = conn.execute(
+                'SELECT COUNT(*), TOTAL(size) FROM blobs').fetchone()
+            keys = conn.execute('SELECT COUNT(*) FROM keys').fetchone()[0]
+        return {'keys': keys, 'files': files, 'bytes': int(size),
+                'max_bytes': self.max_bytes}
+
+    def open(self, key, use_mmap=False):
+        """Open the cached file for key
+
+        :param key: Key made by attachment_key.
+        :param use_mmap: If True, return a read-only mmap instead of a
+                         file opened for binary reading.
+        :returns: The file or mmap, or None if key is not cached.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT hash FROM keys WHERE key = ?',
+                               (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                f = open(self._blob_path(row[0]), 'rb')
+            except (IOError, OSError):
+                # Removed by another process
+                with conn:
+                    conn.execute('DELETE FROM keys WHERE key = ?', (key,))
+                return None
+            with conn:
+                conn.execute('UPDATE blobs SET used = ? WHERE hash = ?',
+                             (time.time(), row[0]))
+        return self._hand_out(f, use_mmap)
+
+    def _hand_out(self, f, use_mmap):
+        if not use_mmap or os.fstat(f.fileno()).st_size == 0:
+            return f
+        with f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def store(self, key, chunks):
+        """Write the data of an attachment to the cache
+
+        :param key: Key made by attachment_key.
+        :param chunks: Iterable of the contents as bytes.
+        :returns: The SHA-256 of the contents.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self._objects, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            hash = digest.hexdigest()
+            path = self._blob_path(hash)
+            if not os.path.isdir(os.path.dirname(path)):
+                try:
+                    os.makedirs(os.path.dirname(path))
+                except OSError:
+                    if not os.path.isdir(os.path.dirname(path)):
+                        raise
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)',
+                             (hash, size, time.time()))
+                conn.execute('INSERT OR REPLACE INTO keys VALUES (?, ?)',
+                             (key, hash))
+        logger.debug("Cached attachment %s (%d bytes)", key, size)
+        self.evict(keep=hash)
+        return hash
+
+    def fetch(self, key, download, use_mmap=False):
+        """Open the cached file for key, downloading it on a miss
+
+        :param key: Key made by attachment_key.
+        :param download: Callable returning the contents as an iterable
+                         of bytes.
+        :param use_mmap: If True, return a read-only mmap.
+        :returns: An open file or mmap of the attachment.
+        """
+        f = self.open(key, use_mmap)
+        if f is not None:
+            return f
+        hash = self.store(key, download())
+        try:
+            f = open(self._blob_path(hash), 'rb')
+        except (IOError, OSError):
+            # Evicted by another process in between
+            hash = self.store(key, download())
+            f = open(self._blob_path(hash), 'rb')
+        return self._hand_out(f, use_mmap)
+
+    def evict(self, max_bytes=None, keep=None):
+        """Remove the least recently used files over the byte budget
+
+        :param max_bytes: Budget to evict down to, default max_bytes.
+        :param keep: Hash of a file which is not removed.
+        :returns: Number of bytes removed.
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        removed = 0
+        with closing(self._connect()) as conn:
+            with conn:
+                total = conn.execute(
+                    'SELECT TOTAL(size) FROM blobs').fetchone()[0]
+                if total <= max_bytes:
+                    return 0
+                evicted = []
+                for hash, size in conn.execute(
+                        'SELECT hash, size FROM blobs ORDER BY used'):
+                    if total - removed <= max_bytes:
+                        break
+                    if hash == keep:
+                        continue
+                    evicted.append(hash)
+                    removed += size
+                for hash in evicted:
+                    conn.execute('DELETE FROM keys WHERE hash = ?', (hash,))
+                    conn.execute('DELETE FROM blobs WHERE hash = ?', (hash,))
+            # Files still open elsewhere stay readable until closed
+            for hash in evicted:
+                try:
+                    os.unlink(self._blob_path(hash))
+                except OSError:
+                    pass
+        logger.debug("Evicted %d attachments, %d bytes", len(evicted),
+                     removed)
+        return removed
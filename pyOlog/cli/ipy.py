@@ -1,13 +1,21 @@
 from __future__ import print_function
 
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 from IPython.core.magic import Magics, magics_class, line_magic
 from IPython.utils.io import capture_output
 
 from .. import SimpleOlogClient
-from .utils import save_pyplot_figure, get_screenshot, get_text_from_editor
+from .utils import (render_pyplot_figure, encode_pyplot_figure,
+                    save_pyplot_vector, get_screenshot, get_text_from_editor)
 
 olog_client = SimpleOlogClient()
 
+# Arguments of olog_savefig passed onto olog
+_olog_kwargs = ('msg', 'edit', 'logbooks', 'tags', 'attachments')
+_encoder = None
+
 
 def olog(msg=None, edit=False, logbooks=None, tags=None,
          attachments=None, **kwargs):
@@ -29,25 +37,65 @@ def olog(msg=None, edit=False, logbooks=None, tags=None,
     return
 
 
-def olog_savefig(**kwargs):
-    """Save a pyplot figure and place it in tho Olog
+def _get_encoder():
+    """Thread encoding figures and making their log entries"""
+    global _encoder
+    if _encoder is None:
+        _encoder = ThreadPoolExecutor(max_workers=1)
+    return _encoder
 
-    The **kwargs are all passed onto the :func savefig: function
-    and then onto the :func olog" function
 
-    :returns: None
+def _report_failure(future):
+    if future.exception() is not None:
+        print("Failed to place the figure in the Olog: {}"
+              .format(future.exception()), file=sys.stderr)
+
+
+def olog_savefig(vector=None, wait=False, return_future=False, **kwargs):
+    """Save a pyplot figure and place it in tho Olog
+
+    The figure is rendered straight away. Encoding the images and making
+    the log entry is done in a background thread, so that the prompt
+    returns before the upload is done.
+
+    The msg, edit, logbooks, tags and attachments **kwargs are passed
+    onto the :func olog: function, the others onto the :func savefig:
+    function.
+
+    :param vector: Format of a vector copy of the figure to attach as
+                   well, such as 'pdf'.
+    :param wait: If True, return once the log entry is made. Otherwise
+                 a failure is printed once the background thread is done.
+    :param return_future: If True, return the Future of the log entry.
+    :returns: None, or the Future of the log entry if
+              :param return_future: is True.
     """
-    fig = save_pyplot_figure(**kwargs)
-    if 'attachments' in kwargs:
-        if isinstance(kwargs['attachments'], list):
-            kwargs['attachments'].append(fig)
-        else:
-            kwargs['attachments'] = [kwargs['attatchments'], fig]
+    log_kwargs = dict((k, kwargs.pop(k)) for k in _olog_kwargs
+                      if k in kwargs)
+    if not log_kwargs.get('msg'):
+        # The editor is opened before returning to the prompt
+        log_kwargs['msg'] = get_text_from_editor()
+
+    attachments = log_kwargs.pop('attachments', None) or []
+    if isinstance(attachments, list):
+        attachments = list(attachments)
     else:
-        kwargs['attachments'] = fig
-
-    olog(**kwargs)
-    return
+        attachments = [attachments]
+    if vector:
+        attachments.append(save_pyplot_vector(vector, **kwargs))
+    rgba, size, dpi = render_pyplot_figure(**kwargs)
+
+    def make_entry():
+        attachments.extend(encode_pyplot_figure(rgba, size, dpi))
+        olog(attachments=attachments, **log_kwargs)
+
+    future = _get_encoder().submit(make_entry)
+    if wait:
+        future.result()
+    else:
+        future.add_done_callback(_report_failure)
+    if return_future:
+        return future
 
 
 def olog_grab(root=False, **kwargs):
@@ -2,11 +2,12 @@
 from __future__ import print_function
 
 import sys
+import time
+import itertools
 
 import argparse
 
 from .. import Attachment
-from .. import SimpleOlogClient
 from .utils import get_screenshot, get_text_from_editor
 
 description = """\
@@ -108,14 +109,162 @@ def olog():
     else:
         text = args.text
 
+    from .. import SimpleOlogClient
     c = SimpleOlogClient(args.url, args.username, args.passwd)
     c.log(text, logbooks=args.logbooks, tags=args.tags,
           attachments=attachments)
 
 
+def spool(argv=None):
+    """Command line utility to inspect and flush the log entry spool, and
+    to drop or retry the entries the Olog refused"""
+    from .. import OlogClient
+    from ..conf import _conf
+    from ..spool import Spool
+
+    parser = argparse.ArgumentParser(prog='olog spool',
+                                     description="Inspect or flush the "
+                                     "spool of unsent log entries, drop or "
+                                     "retry the failed ones.")
+    parser.add_argument('action', choices=['status', 'flush', 'drop',
+                                           'retry'])
+    parser.add_argument('seqs', nargs='*', type=int, metavar='SEQ',
+                        help="Failed entries to drop or retry "
+                        "(default all)")
+    parser.add_argument('-d', '--dir', dest='spool', default=None,
+                        help="Spool directory (default from config file)")
+    parser.add_argument('-u', '--user', dest='username',
+                        default=None,
+                        help="Username for Olog Access")
+    parser.add_argument('--url', dest='url',
+                        help="Base URL for Olog Access",
+                        default=None)
+    parser.add_argument('-p', '--passwd', dest='passwd',
+                        help="Password for logging entry",
+                        default=None)
+    args = parser.parse_args(argv)
+
+    path = _conf.get_value('spool', args.spool)
+    if path is None:
+        parser.error("No spool directory configured")
+    s = Spool(path)
+
+    if args.action == 'status':
+        status = s.status()
+        print("Spool       : {}".format(s.path))
+        print("Entries     : {entries}".format(**status))
+        print("Attachments : {attachments} ({bytes} bytes)".format(**status))
+        if status['oldest'] is not None:
+            print("Oldest      : {}".format(time.ctime(status['oldest'])))
+        if status['last_error']:
+            print("Attempts    : {attempts}".format(**status))
+            print("Last error  : {last_error}".format(**status))
+        if status['failed']:
+            print("Failed      : {failed}".format(**status))
+            for entry in s.failed():
+                print("  {:>5} {} ({} attempts) {}".format(
+                    entry['seq'], time.ctime(entry['created']),
+                    entry['attempts'], entry['last_error']))
+        return
+
+    seqs = args.seqs or None
+    if args.action == 'drop':
+        print("Dropped {} failed log entries".format(s.drop(seqs)))
+        return
+    if args.action == 'retry':
+        print("{} failed log entries will be sent again".format(
+            s.retry(seqs)))
+        return
+
+    c = OlogClient(args.url, args.username, args.passwd)
+    ids = s.flush(c)
+    print("Sent {} log entries, {} left in spool".format(len(ids), len(s)))
+
+
+def _format_entry(log_entry):
+    """One line summary of a log entry"""
+    if log_entry.create_time is not None:
+        created = time.strftime('%Y-%m-%d %H:%M:%S',
+                                time.localtime(log_entry.create_time / 1000.))
+    else:
+        created = '-'
+    lines = log_entry.text.splitlines() or ['']
+    return "{} {:>7} {} [{}] [{}] {}".format(
+        created, log_entry.id, log_entry.owner,
+        ','.join(l.name for l in log_entry.logbooks),
+        ','.join(t.name for t in log_entry.tags), lines[0])
+
+
+def tail(argv=None):
+    """Command line utility to print the latest log entries"""
+    from .. import OlogClient
+
+    parser = argparse.ArgumentParser(prog='olog tail',
+                                     description="Print the latest log "
+                                     "entries, and follow new ones.")
+    parser.add_argument('-f', '--follow', action='store_true',
+                        dest='follow',
+                        help="Keep printing log entries as they are made")
+    parser.add_argument('-n', '--lines', dest='lines', type=int, default=10,
+                        help="Number of log entries printed (default 10)")
+    parser.add_argument('-l', '--logbook', dest='logbook', default=None,
+                        help="Only log entries in this logbook")
+    parser.add_argument('-t', '--tag', dest='tag', default=None,
+                        help="Only log entries with this tag")
+    parser.add_argument('-s', '--search', dest='search', default=None,
+                        help="Only log entries with text matching this")
+    parser.add_argument('-i', '--interval', dest='interval', type=float,
+                        default=1.0,
+                        help="Seconds between polls while log entries "
+                        "arrive (default 1)")
+    parser.add_argument('-u', '--user', dest='username',
+                        default=None,
+                        help="Username for Olog Access")
+    parser.add_argument('--url', dest='url',
+                        help="Base URL for Olog Access",
+                        default=None)
+    parser.add_argument('-p', '--passwd', dest='passwd',
+                        help="Password for logging entry",
+                        default=None)
+    args = parser.parse_args(argv)
+
+    filters = dict((k, getattr(args, k)) for k in ('logbook', 'tag', 'search')
+                   if getattr(args, k) is not None)
+    c = OlogClient(args.url, args.username, args.passwd)
+
+    last = []
+    if args.lines > 0:
+        # The Olog returns the newest log entries first
+        found = c.iter_find(page_size=args.lines, **filters)
+        last = list(itertools.islice(found, args.lines))
+        found.close()
+        last.sort(key=lambda l: (l.create_time or 0, l.id))
+        for log_entry in last:
+            print(_format_entry(log_entry))
+        sys.stdout.flush()
+    if not args.follow:
+        return
+
+    printed = set(l.id for l in last)
+    created = [l.create_time for l in last if l.create_time is not None]
+    since = max(created) / 1000. if created else None
+    for log_entry in c.follow(since=since, min_interval=args.interval,
+                              **filters):
+        if log_entry.id in printed:
+            printed.discard(log_entry.id)
+            continue
+        print(_format_entry(log_entry))
+        sys.stdout.flush()
+
+
 def main():
     try:
-        olog()
+        if sys.argv[1:2] == ['spool']:
+            spool(sys.argv[2:])
+        elif sys.argv[1:2] == ['tail']:
+            tail(sys.argv[2:])
+        else:
+            olog()
     except KeyboardInterrupt:
         print('\nAborted.\n')
         sys.exit()
@@ -1,8 +1,10 @@
+import io
 import os
+import mimetypes
 import subprocess
 import tempfile
 
-from .. import Attachment
+from .. import Attachment, StreamingAttachment
 
 text_message = '''
 #
@@ -13,47 +15,202 @@ text_message = '''
 '''
 
 
-def save_pyplot_figure(**kwargs):
-    """Save a matplotlib figure to an Olog Attachment Object"""
+def render_pyplot_figure(fig=None, **kwargs):
+    """Render a matplotlib figure once to an RGBA image with Agg
+
+    :param fig: The figure, default the current pyplot figure.
+
+    The **kwargs are passed onto the :func savefig: function.
+
+    :returns: Tuple of the RGBA pixels as a BytesIO, the (width, height)
+              of the image and the dpi it was rendered at.
+    """
+    if fig is None:
+        import matplotlib.pyplot as plt
+        fig = plt.gcf()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    dpi = kwargs.pop('dpi', None)
+    if dpi in (None, 'figure'):
+        dpi = fig.dpi
+    kwargs.pop('format', None)
+
+    # Render with a temporary Agg canvas, as savefig does, keeping the
+    # renderer to know the size of the image.
+    canvas = fig.canvas
+    agg = FigureCanvasAgg(fig)
+    try:
+        buf = io.BytesIO()
+        agg.print_figure(buf, format='rgba', dpi=dpi, **kwargs)
+    finally:
+        fig.set_canvas(canvas)
+    size = (int(agg.renderer.width), int(agg.renderer.height))
+    return buf, size, dpi
+
+
+def encode_pyplot_figure(rgba, size, dpi, thumbnail_dpi=50):
+    """Encode a rendered figure as PNG attachments
+
+    This does not touch the figure and can run in another thread.
+
+    :param rgba: BytesIO of RGBA pixels from :func render_pyplot_figure:
+    :param size: (width, height) of the image.
+    :param dpi: dpi the figure was rendered at.
+    :param thumbnail_dpi: dpi of the thumbnail, it is made by averaging
+                          blocks of pixels of the image.
+    :returns: List of the plot and thumbnail Attachments.
+    """
+    from PIL import Image
+
+    image = Image.frombuffer('RGBA', size, rgba.getbuffer(), 'raw', 'RGBA',
+                             0, 1)
+    attachments = []
+    factor = max(1, int(round(float(dpi) / thumbnail_dpi)))
+    for filename, img in (('plot.png', image),
+                          ('thumbnail.png', image.reduce(factor))):
+        buf = io.BytesIO()
+        img.save(buf, format='png')
+        buf.seek(0)
+        attachments.append(Attachment(buf, filename, 'image/png'))
+    return attachments
+
+
+def save_pyplot_vector(vector='pdf', **kwargs):
+    """Save the current matplotlib figure in a vector format
+
+    :param vector: Format of the file, such as 'pdf' or 'svg'.
+
+    The **kwargs are passed onto the :func savefig: function.
+
+    :returns: Attachment holding the file.
+    """
     import matplotlib.pyplot as plt
-    import StringIO
 
-    imgdata = StringIO.StringIO()
-    plt.savefig(imgdata, format='pdf', **kwargs)
-    imgdata.seek(0)
+    buf = io.BytesIO()
+    plt.savefig(buf, format=vector, **kwargs)
+    buf.seek(0)
+    return Attachment(buf, 'plot.' + vector)
 
-    a = [Attachment(imgdata, 'plot.pdf')]
 
-    imgdata = StringIO.StringIO()
-    plt.savefig(imgdata, format='png', dpi=50,
-                **kwargs)
-    imgdata.seek(0)
+def save_pyplot_figure(vector=None, thumbnail_dpi=50, **kwargs):
+    """Save a matplotlib figure to Olog Attachment Objects
 
-    a.append(Attachment(imgdata, 'thumbnail.png'))
+    The figure is rendered once, the plot and the thumbnail PNG are
+    made from the same image.
 
-    return a
+    :param vector: Format of a vector copy of the figure to attach as
+                   well, such as 'pdf' or 'svg'. This renders the figure
+                   a second time.
+    :param thumbnail_dpi: dpi of the thumbnail.
 
+    The **kwargs are passed onto the :func savefig: function.
 
-def _get_screenshot(root=False, itype='png'):
-    """Open ImageMagick and get screngrab as png."""
+    :returns: List of Attachments, the vector copy first if requested.
+    """
+    attachments = []
+    if vector:
+        attachments.append(save_pyplot_vector(vector, **kwargs))
+
+    rgba, size, dpi = render_pyplot_figure(**kwargs)
+    attachments.extend(encode_pyplot_figure(rgba, size, dpi,
+                                            thumbnail_dpi=thumbnail_dpi))
+    return attachments
+
+
+def _screenshot_command(root=False, itype='png', quality=None):
+    """Arguments running ImageMagick import to grab the screen to stdout"""
+    args = ['import']
     if root:
-        opts = '-window root'
-    else:
-        opts = ''
-    image = subprocess.Popen('import {0} {1}:-'.format(opts, itype),
-                             shell=True,
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
-    stdout, stderr = image.communicate()
-    if stderr:
-        raise RuntimeError(f"Cannot capture a screenshot. "
-                           f"Reason: {stderr.decode()}")
-    return stdout
+        args.extend(['-window', 'root'])
+    if quality is not None:
+        args.extend(['-quality', str(int(quality))])
+    args.append('{}:-'.format(itype))
+    return args
+
+
+class _CaptureStream(io.RawIOBase):
+    """Standard output of a capture process, raising RuntimeError at the
+    end of the output if the process failed."""
+
+    def __init__(self, proc, stderr):
+        self._proc = proc
+        self._stderr = stderr
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._proc.stdout.readinto(b)
+        if not n:
+            self._check()
+        return n
+
+    def peek(self):
+        """Wait for the first output, the capture being done"""
+        if not self._proc.stdout.peek(1):
+            self._check()
+            raise RuntimeError("Cannot capture a screenshot. "
+                               "The capture gave no image.")
+
+    def _check(self):
+        returncode = self._proc.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode(errors='replace')
+        if returncode:
+            raise RuntimeError("Cannot capture a screenshot. "
+                               "Reason: {}".format(stderr or returncode))
+
+    def close(self):
+        if not self.closed:
+            self._proc.stdout.close()
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+            self._stderr.close()
+        super(_CaptureStream, self).close()
+
+
+def _start_screenshot(root=False, itype='png', quality=None):
+    """Start ImageMagick import, returning a stream of the image"""
+    stderr = tempfile.TemporaryFile()
+    proc = subprocess.Popen(_screenshot_command(root, itype, quality),
+                            stdout=subprocess.PIPE, stderr=stderr)
+    stream = _CaptureStream(proc, stderr)
+    try:
+        stream.peek()
+    except BaseException:
+        stream.close()
+        raise
+    return stream
+
+
+def _get_screenshot(root=False, itype='png', quality=None):
+    """Open ImageMagick and get screngrab as png."""
+    with _start_screenshot(root, itype, quality) as stream:
+        return stream.read()
+
 
+def get_screenshot(root=False, itype='png', quality=None, stream=False):
+    """Grab a screenshot as an Attachment
 
-def get_screenshot(root=False, itype='png'):
-    img = _get_screenshot(root=root, itype=itype)
-    return Attachment(img, 'screenshot.' + itype)
+    :param root: If True, the entire screen is grabbed else select an
+                 area as a rubber band.
+    :param itype: Image format written by ImageMagick, such as 'png' or
+                  'jpg'.
+    :param quality: Compression quality passed to ImageMagick (1-100).
+    :param stream: If True, the image is streamed from ImageMagick into
+                   the upload as a StreamingAttachment instead of being
+                   read into memory. It can only be sent once, so its
+                   upload is not retried, nor spooled if it fails.
+    :returns: The Attachment once the screen has been grabbed.
+    """
+    filename = 'screenshot.' + itype
+    mime_type = mimetypes.guess_type(filename)[0]
+    if not stream:
+        img = _get_screenshot(root=root, itype=itype, quality=quality)
+        return Attachment(img, filename, mime_type)
+    return StreamingAttachment(_start_screenshot(root, itype, quality),
+                               filename, mime_type)
 
 
 def get_text_from_editor(prepend=None, postpend=None):
@@ -92,9 +249,8 @@ def get_text_from_editor(prepend=None, postpend=None):
 def get_pyplot_fig(self, *args, **kwargs):
     """Save a matplotlib figure as an Attachment"""
     import matplotlib.pyplot as plt
-    import StringIO
 
-    imgdata = StringIO.StringIO()
+    imgdata = io.BytesIO()
     plt.savefig(imgdata, format='png', **kwargs)
     imgdata.seek(0)
 
@@ -0,0 +1,58 @@
+"""
+Compression of the request bodies sent to the Olog.
+
+The encodings are the HTTP Content-Encoding names 'gzip', 'deflate' and
+'zstd'. zstd needs the zstandard module.
+"""
+
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _gzip(data, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _deflate(data, level=6):
+    return zlib.compress(data, level)
+
+
+def _zstd(data, level=3):
+    import zstandard
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+_compressors = {'gzip': _gzip,
+                'deflate': _deflate,
+                'zstd': _zstd}
+
+
+def have_zstd():
+    """True if the zstandard module is installed"""
+    try:
+        import zstandard  # noqa
+    except ImportError:
+        return False
+    return True
+
+
+def get_compressor(encoding):
+    """Return the function compressing bytes for an encoding
+
+    :param encoding: 'gzip', 'deflate' or 'zstd'. True selects gzip.
+    :returns: Tuple of the encoding name and the function. zstd falls
+              back to gzip if zstandard is not installed.
+    """
+    if encoding is True:
+        encoding = 'gzip'
+    encoding = '{}'.format(encoding).lower()
+    if encoding == 'zstd' and not have_zstd():
+        logger.warning("zstandard is not installed, compressing with gzip")
+        encoding = 'gzip'
+    try:
+        return encoding, _compressors[encoding]
+    except KeyError:
+        raise ValueError("Unknown compression {!r}".format(encoding))
@@ -10,15 +10,29 @@ url=http://localhost:8000/Olog
 username=swilkins
 logbooks=Commissioning
 tags=pyOlog
+pool_maxsize=20
+get_timeout=4.2, 30
 """
 
 import os
 import os.path
+import time
 import logging
 import getpass
+from collections import namedtuple
 
 logger = logging.getLogger(__name__)
 
+Defaults = namedtuple('Defaults', ['username', 'owner', 'logbooks', 'tags',
+                                   'text_policy'])
+Defaults.__doc__ = """Defaults for new log entries resolved from the config
+
+username is the owner of log entries, owner the owner of logbooks, tags
+and properties. logbooks and tags are tuples of names, logbooks is None
+if no default logbook is configured. text_policy names the policy of
+pyOlog.sanitize used to clean the text of log entries.
+"""
+
 
 class Config(object):
     defaults = {'url': 'http://localhost:8181/Olog',
@@ -28,17 +42,82 @@ class Config(object):
                   os.path.expanduser('~/.pyOlog.conf'),
                   os.path.expanduser('~/.pyologrc'),
                   'pyOlog.conf']
+    # Seconds between checks of the config files for modifications
+    check_interval = 1.0
 
     def __init__(self, conf='DEFAULT'):
-        """Initialise config object"""
-        self.heading = conf
+        """Initialise config object
 
+        The config files are read when the first value is requested.
+        """
+        self.heading = conf
+        self._cf = None
+        self._mtimes = None
+        self._snapshot = None
+        self._next_check = 0
+
+    @property
+    def cf(self):
+        """The ConfigParser holding the contents of the config files"""
+        if self._cf is None:
+            self._cf = self._read()
+        return self._cf
+
+    def _stat(self):
+        mtimes = []
+        for f in self.conf_files:
+            try:
+                mtimes.append(os.stat(f).st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def _read(self):
         from six.moves import configparser
-        self.cf = configparser.ConfigParser(defaults=self.defaults)
-        files = self.cf.read(self.conf_files)
+        self._mtimes = self._stat()
+        cf = configparser.ConfigParser(defaults=self.defaults)
+        files = cf.read(self.conf_files)
 
         for f in files:
             logger.info("Read config file %s", f)
+        return cf
+
+    def resolved(self):
+        '''
+        Get the defaults for new log entries.
+
+        The defaults are resolved once and kept in an immutable snapshot.
+        The config files are checked for modifications at most every
+        check_interval seconds, the snapshot is rebuilt if one of them
+        changed.
+
+        :returns: Defaults
+        '''
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None:
+            if now < self._next_check:
+                return snapshot
+            self._next_check = now + self.check_interval
+            if self._stat() == self._mtimes:
+                return snapshot
+            logger.info("Config files changed, reloading")
+            self._cf = None
+
+        logbooks = self.get_value('logbooks')
+        if logbooks is not None:
+            logbooks = tuple(n for n in logbooks.split(','))
+        tags = self.get_value('tags')
+        tags = tuple(n for n in tags.split(',')) if tags is not None else ()
+        snapshot = Defaults(username=self.get_value('username'),
+                            owner=self.get_owner(),
+                            logbooks=logbooks,
+                            tags=tags,
+                            text_policy=self.get_value('text_policy')
+                            or 'ascii')
+        self._snapshot = snapshot
+        self._next_check = now + self.check_interval
+        return snapshot
 
     def get_value(self, arg, value=None):
         '''
@@ -62,6 +141,30 @@ class Config(object):
         else:
             return value
 
+    def get_timeout(self, arg, value=None, default=None):
+        '''
+        Get a timeout from the config file.
+
+        :param arg: Parameter to return
+        :param value: Value to check for.
+        :param default: Value returned if the config has no entry.
+
+        A timeout is written in the config file either as a single number
+        of seconds or as the connect and read timeouts separated by a
+        comma, for example "get_timeout = 4.2, 30".
+
+        :returns: float, tuple of floats or :param default:
+        '''
+        value = self.get_value(arg, value)
+        if value is None:
+            return default
+        if isinstance(value, str):
+            parts = [float(v) for v in value.split(',')]
+            if len(parts) == 1:
+                return parts[0]
+            return tuple(parts)
+        return value
+
     def get_username(self, value=None):
         """Get the username to be used"""
         if value is None:
@@ -0,0 +1,248 @@
+"""
+Cache of GET responses revalidated with conditional requests.
+
+The cache keeps the JSON read from a response together with its ETag
+and Last-Modified validators. The next GET of the same URL sends
+If-None-Match / If-Modified-Since, and when the Olog answers 304 Not
+Modified the cached JSON is used without transferring or parsing the
+body again. The client decodes it into new objects for every call, so
+the cached JSON is never handed to callers. A response with
+Cache-Control max-age is used without asking the Olog until it expires;
+no-store responses are not cached.
+
+OlogClient caches the tag, logbook and property listings. Search
+results are only cached when the client is made with cache_find, as
+each search keeps all its log entries in the cache.
+
+Entries are kept in an in-memory LRU and, optionally, in an SQLite
+database so that they survive the process.
+"""
+
+import re
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+_max_age = re.compile(r'(?:^|,)\s*(?:s-)?max-age\s*=\s*"?(\d+)', re.I)
+
+_schema = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    expires REAL NOT NULL,
+    used REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+"""
+
+
+class CachedResponse(object):
+    """JSON of a response with its validators
+
+    :ivar value: The JSON read from the response.
+    :ivar etag: ETag header of the response.
+    :ivar last_modified: Last-Modified header of the response.
+    :ivar expires: Time until which the value is used without asking
+                   the Olog.
+    """
+    __slots__ = ('value', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, value, etag=None, last_modified=None, expires=0):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires
+
+    def conditional_headers(self):
+        """Headers asking the Olog to answer 304 if nothing changed"""
+        headers = dict()
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def _expires(headers):
+    """Time until which a response may be used without revalidation
+
+    Returns None if the response must not be stored.
+    """
+    cache_control = headers.get('Cache-Control', '')
+    directives = cache_control.lower()
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    m = _max_age.search(cache_control)
+    if m:
+        return time.time() + int(m.group(1))
+    return 0
+
+
+class HttpCache(object):
+    """LRU cache of the JSON of GET responses
+
+    :param maxsize: Number of responses kept in memory.
+    :param path: SQLite database keeping the responses on disk. If None
+                 the cache is only kept in memory.
+    :param disk_maxsize: Number of responses kept on disk.
+    """
+
+    def __init__(self, maxsize=128, path=None, disk_maxsize=1024):
+        self.maxsize = int(maxsize)
+        self.disk_maxsize = int(disk_maxsize)
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        if path is not None:
+            with closing(self._connect()) as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_schema)
+
+    def _connect(self):
+        import sqlite3
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the CachedResponse for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.path is None:
+            return None
+
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT etag, last_modified, expires, value '
+                               'FROM responses WHERE key = ?',
+                               (key,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, expires, value = row
+        try:
+            value = pickle.loads(bytes(value))
+        except Exception as e:
+            logger.warning("Dropping unreadable cached response %s: %s",
+                           key, e)
+            self._delete(key)
+            return None
+        entry = CachedResponse(value, etag, last_modified, expires)
+        self._remember(key, entry)
+        return entry
+
+    def store(self, key, resp, value):
+        """Cache the JSON value read from the response resp
+
+        The value is only kept if the response can be revalidated or has
+        a max-age.
+
+        :returns: The CachedResponse, or None if it was not stored.
+        """
+        expires = _expires(resp.headers)
+        etag = resp.headers.get('ETag')
+        last_modified = resp.headers.get('Last-Modified')
+        if expires is None or (not expires and etag is None
+                               and last_modified is None):
+            self.invalidate(key)
+            return None
+
+        entry = CachedResponse(value, etag, last_modified, expires)
+        self._remember(key, entry)
+        if self.path is not None:
+            self._write(key, entry)
+        return entry
+
+    def refresh(self, key, entry, resp):
+        """Update an entry after the Olog answered 304 Not Modified"""
+        expires = _expires(resp.headers)
+        entry.expires = expires or 0
+        entry.etag = resp.headers.get('ETag', entry.etag)
+        entry.last_modified = resp.headers.get('Last-Modified',
+                                               entry.last_modified)
+        if self.path is not None:
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.execute('UPDATE responses SET etag = ?, '
+                                 'last_modified = ?, expires = ?, used = ? '
+                                 'WHERE key = ?',
+                                 (entry.etag, entry.last_modified,
+                                  entry.expires, time.time(), key))
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _write(self, key, entry):
+        import sqlite3
+        try:
+            value = pickle.dumps(entry.value, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug("Response %s is not cached on disk: %s", key, e)
+            return
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO responses '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             (key, entry.etag, entry.last_modified,
+                              entry.expires, time.time(),
+                              sqlite3.Binary(value)))
+                conn.execute('DELETE FROM responses WHERE key IN '
+                             '(SELECT key FROM responses ORDER BY used DESC '
+                             'LIMIT -1 OFFSET ?)', (self.disk_maxsize,))
+
+    def _delete(self, key):
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+
+    def invalidate(self, key=None):
+        """Drop the response for key, or all responses if key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        if self.path is not None:
+            with closing(self._connect()) as conn:
+                with conn:
+                    if key is None:
+                        conn.execute('DELETE FROM responses')
+                    else:
+                        conn.execute('DELETE FROM responses WHERE key = ?',
+                                     (key,))
+
+    def expire(self):
+        """Revalidate every response on its next use
+
+        Used after the client changed the Olog, the validators are kept
+        so unchanged responses are still answered with 304.
+        """
+        with self._lock:
+            for entry in self._entries.values():
+                entry.expires = 0
+        if self.path is not None:
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.execute('UPDATE responses SET expires = 0')
@@ -0,0 +1,100 @@
+"""
+Interning of the logbooks and tags of decoded log entries.
+
+Search results reference the same few logbooks and tags over and over.
+An InternTable hands out one shared, read-only instance for every
+distinct (name, owner) logbook and (name, state) tag so that decoding a
+large result does not build a new object for every reference.
+"""
+
+import threading
+from collections import OrderedDict
+
+from .OlogDataTypes import Logbook, Tag
+
+
+class InternedLogbook(Logbook):
+    """Read-only Logbook shared between decoded log entries
+
+    Copying or pickling gives a mutable Logbook.
+    """
+    __slots__ = ()
+
+    def __init__(self, name, owner, active=True):
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'owner', owner)
+        object.__setattr__(self, 'active', active)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Logbook {!r} is shared and read-only"
+                             .format(self.name))
+
+    def __reduce__(self):
+        return (Logbook, (self.name, self.owner, self.active))
+
+
+class InternedTag(Tag):
+    """Read-only Tag shared between decoded log entries
+
+    Copying or pickling gives a mutable Tag.
+    """
+    __slots__ = ()
+
+    def __init__(self, name, state):
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'state', state)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Tag {!r} is shared and read-only"
+                             .format(self.name))
+
+    def __reduce__(self):
+        return (Tag, (self.name, self.active))
+
+
+class InternTable(object):
+    """Bounded table of shared logbooks and tags
+
+    :param maxsize: Maximum number of logbooks and of tags kept. When
+                    full, the oldest entry is dropped.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = int(maxsize)
+        self._lock = threading.Lock()
+        self._logbooks = OrderedDict()
+        self._tags = OrderedDict()
+
+    def __len__(self):
+        return len(self._logbooks) + len(self._tags)
+
+    def _add(self, table, key, value):
+        with self._lock:
+            value = table.setdefault(key, value)
+            while len(table) > self.maxsize:
+                table.popitem(last=False)
+        return value
+
+    def logbook(self, name, owner):
+        """Return the shared logbook for name and owner"""
+        logbook = self._logbooks.get((name, owner))
+        if logbook is None:
+            # Resolve the name and owner as Logbook does
+            made = Logbook(name, owner)
+            logbook = self._add(self._logbooks, (name, owner),
+                                InternedLogbook(made.name, made.owner))
+        return logbook
+
+    def tag(self, name, state):
+        """Return the shared tag for name and state"""
+        tag = self._tags.get((name, state))
+        if tag is None:
+            tag = self._add(self._tags, (name, state),
+                            InternedTag('{}'.format(name).strip(), state))
+        return tag
+
+    def clear(self):
+        """Drop all the shared logbooks and tags"""
+        with self._lock:
+            self._logbooks.clear()
+            self._tags.clear()
@@ -0,0 +1,394 @@
+"""
+Local replica of the Olog log entries.
+
+The log entries are copied into an SQLite database with indexes on the
+logbooks, tags, properties and creation time of the entries and a full
+text index on their text, so that searches can be answered locally in
+milliseconds, even when the Olog cannot be reached.
+
+The Olog only filters searches on the creation time of the entries, so
+an incremental sync fetches the entries created since the newest one in
+the mirror (less an overlap) and uses their modification time to skip
+the ones which did not change. Changes made to older entries, and the
+entries deleted from the Olog, are picked up by a full sync, see the
+full_interval argument of Mirror.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+
+from .OlogClient import LogEntryDecoder, PropertyEncoder
+
+logger = logging.getLogger(__name__)
+
+_schema = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    owner TEXT,
+    text TEXT,
+    create_time INTEGER,
+    modify_time INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entry_logbooks (
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entry_tags (
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entry_properties (
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    attribute TEXT,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS entries_create_time ON entries (create_time);
+CREATE INDEX IF NOT EXISTS entry_logbooks_name
+    ON entry_logbooks (name COLLATE NOCASE, id);
+CREATE INDEX IF NOT EXISTS entry_logbooks_id ON entry_logbooks (id);
+CREATE INDEX IF NOT EXISTS entry_tags_name
+    ON entry_tags (name COLLATE NOCASE, id);
+CREATE INDEX IF NOT EXISTS entry_tags_id ON entry_tags (id);
+CREATE INDEX IF NOT EXISTS entry_properties_name
+    ON entry_properties (name COLLATE NOCASE, id);
+CREATE INDEX IF NOT EXISTS entry_properties_id ON entry_properties (id);
+"""
+
+# The trigram tokenizer lets the full text index answer substring
+# searches, it needs SQLite 3.34
+_fts_schema = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts
+    USING fts5(text, tokenize='trigram');
+"""
+
+# Search criteria answered by Mirror.query
+_criteria = ('id', 'search', 'tag', 'logbook', 'property', 'start', 'end',
+             'page', 'limit')
+
+
+_property_encoder = PropertyEncoder()
+
+
+def _like_pattern(pattern, contains=False):
+    """Translate an Olog search pattern using * and ? to LIKE"""
+    pattern = '{}'.format(pattern)
+    like = (pattern.replace('\\', '\\\\').replace('%', '\\%')
+            .replace('_', '\\_').replace('*', '%').replace('?', '_'))
+    if contains and '*' not in pattern and '?' not in pattern:
+        like = '%' + like + '%'
+    return like
+
+
+def _entry_to_dict(log_entry):
+    """The log entry in the form sent by the Olog"""
+    return {'id': log_entry.id,
+            'description': log_entry.text,
+            'owner': log_entry.owner,
+            'createdDate': log_entry.create_time,
+            'modifiedDate': log_entry.modify_time,
+            'logbooks': [{'name': l.name, 'owner': l.owner}
+                         for l in log_entry.logbooks],
+            'tags': [{'name': t.name, 'state': t.state}
+                     for t in log_entry.tags],
+            'properties': [_property_encoder.default(p)
+                           for p in log_entry.properties]}
+
+
+class Mirror(object):
+    """Local SQLite replica of the log entries of an Olog
+
+    :param client: The OlogClient the log entries are copied from.
+    :param path: File of the mirror database. It is created if it does
+                 not exist.
+    :param max_age: Seconds after which find syncs the mirror before
+                    searching it.
+    :param full_interval: Seconds between full syncs, which pick up the
+                          changes made to older log entries and remove
+                          the deleted ones. If None, only incremental
+                          syncs are made by find, deleted entries and
+                          edits to entries created more than overlap
+                          seconds before the newest one are never seen.
+    :param overlap: Seconds before the newest log entry an incremental
+                    sync starts from, to catch entries committed late.
+    :param page_size: Number of log entries fetched per request.
+    """
+
+    def __init__(self, client, path, max_age=60.0, full_interval=3600.0,
+                 overlap=300.0, page_size=500):
+        self.client = client
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.max_age = float(max_age)
+        self.full_interval = full_interval
+        self.overlap = float(overlap)
+        self.page_size = int(page_size)
+        self._sync_lock = threading.Lock()
+        self._decoder = LogEntryDecoder(getattr(client, '_interner', None))
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_schema)
+            try:
+                conn.executescript(_fts_schema)
+            except sqlite3.OperationalError:
+                logger.warning("SQLite %s has no FTS5 trigram tokenizer, "
+                               "text searches scan the mirror",
+                               sqlite3.sqlite_version)
+            self._fts = bool(conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'entries_fts'")
+                .fetchone())
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def _get_meta(self, conn, key):
+        row = conn.execute('SELECT value FROM meta WHERE key = ?',
+                           (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                     (key, value))
+
+    def status(self):
+        """Summary of the mirror
+
+        :returns: dict with the number of log entries, the time of the
+                  last sync and of the last full sync, and the creation
+                  time in ms of the newest log entry.
+        """
+        with closing(self._connect()) as conn:
+            return {'entries': conn.execute(
+                        'SELECT COUNT(*) FROM entries').fetchone()[0],
+                    'last_sync': self._get_meta(conn, 'last_sync'),
+                    'last_full_sync': self._get_meta(conn, 'last_full_sync'),
+                    'watermark': self._get_meta(conn, 'watermark')}
+
+    def sync(self, full=False):
+        """Copy the new and changed log entries from the Olog
+
+        :param full: If True, fetch all the log entries instead of the
+                     ones created since the last sync, and remove the
+                     ones which were deleted from the Olog.
+        :returns: Number of log entries added, updated or removed.
+        """
+        with self._sync_lock, closing(self._connect()) as conn:
+            started = time.time()
+            watermark = self._get_meta(conn, 'watermark')
+            full = full or watermark is None
+            kwds = dict()
+            if not full:
+                kwds['start'] = max(0, watermark / 1000. - self.overlap)
+            else:
+                # Ids of the log entries found, the others were deleted
+                conn.execute('CREATE TEMP TABLE IF NOT EXISTS seen '
+                             '(id INTEGER PRIMARY KEY)')
+                conn.execute('DELETE FROM seen')
+
+            count = 0
+            batch = []
+            for log_entry in self.client.iter_find(page_size=self.page_size,
+                                                   **kwds):
+                batch.append(log_entry)
+                if len(batch) >= self.page_size:
+                    count += self._store(conn, batch, full)
+                    batch = []
+            count += self._store(conn, batch, full)
+            if full:
+                count += self._remove_unseen(conn)
+
+            with conn:
+                newest = conn.execute(
+                    'SELECT MAX(create_time) FROM entries').fetchone()[0]
+                if newest is not None:
+                    self._set_meta(conn, 'watermark', newest)
+                self._set_meta(conn, 'last_sync', started)
+                if full:
+                    self._set_meta(conn, 'last_full_sync', started)
+        logger.info("Synced %d log entries to the mirror %s",
+                    count, self.path)
+        return count
+
+    def _store(self, conn, log_entries, seen=False):
+        """Insert or update log entries, returns the number changed
+
+        :param seen: If True, the ids are recorded in the seen table.
+        """
+        count = 0
+        with conn:
+            if seen:
+                conn.executemany('INSERT OR IGNORE INTO seen VALUES (?)',
+                                 [(log_entry.id,)
+                                  for log_entry in log_entries])
+            for log_entry in log_entries:
+                id = log_entry.id
+                row = conn.execute('SELECT modify_time FROM entries '
+                                   'WHERE id = ?', (id,)).fetchone()
+                if row is not None:
+                    if row[0] == log_entry.modify_time:
+                        continue
+                    for table in ('entry_logbooks', 'entry_tags',
+                                  'entry_properties'):
+                        conn.execute('DELETE FROM {} WHERE id = ?'
+                                     .format(table), (id,))
+                    if self._fts:
+                        conn.execute('DELETE FROM entries_fts '
+                                     'WHERE rowid = ?', (id,))
+
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                    (id, log_entry.owner, log_entry.text,
+                     log_entry.create_time, log_entry.modify_time,
+                     json.dumps(_entry_to_dict(log_entry))))
+                if self._fts:
+                    conn.execute('INSERT INTO entries_fts (rowid, text) '
+                                 'VALUES (?, ?)', (id, log_entry.text))
+                conn.executemany('INSERT INTO entry_logbooks VALUES (?, ?)',
+                                 [(id, l.name) for l in log_entry.logbooks])
+                conn.executemany('INSERT INTO entry_tags VALUES (?, ?)',
+                                 [(id, t.name) for t in log_entry.tags])
+                properties = []
+                for p in log_entry.properties:
+                    attributes = p.attributes or {}
+                    properties.extend((id, p.name, '{}'.format(k),
+                                       '{}'.format(v))
+                                      for k, v in attributes.items())
+                    if not attributes:
+                        properties.append((id, p.name, None, None))
+                conn.executemany(
+                    'INSERT INTO entry_properties VALUES (?, ?, ?, ?)',
+                    properties)
+                count += 1
+        return count
+
+    def _remove_unseen(self, conn):
+        """Remove the log entries missing from the seen table, returns the
+        number removed"""
+        with conn:
+            ids = [id for id, in conn.execute(
+                'SELECT id FROM entries '
+                'WHERE id NOT IN (SELECT id FROM seen)')]
+            for table in ('entry_logbooks', 'entry_tags', 'entry_properties',
+                          'entries'):
+                conn.executemany('DELETE FROM {} WHERE id = ?'.format(table),
+                                 [(id,) for id in ids])
+            if self._fts:
+                conn.executemany('DELETE FROM entries_fts WHERE rowid = ?',
+                                 [(id,) for id in ids])
+            conn.execute('DELETE FROM seen')
+        if ids:
+            logger.info("Removed %d log entries deleted from the Olog",
+                        len(ids))
+        return len(ids)
+
+    def query(self, **kwds):
+        '''
+        Search the mirror without syncing it
+
+        Takes the search criteria of OlogClient.find: id, search, tag,
+        logbook, property, start and end, plus page and limit. Patterns
+        may use the * and ? wildcards and are not case sensitive. A
+        search without wildcards matches the text anywhere in the log
+        entry.
+        :returns: List of LogEntry, newest first.
+        '''
+        unknown = set(kwds) - set(_criteria)
+        if unknown:
+            raise ValueError('The mirror cannot search by {}'
+                             .format(', '.join(sorted(unknown))))
+
+        where = []
+        args = []
+        if kwds.get('id') is not None:
+            where.append('e.id = ?')
+            args.append(int(kwds['id']))
+        if kwds.get('search') is not None:
+            if self._fts:
+                where.append("e.id IN (SELECT rowid FROM entries_fts "
+                             "WHERE text LIKE ? ESCAPE '\\')")
+            else:
+                where.append("e.text LIKE ? ESCAPE '\\'")
+            args.append(_like_pattern(kwds['search'], contains=True))
+        for key, table in (('tag', 'entry_tags'),
+                           ('logbook', 'entry_logbooks'),
+                           ('property', 'entry_properties')):
+            if kwds.get(key) is not None:
+                where.append("e.id IN (SELECT id FROM {} "
+                             "WHERE name LIKE ? ESCAPE '\\')".format(table))
+                args.append(_like_pattern(kwds[key]))
+        if kwds.get('start') is not None:
+            where.append('e.create_time >= ?')
+            args.append(float(kwds['start']) * 1000)
+        if kwds.get('end') is not None:
+            where.append('e.create_time <= ?')
+            args.append(float(kwds['end']) * 1000)
+
+        sql = 'SELECT e.data FROM entries AS e'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY e.create_time DESC, e.id DESC'
+        if kwds.get('limit') is not None:
+            limit = int(kwds['limit'])
+            page = int(kwds.get('page') or 1)
+            sql += ' LIMIT ? OFFSET ?'
+            args.extend((limit, (page - 1) * limit))
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, args).fetchall()
+        return [self._decoder.dictToLogEntry(json.loads(data))
+                for data, in rows]
+
+    def is_fresh(self, max_age=None):
+        """True if the mirror was synced less than max_age seconds ago"""
+        if max_age is None:
+            max_age = self.max_age
+        with closing(self._connect()) as conn:
+            last_sync = self._get_meta(conn, 'last_sync')
+        return last_sync is not None and time.time() - last_sync < max_age
+
+    def find(self, max_age=None, **kwds):
+        '''
+        Search the mirror, syncing it first if it is too old
+        :param max_age: Seconds since the last sync after which the
+        mirror is synced before searching. If None, the max_age of the
+        mirror is used.
+
+        Takes the search criteria of :func query:. When the Olog cannot
+        be reached the mirror is searched as it is, unless it was never
+        synced. The sync is a full one once full_interval seconds have
+        passed since the last, otherwise changes to older log entries
+        may be missing from the results until then.
+        '''
+        with closing(self._connect()) as conn:
+            last_sync = self._get_meta(conn, 'last_sync')
+            last_full_sync = self._get_meta(conn, 'last_full_sync')
+        if max_age is None:
+            max_age = self.max_age
+        if last_sync is None or time.time() - last_sync >= max_age:
+            full = (self.full_interval is not None
+                    and last_full_sync is not None
+                    and time.time() - last_full_sync > self.full_interval)
+            try:
+                self.sync(full=full)
+            except Exception as e:
+                if last_sync is None:
+                    raise
+                logger.warning("Searching the mirror synced %.0f s ago, "
+                               "sync failed: %s", time.time() - last_sync, e)
+        return self.query(**kwds)
@@ -0,0 +1,155 @@
+"""
+Retry policy for requests made to the Olog.
+
+Failed requests are retried with exponential backoff and jitter if the
+failure is transient and repeating the request is safe. A retry budget
+limits the extra load retries put on a struggling server.
+"""
+
+import time
+import random
+import threading
+import logging
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class RetryBudget(object):
+    """Token bucket limiting retries to a fraction of the requests made
+
+    :param ratio: Tokens added for each request made.
+    :param minimum: Tokens available when the bucket is created, and
+                    the number of retries allowed regardless of ratio.
+    :param maximum: Maximum number of tokens kept.
+    """
+
+    def __init__(self, ratio=0.2, minimum=10, maximum=100):
+        self.ratio = ratio
+        self.maximum = maximum
+        self._tokens = float(minimum)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Record a request"""
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.maximum)
+
+    def withdraw(self):
+        """Take the token needed for a retry
+
+        :returns: False if the budget is exhausted.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+
+class RetryPolicy(object):
+    """When and how often failed requests to the Olog are retried
+
+    :param max_retries: Maximum number of retries of a request.
+    :param backoff_factor: The wait before retry n is
+                           backoff_factor * 2 ** (n - 1) seconds.
+    :param max_backoff: Upper limit of the wait between retries.
+    :param jitter: If True, the wait is drawn uniformly between 0 and
+                   the backoff ("full jitter").
+    :param retry_statuses: HTTP status codes which are retried.
+    :param budget: RetryBudget shared by the requests, None for no limit.
+    :param dedupe_property: Name of the property holding the key that
+                            identifies a log entry, so that creating it
+                            can be retried without duplicates. None
+                            disables retrying log entry creation.
+    """
+    idempotent_methods = frozenset(['GET', 'HEAD', 'PUT', 'DELETE',
+                                    'OPTIONS'])
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30.0,
+                 jitter=True, retry_statuses=(500, 502, 503, 504),
+                 budget=None, dedupe_property=None):
+        self.max_retries = int(max_retries)
+        self.backoff_factor = float(backoff_factor)
+        self.max_backoff = float(max_backoff)
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget = budget if budget is not None else RetryBudget()
+        self.dedupe_property = dedupe_property
+
+    def is_transient(self, exc):
+        """Return True if the request failed for a transient reason"""
+        if isinstance(exc, requests.exceptions.HTTPError):
+            return (exc.response is not None
+                    and exc.response.status_code in self.retry_statuses)
+        return isinstance(exc, (requests.exceptions.ConnectionError,
+                                requests.exceptions.Timeout))
+
+    def is_safe(self, method, exc, idempotent=None):
+        """Return True if the request may be sent again
+
+        :param method: HTTP method of the request
+        :param exc: The exception raised by the request
+        :param idempotent: Override of the idempotency of the method
+        """
+        if idempotent is None:
+            idempotent = method.upper() in self.idempotent_methods
+        if idempotent:
+            return True
+        # The request never reached the server
+        return isinstance(exc, requests.exceptions.ConnectTimeout)
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt (from 1)"""
+        delay = min(self.backoff_factor * (2 ** (attempt - 1)),
+                    self.max_backoff)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def call(self, method, func, idempotent=None):
+        """Call func, retrying it according to the policy
+
+        :param method: HTTP method of the request made by func
+        :param func: Callable making the request
+        :param idempotent: Override of the idempotency of the method
+        :returns: The return value of func
+        """
+        attempt = 0
+        while True:
+            if self.budget is not None:
+                self.budget.deposit()
+            try:
+                return func()
+            except Exception as e:
+                attempt += 1
+                if not self.should_retry(method, e, attempt, idempotent):
+                    raise
+                delay = self.backoff(attempt)
+                logger.info("%s failed (%s), retry %d in %.2f s",
+                            method, e, attempt, delay)
+                time.sleep(delay)
+
+    def should_retry(self, method, exc, attempt, idempotent=None):
+        """Return True if a failed request should be retried
+
+        :param method: HTTP method of the request
+        :param exc: The exception raised by the request
+        :param attempt: Number of the retry that would be made (from 1)
+        :param idempotent: Override of the idempotency of the method
+        """
+        if attempt > self.max_retries:
+            return False
+        if not self.is_transient(exc):
+            return False
+        if not self.is_safe(method, exc, idempotent):
+            return False
+        if self.budget is not None and not self.budget.withdraw():
+            logger.warning("Retry budget exhausted, not retrying %s", method)
+            return False
+        return True
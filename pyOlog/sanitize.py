@@ -0,0 +1,82 @@
+"""
+Policies used to clean the text of log entries.
+
+A policy is a function taking the text and returning the cleaned text.
+The built in policies are:
+
+ascii
+    Keep only the characters in string.printable. This is the default
+    and drops all non-ASCII characters.
+unicode
+    Keep all characters except NUL and lone surrogates, which cannot be
+    sent to the Olog.
+control
+    Remove control characters other than tab, newline and carriage
+    return, keeping all other Unicode characters.
+
+The policy used by LogEntry is set with the 'text_policy' config entry
+or the sanitize argument of LogEntry. More policies can be added with
+register.
+"""
+
+import re
+import string
+
+# Bytes deleted from ASCII encoded text by bytes.translate
+_not_printable = bytes(bytearray(i for i in range(128)
+                                 if chr(i) not in string.printable))
+_ascii_control = bytes(bytearray(i for i in range(128)
+                                 if i < 32 and chr(i) not in '\t\n\r'
+                                 or i == 127))
+
+_unsendable = re.compile(u'[\x00\ud800-\udfff]+')
+_control = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]+')
+
+
+def ascii_strict(text):
+    """Keep only the characters in string.printable"""
+    return (text.encode('ascii', 'ignore')
+            .translate(None, _not_printable).decode('ascii'))
+
+
+def unicode_preserving(text):
+    """Remove NUL and lone surrogates"""
+    return _unsendable.sub('', text)
+
+
+def strip_control(text):
+    """Remove control characters except tab, newline and carriage return"""
+    if text.isascii():
+        return (text.encode('ascii')
+                .translate(None, _ascii_control).decode('ascii'))
+    return _control.sub('', text)
+
+
+_policies = {'ascii': ascii_strict,
+             'unicode': unicode_preserving,
+             'control': strip_control}
+
+
+def register(name, func):
+    """Register a sanitizer policy
+
+    :param name: Name of the policy
+    :type name: string
+    :param func: Function taking and returning the text
+    :type func: callable
+    """
+    _policies[name] = func
+
+
+def get_sanitizer(policy):
+    """Return the sanitizer for a policy
+
+    :param policy: Name of a registered policy or a callable
+    :returns: Callable cleaning text
+    """
+    if callable(policy):
+        return policy
+    try:
+        return _policies[policy]
+    except KeyError:
+        raise ValueError("Unknown text sanitizer policy {!r}".format(policy))
@@ -0,0 +1,356 @@
+"""
+Write-ahead spool for log entries that could not be sent to the Olog.
+
+Entries are kept in an SQLite database inside the spool directory,
+together with the contents of their attachments, and are replayed in
+the order they were spooled once the Olog can be reached again.
+
+An entry the Olog refuses, for a reason other than a transient failure,
+is marked as failed and skipped so that the entries behind it are still
+sent. Failed entries are kept until they are dropped or retried.
+"""
+
+import io
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .OlogDataTypes import Attachment
+from .OlogClient import _is_transient
+
+logger = logging.getLogger(__name__)
+
+_schema = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    entry TEXT NOT NULL,
+    log_id INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    seq INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    mime_type TEXT,
+    data BLOB NOT NULL,
+    PRIMARY KEY (seq, idx)
+);
+"""
+
+
+def _read_attachment(attachment):
+    """Return filename, mime-type and contents of an attachment"""
+    filename, f, mime_type = attachment.get_file_post()
+    if hasattr(f, 'read'):
+        if hasattr(f, 'seek'):
+            try:
+                f.seek(0)
+            except (IOError, OSError, ValueError):
+                pass
+        data = f.read()
+    else:
+        data = f
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return filename, mime_type, data
+
+
+def _is_rejected(exc):
+    """Return True if the Olog refused an entry, so that sending it again
+    cannot succeed"""
+    failures = getattr(exc, 'failures', None)
+    if failures is not None:
+        # AttachmentUploadError
+        return not all(_is_transient(e) for a, e in failures)
+    return not _is_transient(exc)
+
+
+def _selected(seqs):
+    """SQL condition and parameters selecting the entries seqs, all of
+    them if seqs is None"""
+    if seqs is None:
+        return '', ()
+    seqs = list(seqs)
+    return (' AND seq IN ({})'.format(', '.join('?' * len(seqs))),
+            tuple(seqs))
+
+
+class Spool(object):
+    """Durable queue of log entries waiting to be sent to the Olog
+
+    :param path: Directory holding the spool database. It is created
+                 if it does not exist.
+    """
+    filename = 'spool.db'
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self._db = os.path.join(self.path, self.filename)
+        self._flush_lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_schema)
+            columns = [r[1] for r in
+                       conn.execute('PRAGMA table_info(entries)')]
+            if 'failed' not in columns:
+                # Spool written by an earlier version
+                conn.execute('ALTER TABLE entries ADD COLUMN '
+                             'failed INTEGER NOT NULL DEFAULT 0')
+
+    def _connect(self):
+        return sqlite3.connect(self._db, timeout=30)
+
+    def __len__(self):
+        """Number of entries waiting to be sent, the failed ones excluded"""
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM entries '
+                                'WHERE failed = 0').fetchone()[0]
+
+    def put(self, data, attachments=(), log_id=None):
+        """Append an encoded log entry to the spool
+
+        :param data: The log entry encoded by LogEntryEncoder
+        :param attachments: The Attachment objects of the log entry
+        :param log_id: Id of the log entry if it has already been created,
+                       in which case only the attachments are sent
+        :returns: Sequence number of the spooled entry
+        """
+        files = [_read_attachment(a) for a in attachments]
+        with closing(self._connect()) as conn:
+            with conn:
+                cur = conn.execute(
+                    'INSERT INTO entries (created, entry, log_id) '
+                    'VALUES (?, ?, ?)', (time.time(), data, log_id))
+                seq = cur.lastrowid
+                conn.executemany(
+                    'INSERT INTO attachments VALUES (?, ?, ?, ?, ?)',
+                    [(seq, idx, filename, mime_type, sqlite3.Binary(blob))
+                     for idx, (filename, mime_type, blob) in enumerate(files)])
+        logger.info("Spooled log entry %d with %d attachments",
+                    seq, len(files))
+        return seq
+
+    def status(self):
+        """Summary of the spool contents
+
+        :returns: dict with the number of entries waiting to be sent
+                  and of failed entries, the number of attachments and
+                  their total size, the creation time of the oldest
+                  waiting entry and the last error seen while flushing it.
+        """
+        with closing(self._connect()) as conn:
+            entries, oldest, attempts = conn.execute(
+                'SELECT COUNT(*), MIN(created), MAX(attempts) '
+                'FROM entries WHERE failed = 0').fetchone()
+            failed = conn.execute('SELECT COUNT(*) FROM entries '
+                                  'WHERE failed != 0').fetchone()[0]
+            attachments, size = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) '
+                'FROM attachments').fetchone()
+            row = conn.execute(
+                'SELECT last_error FROM entries WHERE failed = 0 '
+                'ORDER BY seq LIMIT 1').fetchone()
+        return {'entries': entries,
+                'failed': failed,
+                'attachments': attachments,
+                'bytes': size,
+                'oldest': oldest,
+                'attempts': attempts or 0,
+                'last_error': row[0] if row else None}
+
+    def failed(self):
+        """The entries the Olog refused
+
+        :returns: List of dicts with the sequence number, creation time,
+                  number of attempts and last error of each failed entry.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT seq, created, attempts, last_error '
+                                'FROM entries WHERE failed != 0 '
+                                'ORDER BY seq').fetchall()
+        return [{'seq': seq, 'created': created, 'attempts': attempts,
+                 'last_error': last_error}
+                for seq, created, attempts, last_error in rows]
+
+    def drop(self, seqs=None):
+        """Remove failed entries, and their attachments, from the spool
+
+        :param seqs: Sequence numbers of the entries, by default all the
+                     failed entries.
+        :returns: The number of entries removed.
+        """
+        where, params = _selected(seqs)
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('DELETE FROM attachments WHERE seq IN '
+                             '(SELECT seq FROM entries WHERE failed != 0'
+                             + where + ')', params)
+                count = conn.execute('DELETE FROM entries WHERE failed != 0'
+                                     + where, params).rowcount
+        logger.info("Dropped %d failed log entries", count)
+        return count
+
+    def retry(self, seqs=None):
+        """Send failed entries again at the next flush
+
+        The entries keep their place in the spool, ahead of the entries
+        spooled after them.
+
+        :param seqs: Sequence numbers of the entries, by default all the
+                     failed entries.
+        :returns: The number of entries to be sent again.
+        """
+        where, params = _selected(seqs)
+        with closing(self._connect()) as conn:
+            with conn:
+                count = conn.execute('UPDATE entries SET failed = 0 '
+                                     'WHERE failed != 0' + where,
+                                     params).rowcount
+        return count
+
+    def flush(self, client, limit=None):
+        """Send spooled entries to the Olog in order
+
+        Entries are removed from the spool once they, and all of their
+        attachments, have been accepted by the Olog. An entry the Olog
+        refuses is marked as failed and skipped. Flushing stops at the
+        first transient failure, which is re-raised. Only one thread or process
+        flushes a spool at a time, if another one is already flushing
+        nothing is sent.
+
+        :param client: The OlogClient used to send the entries.
+        :param limit: Maximum number of entries to send.
+        :returns: The ids of the log entries created.
+        """
+        if not self._flush_lock.acquire(False):
+            return []
+        try:
+            with open(self._db + '.lock', 'w') as lockfile:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except (IOError, OSError):
+                        return []
+                return self._flush(client, limit)
+        finally:
+            self._flush_lock.release()
+
+    def _flush(self, client, limit):
+        ids = []
+        while limit is None or len(ids) < limit:
+            with closing(self._connect()) as conn:
+                row = conn.execute('SELECT seq, created, entry, log_id '
+                                   'FROM entries WHERE failed = 0 '
+                                   'ORDER BY seq LIMIT 1').fetchone()
+            if row is None:
+                break
+            seq, created, data, log_id = row
+            try:
+                ids.append(self._send(client, seq, created, data, log_id))
+            except Exception as e:
+                rejected = _is_rejected(e)
+                with closing(self._connect()) as conn:
+                    with conn:
+                        conn.execute('UPDATE entries SET '
+                                     'attempts = attempts + 1, '
+                                     'last_error = ?, failed = ? '
+                                     'WHERE seq = ?',
+                                     (repr(e), int(rejected), seq))
+                if not rejected:
+                    raise
+                logger.error("Olog refused spooled log entry %d, it is "
+                             "kept as failed (%s)", seq, e)
+        return ids
+
+    def _send(self, client, seq, created, data, log_id):
+        if log_id is None:
+            # The entry may have been created by the attempt made before
+            # it was spooled
+            log_id = client._create(data, since=created)
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.execute('UPDATE entries SET log_id = ? '
+                                 'WHERE seq = ?', (log_id, seq))
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT idx, filename, mime_type, data '
+                                'FROM attachments WHERE seq = ? '
+                                'ORDER BY idx', (seq,)).fetchall()
+        for idx, filename, mime_type, blob in rows:
+            attachment = Attachment(io.BytesIO(blob), filename, mime_type)
+            client._post_attachments(log_id, [attachment])
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.execute('DELETE FROM attachments '
+                                 'WHERE seq = ? AND idx = ?', (seq, idx))
+
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('DELETE FROM entries WHERE seq = ?', (seq,))
+        logger.info("Sent spooled log entry %d as %d", seq, log_id)
+        return log_id
+
+
+class SpoolFlusher(threading.Thread):
+    """Background thread replaying a spool with exponential backoff
+
+    :param client: The OlogClient used to send the entries.
+    :param spool: The Spool to replay.
+    :param min_backoff: Seconds to wait after the first failure.
+    :param max_backoff: Upper limit of the wait between attempts.
+    """
+
+    def __init__(self, client, spool, min_backoff=1.0, max_backoff=300.0):
+        super(SpoolFlusher, self).__init__(name='OlogSpoolFlusher')
+        self.daemon = True
+        self.client = client
+        self.spool = spool
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._wake = threading.Event()
+        self._stopping = False
+        self._backoff = None
+
+    def wake(self, force=False):
+        """Flush now rather than at the end of the current wait
+
+        :param force: Also cut short the wait after a failed attempt.
+        """
+        if force or self._backoff is None:
+            self._wake.set()
+
+    def stop(self):
+        """Stop the thread after the current attempt"""
+        self._stopping = True
+        self._wake.set()
+
+    def run(self):
+        while not self._stopping:
+            try:
+                self.spool.flush(self.client)
+            except Exception as e:
+                if self._backoff is None:
+                    self._backoff = self.min_backoff
+                else:
+                    self._backoff = min(self._backoff * 2, self.max_backoff)
+                logger.warning("Unable to flush spool, retrying in %.1f s "
+                               "(%s)", self._backoff, e)
+                self._wake.wait(self._backoff)
+            else:
+                self._backoff = None
+                self._wake.wait()
+            self._wake.clear()
+
@@ -0,0 +1,103 @@
+"""
+Cache of the logbook, tag and property names known to an Olog instance.
+
+The names are fetched with one GET per vocabulary and kept as sets so
+that membership tests made while building log entries do not go back
+to the server for every item.
+"""
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VocabularyCache(object):
+    """Time limited cache of the logbook, tag and property names
+
+    :param client: The OlogClient used to fetch the names.
+    :param ttl: Number of seconds a fetched vocabulary is considered
+                valid. A ttl of 0 disables caching.
+    """
+    kinds = ('logbooks', 'tags', 'properties')
+
+    def __init__(self, client, ttl=60.0):
+        self._client = client
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        self._entries = dict()
+
+    def _fetch(self, kind):
+        if kind == 'logbooks':
+            return frozenset(l.name for l in self._client.list_logbooks())
+        elif kind == 'tags':
+            return frozenset(t.name for t in self._client.list_tags())
+        elif kind == 'properties':
+            return frozenset(p.name for p in self._client.list_properties())
+        raise ValueError('Unknown vocabulary {}'.format(kind))
+
+    def get(self, kind):
+        """Return the set of names for the vocabulary kind
+
+        :param kind: One of 'logbooks', 'tags' or 'properties'
+        :returns: Names known to the Olog
+        :rtype: frozenset
+        """
+        return self._get(kind)[0]
+
+    def _get(self, kind):
+        """Return the names and True if they were just fetched"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(kind)
+            if cached is not None and (now - cached[0]) < self.ttl:
+                return cached[1], False
+
+        logger.debug("Fetching %s vocabulary", kind)
+        names = self._fetch(kind)
+        with self._lock:
+            self._entries[kind] = (now, names)
+        return names, True
+
+    def contains(self, kind, name):
+        """Return True if name is in the vocabulary kind
+
+        A name missing from cached names may have been created since they
+        were fetched, so they are fetched again before it is reported
+        missing.
+
+        :param kind: One of 'logbooks', 'tags' or 'properties'
+        :param name: The name to look up
+        """
+        names, fetched = self._get(kind)
+        if name in names or fetched:
+            return name in names
+        self.invalidate(kind)
+        return name in self.get(kind)
+
+    @property
+    def logbooks(self):
+        """Names of the logbooks in the Olog"""
+        return self.get('logbooks')
+
+    @property
+    def tags(self):
+        """Names of the tags in the Olog"""
+        return self.get('tags')
+
+    @property
+    def properties(self):
+        """Names of the properties in the Olog"""
+        return self.get('properties')
+
+    def invalidate(self, kind=None):
+        """Drop cached names
+
+        :param kind: Vocabulary to drop. If None all are dropped.
+        """
+        with self._lock:
+            if kind is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(kind, None)
@@ -16,6 +16,8 @@ setup(name='pyOlog',
       author_email='shroffk@bnl.gov',
       packages=['pyOlog', 'pyOlog.cli'],
       requires=['requests (>=2.0.0)', 'urllib3 (>=1.7.1)'],
+      extras_require={'async': ['aiohttp'],
+                      'frame': ['numpy', 'pandas']},
       entry_points={'console_scripts': [
                     'olog = pyOlog.cli:main'],
                     'gui_scripts': [
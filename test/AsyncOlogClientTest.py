@@ -0,0 +1,123 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from pyOlog import LogEntry, Logbook, Attachment
+from pyOlog.conf import Config
+
+
+class FakeResponse(object):
+
+    def __init__(self, body):
+        self.body = body
+        self.content_length = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self, content_type=None):
+        return self.body
+
+    async def read(self):
+        return b'image'
+
+
+class FakeSession(object):
+    """aiohttp session recording the requests"""
+    closed = False
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        if url.endswith('/resources/logs') and method == 'POST':
+            return FakeResponse({'log': [{'id': 7}]})
+        if url.endswith('/resources/logs'):
+            return FakeResponse([])
+        return FakeResponse(None)
+
+    async def close(self):
+        self.closed = True
+
+
+@unittest.skipIf(aiohttp is None, 'needs aiohttp')
+class TestAsyncTimeouts(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.conf = Config()
+        self.conf.conf_files = [os.path.join(self.path, 'pyOlog.conf')]
+        patcher = mock.patch('pyOlog.AsyncOlogClient._conf', self.conf)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def writeConf(self, text):
+        with open(self.conf.conf_files[0], 'w') as f:
+            f.write('[DEFAULT]\nurl=http://olog\n' + text)
+
+    def client(self, **kwargs):
+        from pyOlog import AsyncOlogClient
+        c = AsyncOlogClient(username=None, ask=False, **kwargs)
+        c._session = FakeSession()
+        return c
+
+    def timeouts(self, c):
+        return [(method, (kwargs['timeout'].sock_connect,
+                          kwargs['timeout'].sock_read))
+                for method, url, kwargs in c._session.requests]
+
+    def testDefault(self):
+        self.writeConf('')
+        c = self.client()
+        asyncio.run(c.find(search='beam'))
+        self.assertEqual(self.timeouts(c), [('GET', (4.2, 30))])
+
+    def testConf(self):
+        self.writeConf('get_timeout=1, 2\npost_timeout=3\n'
+                       'upload_timeout=60, 120\n')
+        c = self.client()
+
+        async def run():
+            await c.find(search='beam')
+            await c.log(LogEntry('text', owner='controls',
+                                 logbooks=[Logbook('Operations')],
+                                 attachments=[Attachment(b'image',
+                                                         'scan.png')]))
+            await c.delete(logEntryId=7)
+        asyncio.run(run())
+        self.assertEqual(self.timeouts(c), [('GET', (1.0, 2.0)),
+                                            ('POST', (3.0, 3.0)),
+                                            ('POST', (60.0, 120.0)),
+                                            ('DELETE', (4.2, 30))])
+
+    def testArgument(self):
+        self.writeConf('get_timeout=1, 2\n')
+        c = self.client(timeouts={'get': (5, 6)})
+        asyncio.run(c.find(search='beam'))
+        self.assertEqual(self.timeouts(c), [('GET', (5, 6))])
+
+
+if __name__ == '__main__':
+    unittest.main()
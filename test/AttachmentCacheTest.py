@@ -0,0 +1,88 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import mmap
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyOlog import OlogClient
+from pyOlog.attachment_cache import AttachmentCache, attachment_key
+
+from _testOlog import FakeResponse
+
+LISTING = {'attachment': [{'filename': 'scan.png', 'fileSize': 6,
+                           'contentType': 'image/png'}]}
+
+
+class TestAttachmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.downloads = []
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def download(self, data):
+        def download():
+            self.downloads.append(data)
+            return iter([data[:3], data[3:]])
+        return download
+
+    def testFetch(self):
+        cache = AttachmentCache(self.path)
+        key = attachment_key(1, 'scan.png', 1000)
+        with cache.fetch(key, self.download(b'abcdef')) as f:
+            self.assertEqual(f.read(), b'abcdef')
+        m = cache.fetch(key, self.download(b'abcdef'), use_mmap=True)
+        self.assertIsInstance(m, mmap.mmap)
+        self.assertEqual(m[:], b'abcdef')
+        m.close()
+        self.assertEqual(len(self.downloads), 1)
+
+        # Same contents under another key are stored once
+        cache.fetch(attachment_key(2, 'copy.png', 1000),
+                    self.download(b'abcdef')).close()
+        self.assertEqual(cache.status()['files'], 1)
+        self.assertEqual(cache.status()['keys'], 2)
+        self.assertEqual([n for n in os.listdir(os.path.join(self.path,
+                                                             'objects'))
+                          if n.endswith('.part')], [])
+
+    def testEviction(self):
+        cache = AttachmentCache(self.path, max_bytes=10)
+        cache.store('a', [b'aaaa'])
+        cache.store('b', [b'bbbb'])
+        cache.open('a').close()
+        cache.store('c', [b'cccc'])
+        # b was used least recently
+        self.assertIsNone(cache.open('b'))
+        cache.open('a').close()
+        cache.open('c').close()
+        self.assertEqual(cache.status()['bytes'], 8)
+
+        # A file larger than the budget is kept until the next store
+        cache.store('big', [b'x' * 20])
+        with cache.open('big') as f:
+            self.assertEqual(len(f.read()), 20)
+
+    def testListAttachments(self):
+        c = OlogClient.__new__(OlogClient)
+        c._url = 'http://olog'
+        c._get = lambda url: FakeResponse(LISTING)
+        c.attachment_cache = AttachmentCache(self.path)
+        c.iter_attachment = lambda id, filename: self.download(b'abcdef')()
+        for _ in range(2):
+            attachment = c.list_attachments(7)[0]
+            with attachment.file as f:
+                self.assertEqual(f.read(), b'abcdef')
+        self.assertEqual(len(self.downloads), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
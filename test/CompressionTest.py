@@ -0,0 +1,90 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import gzip
+import unittest
+import zlib
+
+import requests
+
+from pyOlog.compression import get_compressor
+
+from _testOlog import FakeResponse, client
+
+
+class FakeSession(object):
+    """Records the posted bodies, optionally rejecting compressed ones"""
+
+    def __init__(self, accept_compressed=True, status_code=415, text=''):
+        self.accept_compressed = accept_compressed
+        self.status_code = status_code
+        self.text = text
+        self.posts = []
+
+    def post(self, url, timeout=None, stream=False, data=None, headers=None):
+        encoding = (headers or {}).get('Content-Encoding')
+        self.posts.append((encoding, data))
+        if encoding and not self.accept_compressed:
+            return FakeResponse(status_code=self.status_code, body=self.text)
+        return FakeResponse()
+
+
+class TestCompression(unittest.TestCase):
+
+    def testCompressors(self):
+        data = b'log entry text ' * 100
+        name, compress = get_compressor(True)
+        self.assertEqual(name, 'gzip')
+        self.assertEqual(gzip.decompress(compress(data)), data)
+        name, compress = get_compressor('deflate')
+        self.assertEqual(zlib.decompress(compress(data)), data)
+        self.assertRaises(ValueError, get_compressor, 'lzma')
+
+    def testThreshold(self):
+        session = FakeSession()
+        c = client(session, compress='gzip', compress_threshold=100)
+        c._post('/resources/logs', data='small')
+        c._post('/resources/logs', data='x' * 1000)
+        self.assertEqual(session.posts[0], (None, 'small'))
+        encoding, data = session.posts[1]
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(gzip.decompress(data), b'x' * 1000)
+
+    def testFallback(self):
+        session = FakeSession(accept_compressed=False)
+        c = client(session, compress='gzip', compress_threshold=0)
+        c._post('/resources/logs', data='x' * 1000)
+        c._post('/resources/logs', data='y' * 1000)
+        self.assertEqual([e for e, d in session.posts], ['gzip', None, None])
+        self.assertEqual(session.posts[-1][1], 'y' * 1000)
+
+    def testFallbackBadRequest(self):
+        session = FakeSession(accept_compressed=False, status_code=400,
+                              text='Unsupported Content-Encoding: gzip')
+        c = client(session, compress='gzip', compress_threshold=0)
+        c._post('/resources/logs', data='x' * 1000)
+        self.assertEqual([e for e, d in session.posts], ['gzip', None])
+        self.assertIsNone(c._compression)
+
+    def testOtherBadRequest(self):
+        # A request rejected for another reason is not sent again
+        session = FakeSession(accept_compressed=False, status_code=400,
+                              text='Logbook Operations does not exist')
+        c = client(session, compress='gzip', compress_threshold=0)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            c._post('/resources/logs', data='x' * 1000)
+        self.assertEqual([e for e, d in session.posts], ['gzip'])
+        self.assertIsNotNone(c._compression)
+
+    def testDisabled(self):
+        session = FakeSession()
+        c = client(session, compress=False)
+        c._post('/resources/logs', data='x' * 10000)
+        self.assertEqual(session.posts[0][0], None)
+
+
+if __name__ == "__main__":
+    unittest.main()
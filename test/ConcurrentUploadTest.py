@@ -0,0 +1,181 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import threading
+import unittest
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from unittest import mock
+
+import requests
+
+from pyOlog import LogEntry, Logbook, Attachment, AttachmentUploadError
+
+from _testOlog import FakeResponse, client
+
+
+class FakeOlog(object):
+    """Session creating log 1, the uploads of each file run upload(name)"""
+
+    def __init__(self, upload=None):
+        self.upload = upload
+        self.events = []
+        self.lock = threading.Lock()
+
+    def post(self, url, timeout=None, stream=False, headers=None,
+             files=None, data=None):
+        if '/resources/logs' in url:
+            self.record('log')
+            return FakeResponse({'log': [{'id': 1}]})
+        name = files['file'][0]
+        if self.upload is not None:
+            self.upload(name)
+        self.record(name)
+        if name.startswith('bad'):
+            return FakeResponse(status_code=400)
+        return FakeResponse()
+
+    def record(self, event):
+        with self.lock:
+            self.events.append(event)
+
+
+def entry(*names):
+    return LogEntry('text', owner='controls',
+                    logbooks=[Logbook('Operations')],
+                    attachments=[Attachment(b'data', name) for name in names])
+
+
+class TestConcurrentUploads(unittest.TestCase):
+
+    def client(self, session, workers=4):
+        c = client(session, upload_workers=workers)
+        self.addCleanup(c.close)
+        return c
+
+    def testParallel(self):
+        # Every upload waits for the others, they must run at once
+        barrier = threading.Barrier(3, timeout=5)
+        session = FakeOlog(lambda name: barrier.wait())
+        c = self.client(session, workers=3)
+        self.assertEqual(c.log(entry('a.png', 'b.png', 'c.png')), 1)
+        self.assertEqual(session.events[0], 'log')
+        self.assertEqual(sorted(session.events[1:]),
+                         ['a.png', 'b.png', 'c.png'])
+
+    def testFailureOrder(self):
+        # The failures are listed in the order of the attachments,
+        # whatever order the uploads end in
+        started = threading.Event()
+
+        def upload(name):
+            if name == 'bad1.png':
+                started.wait(5)
+            else:
+                started.set()
+        session = FakeOlog(upload)
+        c = self.client(session, workers=2)
+        with self.assertRaises(AttachmentUploadError) as cm:
+            c.log(entry('bad1.png', 'bad2.png'))
+        self.assertEqual(session.events, ['log', 'bad2.png', 'bad1.png'])
+        self.assertEqual(cm.exception.log_id, 1)
+        self.assertEqual([a.filename for a, e in cm.exception.failures],
+                         ['bad1.png', 'bad2.png'])
+
+    def testErrorPropagation(self):
+        session = FakeOlog()
+        c = self.client(session)
+        with self.assertRaises(AttachmentUploadError) as cm:
+            c.log(entry('a.png', 'bad.png', 'c.png'))
+        (attachment, error), = cm.exception.failures
+        self.assertEqual(attachment.filename, 'bad.png')
+        self.assertIsInstance(error, requests.exceptions.HTTPError)
+        self.assertEqual(error.response.status_code, 400)
+        # The other attachments are still uploaded
+        self.assertEqual(sorted(session.events),
+                         ['a.png', 'bad.png', 'c.png', 'log'])
+
+        id, future = c.log(entry('bad.png'), wait=False)
+        self.assertEqual(id, 1)
+        self.assertRaises(AttachmentUploadError, future.result, 5)
+
+        future = c.updateLog(1, entry('bad.png'), wait=False)
+        self.assertRaises(AttachmentUploadError, future.result, 5)
+
+    def testNoAttachments(self):
+        c = self.client(FakeOlog())
+        id, future = c.log(entry(), wait=False)
+        self.assertEqual(future.result(0), 1)
+        self.assertIsNone(c._uploader)
+
+    def testClose(self):
+        release = threading.Event()
+        session = FakeOlog(lambda name: release.wait(5))
+        c = self.client(session, workers=2)
+        id, future = c.log(entry('a.png', 'b.png'), wait=False)
+        uploader = c._uploader
+        threading.Timer(0.1, release.set).start()
+        c.close()
+        # The uploads in progress are finished
+        self.assertEqual(future.result(0), 1)
+        self.assertIsNone(c._uploader)
+        self.assertFalse(any(t.is_alive() for t in uploader._threads))
+
+        # Uploads start new threads after close
+        release.set()
+        self.assertEqual(c.log(entry('c.png')), 1)
+        self.assertIsNot(c._uploader, uploader)
+
+    def testCloseNoWait(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def upload(name):
+            started.set()
+            release.wait(5)
+        session = FakeOlog(upload)
+        c = self.client(session, workers=1)
+        id, future = c.log(entry('a.png', 'b.png'), wait=False)
+        started.wait(5)
+        c.close(wait=False)
+        release.set()
+        # The upload which had not started is cancelled
+        with self.assertRaises(AttachmentUploadError) as cm:
+            future.result(5)
+        (attachment, error), = cm.exception.failures
+        self.assertEqual(attachment.filename, 'b.png')
+        self.assertIsInstance(error, CancelledError)
+        self.assertEqual(session.events, ['log', 'a.png'])
+
+    def testCloseWhileSubmitting(self):
+        # close() called by another thread between two submits
+        session = FakeOlog()
+        c = self.client(session, workers=2)
+        closers = []
+
+        class Executor(ThreadPoolExecutor):
+
+            def submit(self, *args, **kwargs):
+                future = super(Executor, self).submit(*args, **kwargs)
+                if not closers:
+                    closers.append(threading.Thread(target=c.close))
+                    closers[0].start()
+                    closers[0].join(0.2)
+                return future
+
+        with mock.patch('pyOlog.OlogClient.ThreadPoolExecutor', Executor):
+            self.assertEqual(c.log(entry('a.png', 'b.png')), 1)
+        closers[0].join()
+        self.assertEqual(sorted(session.events), ['a.png', 'b.png', 'log'])
+        self.assertIsNone(c._uploader)
+
+    def testCloseUnused(self):
+        c = self.client(FakeOlog())
+        c.close()
+        c.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pyOlog.conf import Config
+
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'pyOlog.conf')
+        self.conf = Config()
+        self.conf.conf_files = [self.filename]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write(self, text, mtime):
+        with open(self.filename, 'w') as f:
+            f.write(text)
+        os.utime(self.filename, (mtime, mtime))
+
+    def testResolved(self):
+        self.write('[DEFAULT]\nusername=swilkins\nlogbooks=Operations,RF\n'
+                   'tags=pyOlog\ndefault owner=controls\n', time.time())
+        defaults = self.conf.resolved()
+        self.assertEqual(defaults.username, 'swilkins')
+        self.assertEqual(defaults.owner, 'controls')
+        self.assertEqual(defaults.logbooks, ('Operations', 'RF'))
+        self.assertEqual(defaults.tags, ('pyOlog',))
+        self.assertIs(self.conf.resolved(), defaults)
+
+    def testReload(self):
+        now = time.time()
+        self.write('[DEFAULT]\nlogbooks=Operations\n', now)
+        self.assertEqual(self.conf.resolved().logbooks, ('Operations',))
+
+        self.write('[DEFAULT]\n', now + 10)
+        # Not checked again before check_interval has passed
+        self.assertEqual(self.conf.resolved().logbooks, ('Operations',))
+        self.conf._next_check = 0
+        defaults = self.conf.resolved()
+        self.assertIsNone(defaults.logbooks)
+        self.assertEqual(defaults.tags, ())
+        self.assertIsNone(self.conf.get_value('logbooks'))
+
+    def testTimeout(self):
+        self.write('[DEFAULT]\nget_timeout=4.2, 30\nput_timeout=10\n',
+                   time.time())
+        self.assertEqual(self.conf.get_timeout('get_timeout'), (4.2, 30.0))
+        self.assertEqual(self.conf.get_timeout('put_timeout'), 10.0)
+        self.assertEqual(self.conf.get_timeout('post_timeout', None, 5), 5)
+        self.assertEqual(self.conf.get_timeout('put_timeout', (1, 2)), (1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
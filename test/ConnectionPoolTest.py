@@ -0,0 +1,191 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    ThreadingHTTPServer = None
+
+import requests
+
+from pyOlog import OlogClient, LogEntry, Logbook, Tag, Attachment
+from pyOlog.conf import Config
+
+
+class OlogHandler(BaseHTTPRequestHandler if ThreadingHTTPServer else object):
+    """Serves an empty tag list, keeping the connections open"""
+    protocol_version = 'HTTP/1.1'
+    barrier = None
+
+    def do_GET(self):
+        if self.barrier is not None:
+            self.barrier.wait()
+        body = json.dumps({'tag': []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RecordingSession(requests.Session):
+    """Session recording the timeout of every request"""
+
+    def __init__(self):
+        super(RecordingSession, self).__init__()
+        self.timeouts = []
+
+    def request(self, method, url, **kwargs):
+        self.timeouts.append((method, kwargs.get('timeout')))
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = json.dumps({'log': [{'id': 1}]}).encode()
+        return resp
+
+
+class ConfTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.conf = Config()
+        self.conf.conf_files = [os.path.join(self.path, 'pyOlog.conf')]
+        self.writeConf('')
+        patcher = mock.patch('pyOlog.OlogClient._conf', self.conf)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    url = 'http://olog'
+
+    def writeConf(self, text):
+        with open(self.conf.conf_files[0], 'w') as f:
+            f.write('[DEFAULT]\nurl={}\nhttp_cache=False\n{}'
+                    .format(self.url, text))
+
+    def client(self, **kwargs):
+        c = OlogClient(username=None, ask=False, **kwargs)
+        self.addCleanup(c.close)
+        return c
+
+
+class TestPoolSize(ConfTestCase):
+
+    def testDefault(self):
+        c = self.client()
+        adapter = c._session.get_adapter('http://olog')
+        self.assertIs(adapter, c._adapter)
+        self.assertIs(c._session.get_adapter('https://olog'), adapter)
+        self.assertEqual((adapter._pool_connections, adapter._pool_maxsize,
+                          adapter._pool_block), (10, 10, False))
+        self.assertEqual(c.pool_stats(), {'maxsize': 10, 'in_use': 0,
+                                          'max_in_use': 0, 'requests': 0,
+                                          'waits': 0, 'hosts': {}})
+        self.assertEqual(c._session.headers['Connection'], 'keep-alive')
+
+    def testConf(self):
+        self.writeConf('pool_connections=2\npool_maxsize=3\n'
+                       'pool_block=true\nkeep_alive=false\n')
+        c = self.client()
+        self.assertEqual((c._adapter._pool_connections,
+                          c._adapter._pool_maxsize, c._adapter._pool_block),
+                         (2, 3, True))
+        self.assertEqual(c.pool_stats()['maxsize'], 3)
+        self.assertEqual(c._session.headers['Connection'], 'close')
+
+    def testArguments(self):
+        self.writeConf('pool_maxsize=3\n')
+        c = self.client(pool_connections=1, pool_maxsize=5)
+        self.assertEqual((c._adapter._pool_connections,
+                          c._adapter._pool_maxsize), (1, 5))
+
+
+class TestTimeouts(ConfTestCase):
+
+    def requests(self, c):
+        c._session = RecordingSession()
+        c.createTag(Tag('beam'))
+        c._get(c.tags_resource)
+        c.log(LogEntry('text', owner='controls',
+                       logbooks=[Logbook('Operations')],
+                       attachments=[Attachment(b'data', 'scan.png')]))
+        c.delete(tagName='beam')
+        return c._session.timeouts
+
+    def testDefault(self):
+        timeout = (4.2, 30)
+        self.assertEqual(self.requests(self.client()),
+                         [('PUT', timeout), ('GET', timeout),
+                          ('POST', timeout), ('POST', timeout),
+                          ('DELETE', timeout)])
+
+    def testConf(self):
+        self.writeConf('get_timeout=1, 2\nput_timeout=3\n'
+                       'upload_timeout=60, 120\n')
+        c = self.client(timeouts={'delete': (5, 6), 'put': 7})
+        self.assertEqual(self.requests(c),
+                         [('PUT', 7), ('GET', (1.0, 2.0)),
+                          ('POST', (4.2, 30)), ('POST', (60.0, 120.0)),
+                          ('DELETE', (5, 6))])
+
+
+@unittest.skipIf(ThreadingHTTPServer is None, 'needs http.server')
+class TestPoolStats(ConfTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), OlogHandler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.host = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.url = self.host
+        super(TestPoolStats, self).setUp()
+
+    def testReused(self):
+        c = self.client()
+        for _ in range(3):
+            self.assertEqual(c.list_tags(), [])
+        stats = c.pool_stats()
+        self.assertEqual((stats['requests'], stats['in_use'],
+                          stats['max_in_use'], stats['waits']),
+                         (3, 0, 1, 0))
+        self.assertEqual(stats['hosts'], {self.host: {'connections': 1,
+                                                      'idle': 1}})
+
+    def testWaits(self):
+        # Three requests in progress at once with two pooled connections
+        OlogHandler.barrier = threading.Barrier(3, timeout=5)
+        self.addCleanup(setattr, OlogHandler, 'barrier', None)
+        c = self.client(pool_maxsize=2)
+        threads = [threading.Thread(target=c.list_tags) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = c.pool_stats()
+        self.assertEqual((stats['requests'], stats['in_use'],
+                          stats['max_in_use'], stats['waits']),
+                         (3, 0, 3, 1))
+        # The extra connection is not kept
+        self.assertEqual(stats['hosts'][self.host]['idle'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import unittest
+
+from pyOlog import LogEntry, Tag, Logbook, Property, Attachment
+
+
+class TestEquality(unittest.TestCase):
+
+    def testTag(self):
+        self.assertEqual(Tag('Timing'), Tag('Timing'))
+        self.assertNotEqual(Tag('Timing'), Tag('Timing', active=False))
+        self.assertNotEqual(Tag('Timing'), Tag('Magnets'))
+        self.assertIn(Tag('Timing'), [Tag('Magnets'), Tag('Timing')])
+        self.assertEqual(len({Tag('Timing'), Tag('Timing'), Tag('RF')}), 2)
+
+    def testLogbook(self):
+        self.assertEqual(Logbook('Operations', 'controls'),
+                         Logbook('Operations', 'controls'))
+        self.assertNotEqual(Logbook('Operations', 'controls'),
+                            Logbook('Operations', 'users'))
+        self.assertEqual(len({Logbook('Operations', 'controls'),
+                              Logbook('Operations', 'controls')}), 1)
+
+    def testProperty(self):
+        a = Property('Ticket', attributes={'Id': '1234', 'URL': 'a'})
+        b = Property('Ticket', attributes={'Id': '5678', 'URL': 'b'})
+        c = Property('Ticket', attributes={'Id': '1234'})
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, c)
+        self.assertEqual(Property('Scan'), Property('Scan'))
+
+    def testLogEntry(self):
+        logbooks = [Logbook('Operations', 'controls')]
+        a = LogEntry('a', owner='controls', logbooks=logbooks, id=1234)
+        b = LogEntry('b', owner='controls', logbooks=logbooks, id=1234)
+        c = LogEntry('a', owner='controls', logbooks=logbooks, id=1235)
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        self.assertEqual(len({a, b, c}), 2)
+
+        new = LogEntry('a', owner='controls', logbooks=logbooks)
+        self.assertEqual(new, new)
+        self.assertNotEqual(new, LogEntry('a', owner='controls',
+                                          logbooks=logbooks))
+
+    def testOtherTypes(self):
+        self.assertNotEqual(Tag('Timing'), 'Timing')
+        self.assertNotEqual(Tag('Timing'), None)
+        self.assertNotEqual(Logbook('Timing', 'controls'), Tag('Timing'))
+
+    def testSlots(self):
+        for obj in (Tag('Timing'), Logbook('Operations', 'controls'),
+                    Property('Ticket', {}), Attachment(b'', 'a.txt'),
+                    LogEntry('a', owner='controls', logbooks=[])):
+            self.assertFalse(hasattr(obj, '__dict__'))
+
+
+if __name__ == "__main__":
+    unittest.main()
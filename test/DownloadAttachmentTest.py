@@ -0,0 +1,187 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from _testOlog import FakeResponse, client
+
+DATA = b'0123456789abcdef'
+
+
+class FakeOlog(object):
+    """Session serving one attachment, with or without Range support"""
+
+    def __init__(self, data=DATA, ranges=True):
+        self.data = data
+        self.ranges = ranges
+        self.requests = []
+
+    def get(self, url, timeout=None, stream=False, headers=None, **kwargs):
+        self.requests.append(headers.get('range'))
+        if not url.endswith('/resources/attachments/1/scan.png'):
+            return FakeResponse(status_code=404)
+        start = headers.get('range')
+        if start is None or not self.ranges:
+            return FakeResponse(body=self.data)
+        start = int(start[len('bytes='):-1])
+        if start >= len(self.data):
+            return FakeResponse(status_code=416, headers={
+                'Content-Range': 'bytes */{}'.format(len(self.data))})
+        content_range = 'bytes {}-{}/{}'.format(start, len(self.data) - 1,
+                                                len(self.data))
+        return FakeResponse(status_code=206, body=self.data[start:],
+                            headers={'Content-Range': content_range})
+
+
+class TestDownloadAttachment(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.dest = os.path.join(self.path, 'scan.png')
+
+    def writePart(self, data):
+        with open(self.dest + '.part', 'wb') as f:
+            f.write(data)
+
+    def read(self):
+        self.assertFalse(os.path.exists(self.dest + '.part'))
+        with open(self.dest, 'rb') as f:
+            return f.read()
+
+    def testDownload(self):
+        session = FakeOlog()
+        c = client(session)
+        self.assertEqual(c.download_attachment(1, 'scan.png', self.path,
+                                               chunk_size=5), self.dest)
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, [None])
+
+    def testReplaceExisting(self):
+        with open(self.dest, 'wb') as f:
+            f.write(b'old')
+        c = client(FakeOlog())
+        c.download_attachment(1, 'scan.png', self.dest)
+        self.assertEqual(self.read(), DATA)
+
+    def testFileObject(self):
+        f = io.BytesIO()
+        c = client(FakeOlog())
+        self.assertIs(c.download_attachment(1, 'scan.png', f, chunk_size=3),
+                      f)
+        self.assertEqual(f.getvalue(), DATA)
+
+    def testResume(self):
+        self.writePart(DATA[:6])
+        session = FakeOlog()
+        c = client(session)
+        c.download_attachment(1, 'scan.png', self.dest)
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, ['bytes=6-'])
+
+    def testNoResume(self):
+        self.writePart(b'stale')
+        session = FakeOlog()
+        c = client(session)
+        c.download_attachment(1, 'scan.png', self.dest, resume=False)
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, [None])
+
+    def testRangeIgnored(self):
+        self.writePart(DATA[:6])
+        c = client(FakeOlog(ranges=False))
+        c.download_attachment(1, 'scan.png', self.dest)
+        self.assertEqual(self.read(), DATA)
+
+    def testPartComplete(self):
+        self.writePart(DATA)
+        session = FakeOlog()
+        c = client(session)
+        c.download_attachment(1, 'scan.png', self.dest)
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, ['bytes=16-'])
+
+    def testPartTooLong(self):
+        # Left from another version of the attachment
+        self.writePart(DATA + b'-older-version')
+        session = FakeOlog()
+        c = client(session)
+        c.download_attachment(1, 'scan.png', self.dest)
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, ['bytes=30-', None])
+
+    def testPartUnknownLength(self):
+        self.writePart(DATA)
+        session = FakeOlog()
+        get = session.get
+
+        def no_content_range(*args, **kwargs):
+            resp = get(*args, **kwargs)
+            resp.headers.pop('Content-Range', None)
+            return resp
+        session.get = no_content_range
+        c = client(session)
+        c.download_attachment(1, 'scan.png', self.dest)
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, ['bytes=16-', None])
+
+    def testMissing(self):
+        c = client(FakeOlog())
+        with self.assertRaises(requests.exceptions.HTTPError):
+            c.download_attachment(1, 'other.png', self.path)
+        self.assertFalse(os.path.exists(os.path.join(self.path,
+                                                     'other.png')))
+
+
+class TestIterAttachment(unittest.TestCase):
+
+    def testChunks(self):
+        c = client(FakeOlog())
+        chunks = list(c.iter_attachment(1, 'scan.png', chunk_size=5))
+        self.assertEqual([len(chunk) for chunk in chunks], [5, 5, 5, 1])
+        self.assertEqual(b''.join(chunks), DATA)
+
+    def testOffset(self):
+        session = FakeOlog()
+        c = client(session)
+        self.assertEqual(b''.join(c.iter_attachment(1, 'scan.png',
+                                                    chunk_size=4, offset=6)),
+                         DATA[6:])
+        self.assertEqual(session.requests, ['bytes=6-'])
+
+    def testOffsetRangeIgnored(self):
+        # The skipped bytes are downloaded and discarded
+        c = client(FakeOlog(ranges=False))
+        for offset in (0, 3, 4, 6, 16):
+            chunks = list(c.iter_attachment(1, 'scan.png', chunk_size=4,
+                                            offset=offset))
+            self.assertEqual(b''.join(chunks), DATA[offset:])
+            self.assertNotIn(b'', chunks)
+
+    def testClosed(self):
+        session = FakeOlog()
+        responses = []
+        get = session.get
+
+        def keep(*args, **kwargs):
+            responses.append(get(*args, **kwargs))
+            return responses[-1]
+        session.get = keep
+        c = client(session)
+        chunks = c.iter_attachment(1, 'scan.png', chunk_size=4)
+        next(chunks)
+        chunks.close()
+        self.assertTrue(responses[0].closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
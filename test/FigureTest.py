@@ -0,0 +1,47 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import unittest
+
+try:
+    import matplotlib
+    matplotlib.use('agg')
+    import matplotlib.pyplot as plt
+    from PIL import Image
+except ImportError:
+    plt = None
+
+from pyOlog.cli.utils import save_pyplot_figure
+
+
+@unittest.skipIf(plt is None, 'matplotlib is not installed')
+class TestSavePyplotFigure(unittest.TestCase):
+
+    def setUp(self):
+        self.fig = plt.figure(figsize=(4, 3), dpi=100)
+        plt.plot([1, 2, 3])
+
+    def tearDown(self):
+        plt.close(self.fig)
+
+    def testSingleRender(self):
+        canvas = self.fig.canvas
+        plot, thumbnail = save_pyplot_figure(dpi=100)
+        self.assertIs(self.fig.canvas, canvas)
+        self.assertEqual((plot.filename, thumbnail.filename),
+                         ('plot.png', 'thumbnail.png'))
+        self.assertEqual(Image.open(plot.file).size, (400, 300))
+        self.assertEqual(Image.open(thumbnail.file).size, (200, 150))
+
+    def testVector(self):
+        attachments = save_pyplot_figure(vector='pdf', bbox_inches='tight')
+        self.assertEqual([a.filename for a in attachments],
+                         ['plot.pdf', 'plot.png', 'thumbnail.png'])
+        self.assertTrue(attachments[0].file.read().startswith(b'%PDF'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import json
+import unittest
+from json import JSONDecoder
+from unittest import mock
+
+from pyOlog.OlogClient import _iter_json_list, LogEntryDecoder
+
+from _testOlog import FakeResponse, client
+
+
+def jsonLogEntry(id):
+    return {'id': id, 'description': 'entry [{}] "quoted"'.format(id),
+            'owner': 'controls', 'createdDate': 0, 'modifiedDate': 0,
+            'logbooks': [{'name': 'Operations', 'owner': 'controls'}],
+            'tags': [], 'properties': []}
+
+
+def decode(data, size):
+    """Decode the JSON list data read in chunks of size characters"""
+    return list(_iter_json_list(FakeResponse(body=data), size))
+
+
+class TestIterJsonList(unittest.TestCase):
+
+    def testChunkBoundaries(self):
+        entries = [jsonLogEntry(i) for i in range(20)]
+        data = json.dumps(entries)
+        for size in (1, 3, 64, len(data)):
+            self.assertEqual(decode(data, size), entries,
+                             'Failed with chunks of %d' % size)
+
+    def testStrings(self):
+        values = ['a "quoted" ]} word', 'back\\slash\\', '\\"', '',
+                  {'text': '{[\\]}"', 'nested': [[1, ['"']], {}]},
+                  [], 'unicode \u00e9\u2603']
+        data = json.dumps(values)
+        for size in (1, 2, 5):
+            self.assertEqual(decode(data, size), values)
+
+    def testDecodedOnce(self):
+        # Each element is decoded once, however many chunks it spans
+        calls = []
+
+        class CountingDecoder(JSONDecoder):
+
+            def raw_decode(self, s, *args, **kwargs):
+                calls.append(len(s))
+                return JSONDecoder.raw_decode(self, s, *args, **kwargs)
+
+        entries = [jsonLogEntry(i) for i in range(3)]
+        entries[1]['description'] = 'x' * 10000
+        with mock.patch('pyOlog.OlogClient.JSONDecoder', CountingDecoder):
+            self.assertEqual(decode(json.dumps(entries), 7), entries)
+        self.assertEqual(len(calls), 3)
+
+    def testInvalid(self):
+        self.assertRaises(ValueError, decode, '[{"id": 1}, {"id": 2,}]', 4)
+        self.assertRaises(ValueError, decode, '[1, 2x, 3]', 1)
+
+    def testScalars(self):
+        self.assertEqual(decode(' [ 12, 345 ,6 ] ', 1), [12, 345, 6])
+
+    def testEmpty(self):
+        self.assertEqual(decode('[]', 1), [])
+        self.assertEqual(decode(' [ ]', 1), [])
+
+    def testTruncated(self):
+        data = json.dumps([jsonLogEntry(1), jsonLogEntry(2)])[:-20]
+        self.assertRaises(ValueError, decode, data, 8)
+
+    def testNotAList(self):
+        self.assertRaises(ValueError, decode, '{"log": []}', 4)
+
+
+class ChunkedResponse(FakeResponse):
+    """Response counting the chunks read from it"""
+
+    def __init__(self, value, size):
+        super(ChunkedResponse, self).__init__(value)
+        self.size = size
+        self.chunks = 0
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for chunk in super(ChunkedResponse, self).iter_content(
+                self.size, decode_unicode):
+            self.chunks += 1
+            yield chunk
+
+
+class StreamingOlog(object):
+
+    def __init__(self, entries, size):
+        self.resp = ChunkedResponse(entries, size)
+        self.stream = None
+
+    def get(self, url, stream=False, **kwargs):
+        self.stream = stream
+        return self.resp
+
+
+class TestFind(unittest.TestCase):
+
+    def testIncremental(self):
+        # Each log entry is decoded as soon as its JSON has arrived
+        entries = [jsonLogEntry(i) for i in range(20)]
+        olog = StreamingOlog(entries, 64)
+        read = []
+        decode = LogEntryDecoder.dictToLogEntry
+
+        def dictToLogEntry(decoder, d):
+            read.append(olog.resp.chunks)
+            return decode(decoder, d)
+
+        with mock.patch.object(LogEntryDecoder, 'dictToLogEntry',
+                               dictToLogEntry):
+            log_entries = client(olog).find(logbook='Operations')
+        self.assertEqual([l.id for l in log_entries], list(range(20)))
+        self.assertTrue(olog.stream)
+        self.assertTrue(olog.resp.closed)
+        total = olog.resp.chunks
+        self.assertGreater(total, 20)
+        self.assertEqual(read, sorted(read))
+        self.assertLess(read[0], total / 10)
+        self.assertLess(read[10], total)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import unittest
+
+from pyOlog import LogEntry, Logbook, Tag, Property
+from pyOlog.SimpleOlogClient import SimpleOlogClient
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+class FakeSession(object):
+
+    def find(self, **kwargs):
+        return [LogEntry('first', 'controls',
+                         logbooks=[Logbook('Operations', 'controls')],
+                         tags=[Tag('RF'), Tag('Vacuum')],
+                         properties=[Property('Ticket', {'Id': '12'})],
+                         id=1, create_time=1500000000000,
+                         modify_time=None),
+                LogEntry('second', 'swilkins',
+                         logbooks=[Logbook('Commissioning', 'controls')],
+                         tags=[Tag('RF')],
+                         id=2, create_time=1500000001000,
+                         modify_time=1500000002000)]
+
+
+def client():
+    soc = SimpleOlogClient.__new__(SimpleOlogClient)
+    soc.session = FakeSession()
+    return soc
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestFindFrame(unittest.TestCase):
+
+    def testColumns(self):
+        columns = client().find_frame(dataframe=False)
+        self.assertEqual(columns['id'].dtype, np.int64)
+        self.assertEqual(list(columns['id']), [1, 2])
+        self.assertEqual(columns['create_time'][1],
+                         np.datetime64('2017-07-14T02:40:01', 'ms'))
+        self.assertTrue(np.isnat(columns['modify_time'][0]))
+        self.assertEqual(list(columns['owner']), ['controls', 'swilkins'])
+        self.assertEqual(list(columns['logbooks.Operations']), [True, False])
+        self.assertEqual(list(columns['tags.RF']), [True, True])
+        self.assertEqual(list(columns['tags.Vacuum']), [True, False])
+        self.assertEqual(list(columns['Ticket.Id']), ['12', None])
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def testDataFrame(self):
+        frame = client().find_frame()
+        self.assertEqual(len(frame), 2)
+        self.assertEqual(frame['owner'].dtype.name, 'category')
+        self.assertEqual(frame['tags.RF'].sum(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import time
+import unittest
+
+import requests
+
+from pyOlog import LogEntry, Logbook, OlogClient
+
+
+def logEntry(id, created, modified=None):
+    return LogEntry('entry {}'.format(id), 'controls',
+                    logbooks=[Logbook('Operations', 'controls')],
+                    id=id, create_time=created,
+                    modify_time=modified or created)
+
+
+class FakeOlog(object):
+    """Returns the entries created since start, and a script of changes
+    applied before each poll"""
+
+    def __init__(self, entries, changes):
+        self.entries = entries
+        self.changes = changes
+        self.starts = []
+
+    def find(self, start=None, **kwds):
+        self.starts.append(start)
+        if self.changes:
+            change = self.changes.pop(0)
+            if isinstance(change, Exception):
+                raise change
+            change(self.entries)
+        return [e for e in self.entries.values()
+                if e.create_time >= start * 1000]
+
+
+class TestFollow(unittest.TestCase):
+
+    def setUp(self):
+        self.client = OlogClient.__new__(OlogClient)
+        self.sleeps = []
+        self._sleep = time.sleep
+        time.sleep = self.sleep
+
+    def tearDown(self):
+        time.sleep = self._sleep
+
+    def sleep(self, interval):
+        self.sleeps.append(interval)
+        if len(self.sleeps) > 20:
+            raise AssertionError('follow did not yield')
+
+    def follow(self, olog, count, **kwds):
+        self.client.find = olog.find
+        generator = self.client.follow(**kwds)
+        try:
+            return [next(generator) for _ in range(count)]
+        finally:
+            generator.close()
+
+    def testSince(self):
+        def add(id, created, modified=None):
+            def change(entries):
+                entries[id] = logEntry(id, created, modified)
+            return change
+
+        olog = FakeOlog({1: logEntry(1, 1000000), 2: logEntry(2, 2000000)},
+                        [add(3, 2500000), lambda entries: None,
+                         add(4, 2600000),
+                         requests.exceptions.ConnectionError('down'),
+                         add(3, 2500000, 2700000)])
+        entries = self.follow(olog, 4, since=2000, overlap=200)
+        self.assertEqual([(e.id, e.modify_time) for e in entries],
+                         [(2, 2000000), (3, 2500000), (4, 2600000),
+                          (3, 2700000)])
+        # Each poll only asks for the entries since the newest one seen
+        self.assertEqual(olog.starts, [2000, 2300, 2300, 2400, 2400])
+        # The interval grows while nothing is found and resets after
+        self.assertEqual(self.sleeps, [1.0, 2.0, 1.0, 2.0])
+
+    def testExistingEntriesSkipped(self):
+        now = time.time() * 1000
+
+        def add(entries):
+            entries[2] = logEntry(2, now)
+
+        olog = FakeOlog({1: logEntry(1, now - 1000)},
+                        [lambda entries: None, add])
+        entries = self.follow(olog, 1)
+        self.assertEqual([e.id for e in entries], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyOlog import Tag
+from pyOlog.httpcache import HttpCache
+
+from _testOlog import FakeResponse, jsonLogEntry, client
+
+
+class FakeOlog(object):
+    """Session answering GET requests for the tags and log entries with
+    an ETag"""
+
+    def __init__(self, headers=None):
+        self.tags = ['RF']
+        self.version = 1
+        self.headers = headers or {}
+        self.requests = []
+
+    def entries(self):
+        return [jsonLogEntry(1, 'beam lost', created=0, tags=self.tags,
+                             properties=[{'name': 'Ticket',
+                                          'attributes': {'Id': '42'}}])]
+
+    def get(self, url, timeout=None, stream=False, params=None,
+            headers=None):
+        self.requests.append(headers)
+        etag = '"{}"'.format(self.version)
+        response_headers = dict(self.headers, ETag=etag)
+        if headers.get('If-None-Match') == etag:
+            return FakeResponse(status_code=304, headers=response_headers)
+        if url.endswith('/resources/logs'):
+            return FakeResponse(self.entries(), headers=response_headers)
+        return FakeResponse({'tag': [{'name': t, 'state': 'Active'}
+                                     for t in self.tags]},
+                            headers=response_headers)
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testRevalidate(self):
+        olog = FakeOlog()
+        cache = HttpCache()
+        c = client(olog, http_cache=cache)
+        first = c.list_tags()
+        self.assertEqual(first, [Tag('RF')])
+        second = c.list_tags()
+        self.assertEqual(second, first)
+        self.assertEqual(olog.requests[-1]['If-None-Match'], '"1"')
+        self.assertEqual((cache.misses, cache.revalidated), (1, 1))
+
+        olog.tags.append('Vacuum')
+        olog.version += 1
+        self.assertEqual(len(c.list_tags()), 2)
+        self.assertEqual(cache.misses, 2)
+
+    def testMaxAge(self):
+        olog = FakeOlog({'Cache-Control': 'max-age=60'})
+        c = client(olog, http_cache=HttpCache())
+        c.list_tags()
+        c.list_tags()
+        self.assertEqual(len(olog.requests), 1)
+        c._changed()
+        c.list_tags()
+        self.assertEqual(len(olog.requests), 2)
+
+    def testNoStore(self):
+        olog = FakeOlog({'Cache-Control': 'no-store'})
+        cache = HttpCache()
+        c = client(olog, http_cache=cache)
+        c.list_tags()
+        c.list_tags()
+        self.assertEqual(len(olog.requests), 2)
+        for headers in olog.requests:
+            self.assertNotIn('If-None-Match', headers)
+        self.assertEqual(len(cache), 0)
+
+    def testDisk(self):
+        path = os.path.join(self.path, 'cache.db')
+        olog = FakeOlog()
+        client(olog, http_cache=HttpCache(path=path)).list_tags()
+        cache = HttpCache(path=path)
+        self.assertEqual(client(olog, http_cache=cache).list_tags(),
+                         [Tag('RF')])
+        self.assertEqual(cache.revalidated, 1)
+
+    def testFindNotCached(self):
+        olog = FakeOlog()
+        cache = HttpCache()
+        c = client(olog, http_cache=cache)
+        for start in (0, 0, 1):
+            self.assertEqual(c.find(start=start)[0].text, 'beam lost')
+        for headers in olog.requests:
+            self.assertNotIn('If-None-Match', headers)
+        self.assertEqual(len(cache), 0)
+
+        c.list_tags()
+        self.assertEqual(len(cache), 1)
+
+    def testCallerMutation(self):
+        olog = FakeOlog()
+        cache = HttpCache()
+        c = client(olog, http_cache=cache, cache_find=True)
+        log_entry = c.find(id=1)[0]
+        log_entry.text = 'edited locally'
+        log_entry.properties[0].attributes['Id'] = '43'
+        log_entry.tags.append(Tag('Vacuum'))
+        tag = c.list_tags()[0]
+        tag.state = 'Inactive'
+
+        log_entry = c.find(id=1)[0]
+        self.assertEqual(cache.revalidated, 1)
+        self.assertEqual(log_entry.text, 'beam lost')
+        self.assertEqual(log_entry.properties[0].attributes, {'Id': '42'})
+        self.assertEqual(log_entry.tags, [Tag('RF')])
+        self.assertEqual(c.list_tags()[0].state, 'Active')
+
+    def testLru(self):
+        cache = HttpCache(maxsize=2)
+        response = FakeResponse(headers={'ETag': '"1"'})
+        for key in ('a', 'b', 'c'):
+            cache.store(key, response, key)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c').value, 'c')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+Guards against slow imports creeping back into `import pyOlog` and the
+olog command line utility.
+
+@author: shroffk
+'''
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules which must only be imported when a client is created
+HEAVY_MODULES = ['requests', 'keyring', 'six', 'aiohttp', 'sqlite3']
+
+# Cumulative import time budget in seconds
+IMPORT_BUDGET = 0.25
+
+
+def run(code):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, env.get('PYTHONPATH', '')])
+    return subprocess.check_output([sys.executable, '-X', 'importtime',
+                                    '-c', code],
+                                   stderr=subprocess.STDOUT, env=env,
+                                   cwd=ROOT).decode()
+
+
+def import_time(output, module):
+    """Cumulative import time of module in seconds from -X importtime"""
+    for line in output.splitlines():
+        m = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)$', line)
+        if m and m.group(3) == module:
+            return int(m.group(1)) * 1e-6
+    return None
+
+
+class TestImportTime(unittest.TestCase):
+
+    def checkImport(self, module):
+        code = ("import sys, {0}\n"
+                "print('loaded', sorted(m for m in {1!r} "
+                "if m in sys.modules))").format(module, HEAVY_MODULES)
+        times = []
+        for _ in range(3):
+            output = run(code)
+            self.assertIn('loaded []', output,
+                          'import {} loads heavy modules'.format(module))
+            times.append(import_time(output, module))
+        best = min(times)
+        self.assertLess(best, IMPORT_BUDGET,
+                        'import {} took {:.3f} s'.format(module, best))
+
+    def testImportPackage(self):
+        self.checkImport('pyOlog')
+
+    def testImportCli(self):
+        self.checkImport('pyOlog.cli')
+
+    def testConfigNotRead(self):
+        output = run("import pyOlog.OlogDataTypes, pyOlog.conf\n"
+                     "print('read', pyOlog.conf._conf._cf is not None)")
+        self.assertIn('read False', output)
+
+    def testLazyAttributes(self):
+        output = run("import pyOlog\n"
+                     "print('client', pyOlog.OlogClient.__name__)")
+        self.assertIn('client OlogClient', output)
+
+    def testLazyAttributesAfterSubmodules(self):
+        # Importing a submodule must not replace the class of the same name
+        check = ("import pyOlog\n"
+                 "print('classes', all(isinstance(getattr(pyOlog, n), type)\n"
+                 "      for n in ('OlogClient', 'SimpleOlogClient',\n"
+                 "                'AsyncOlogClient')))")
+        for imports in ["from pyOlog import SimpleOlogClient\n"
+                        "from pyOlog import OlogClient",
+                        "import pyOlog.OlogHandler",
+                        "from pyOlog import AsyncOlogClient\n"
+                        "from pyOlog import OlogClient",
+                        "from pyOlog.OlogClient import OlogClient\n"
+                        "import pyOlog.SimpleOlogClient"]:
+            output = run(imports + "\n" + check)
+            self.assertIn('classes True', output, imports)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import copy
+import pickle
+import unittest
+
+from pyOlog import Logbook, Tag
+from pyOlog.OlogClient import LogEntryDecoder
+from pyOlog.interning import InternTable
+
+
+def jsonLogEntry(id):
+    return {'id': id, 'description': 'entry', 'owner': 'controls',
+            'createdDate': 0, 'modifiedDate': 0,
+            'logbooks': [{'name': 'Operations', 'owner': 'controls'}],
+            'tags': [{'name': 'RF', 'state': 'Active'}],
+            'properties': []}
+
+
+class TestInternTable(unittest.TestCase):
+
+    def testShared(self):
+        decoder = LogEntryDecoder(InternTable())
+        first = decoder.dictToLogEntry(jsonLogEntry(1))
+        second = decoder.dictToLogEntry(jsonLogEntry(2))
+        self.assertIs(first.logbooks[0], second.logbooks[0])
+        self.assertIs(first.tags[0], second.tags[0])
+        self.assertEqual(first.logbooks[0], Logbook('Operations', 'controls'))
+        self.assertEqual(first.tags[0], Tag('RF'))
+        self.assertTrue(first.tags[0].active)
+
+    def testReadOnly(self):
+        table = InternTable()
+        tag = table.tag('RF', 'Active')
+        self.assertRaises(AttributeError, setattr, tag, 'state', 'Inactive')
+        self.assertRaises(AttributeError, setattr, tag, 'active', False)
+        logbook = table.logbook('Operations', 'controls')
+        self.assertRaises(AttributeError, setattr, logbook, 'owner', 'x')
+
+        mutable = copy.copy(tag)
+        mutable.active = False
+        self.assertEqual(mutable, Tag('RF', active=False))
+        self.assertIs(type(pickle.loads(pickle.dumps(logbook))), Logbook)
+
+    def testBounded(self):
+        table = InternTable(maxsize=2)
+        first = table.tag('a', 'Active')
+        table.tag('b', 'Active')
+        table.tag('c', 'Active')
+        self.assertEqual(len(table), 2)
+        self.assertIsNot(table.tag('a', 'Active'), first)
+        self.assertIs(table.tag('c', 'Active'), table.tag('c', 'Active'))
+
+
+if __name__ == "__main__":
+    unittest.main()
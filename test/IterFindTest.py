@@ -0,0 +1,98 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import unittest
+
+import requests
+
+from _testOlog import FakeResponse, jsonLogEntry, client
+
+
+class FakeOlog(object):
+    """Session answering searches for count log entries
+
+    :param paging: If False, the page parameter is ignored.
+    :param limit: If False, the limit parameter is ignored.
+    """
+
+    def __init__(self, count, paging=True, limit=True):
+        self.entries = [jsonLogEntry(id) for id in range(count)]
+        self.paging = paging
+        self.limit = limit
+        self.pages = []
+
+    def get(self, url, timeout=None, stream=False, params=None,
+            headers=None):
+        self.pages.append(params['page'])
+        if len(self.pages) > 100:
+            raise AssertionError('iter_find does not stop')
+        entries = self.entries
+        if self.limit:
+            start = 0
+            if self.paging:
+                start = (params['page'] - 1) * params['limit']
+            entries = entries[start:start + params['limit']]
+        return FakeResponse(entries)
+
+
+class TestIterFind(unittest.TestCase):
+
+    def ids(self, olog, page_size):
+        return [l.id for l in client(olog).iter_find(page_size=page_size,
+                                                     logbook='Operations')]
+
+    def testPages(self):
+        olog = FakeOlog(7)
+        self.assertEqual(self.ids(olog, 3), list(range(7)))
+        self.assertEqual(olog.pages, [1, 2, 3])
+
+    def testLastPageFull(self):
+        olog = FakeOlog(6)
+        self.assertEqual(self.ids(olog, 3), list(range(6)))
+        self.assertEqual(olog.pages, [1, 2, 3])
+
+    def testPageIgnored(self):
+        olog = FakeOlog(10, paging=False)
+        self.assertEqual(self.ids(olog, 3), [0, 1, 2])
+        self.assertEqual(olog.pages, [1, 2])
+
+    def testLimitIgnored(self):
+        olog = FakeOlog(10, paging=False, limit=False)
+        self.assertEqual(self.ids(olog, 3), list(range(10)))
+        self.assertEqual(olog.pages, [1])
+
+    def testShiftedPages(self):
+        # A log entry created while paging pushes entry 2 onto page 2
+        olog = FakeOlog(5)
+        get = olog.get
+
+        def shifting_get(url, **kwargs):
+            resp = get(url, **kwargs)
+            if len(olog.pages) == 1:
+                olog.entries.insert(0, jsonLogEntry(5))
+            return resp
+        olog.get = shifting_get
+        self.assertEqual(self.ids(olog, 3), [0, 1, 2, 3, 4])
+
+    def testError(self):
+        olog = FakeOlog(5)
+
+        def get(url, **kwargs):
+            raise requests.exceptions.HTTPError('404 Not Found')
+        olog.get = get
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.ids(olog, 3)
+
+    def testClose(self):
+        olog = FakeOlog(1000)
+        results = client(olog).iter_find(page_size=10)
+        self.assertEqual(next(results).id, 0)
+        results.close()
+        self.assertLess(len(olog.pages), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import unittest
+
+from pyOlog import LazyAttachment
+
+from _testOlog import FakeResponse, client
+
+LISTING = {'attachment': [{'filename': 'scan.png', 'fileSize': 4,
+                           'contentType': 'image/png'},
+                          {'filename': 'notes.txt', 'fileSize': 5,
+                           'contentType': 'text/plain'}]}
+FILES = {'scan.png': b'scan', 'notes.txt': b'notes'}
+
+
+class FakeOlog(object):
+    """Session serving the attachments of log entry 7"""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, timeout=None, stream=False, headers=None, **kwargs):
+        self.urls.append(url)
+        path = url[len('http://olog/resources/attachments/7'):]
+        if not path:
+            return FakeResponse(LISTING)
+        return FakeResponse(body=FILES[path[1:]])
+
+
+class TestLazyAttachment(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeOlog()
+        self.client = client(self.session)
+        self.client.attachment_cache = None
+
+    def downloads(self):
+        return [url.rsplit('/', 1)[1] for url in self.session.urls[1:]]
+
+    def testNotFetched(self):
+        attachments = self.client.list_attachments(7)
+        self.assertEqual(self.session.urls,
+                         ['http://olog/resources/attachments/7'])
+        self.assertEqual([a.filename for a in attachments],
+                         ['scan.png', 'notes.txt'])
+        for a in attachments:
+            self.assertIsInstance(a, LazyAttachment)
+            self.assertFalse(a.loaded)
+        self.assertEqual(attachments[0].mime_type, 'image/png')
+        self.assertEqual(attachments[0].metadata['fileSize'], 4)
+        self.assertEqual(attachments[0].url,
+                         'http://olog/resources/attachments/7/scan.png')
+        self.assertEqual(self.downloads(), [])
+
+    def testFetchedOnce(self):
+        scan, notes = self.client.list_attachments(7)
+        self.assertEqual(scan.file, b'scan')
+        self.assertTrue(scan.loaded)
+        self.assertFalse(notes.loaded)
+        self.assertEqual(scan.file, b'scan')
+        self.assertEqual(scan.get_file_post(),
+                         ('scan.png', b'scan', 'image/png'))
+        self.assertEqual(self.downloads(), ['scan.png'])
+
+        self.assertEqual(notes.get_file_post()[1], b'notes')
+        self.assertEqual(notes.file, b'notes')
+        self.assertEqual(self.downloads(), ['scan.png', 'notes.txt'])
+
+    def testMetadataOnly(self):
+        attachments = self.client.list_attachments(7, metadata_only=True)
+        self.assertEqual(attachments[0], {
+            'filename': 'scan.png', 'fileSize': 4, 'contentType': 'image/png',
+            'url': 'http://olog/resources/attachments/7/scan.png'})
+        self.assertEqual([a['filename'] for a in attachments],
+                         ['scan.png', 'notes.txt'])
+        self.assertEqual(self.downloads(), [])
+
+    def testFetch(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return b'data'
+        a = LazyAttachment('data.bin', fetch)
+        self.assertFalse(a.loaded)
+        self.assertEqual(a.metadata, {})
+        self.assertEqual(calls, [])
+        self.assertEqual(a.file, b'data')
+        self.assertEqual(a.file, b'data')
+        self.assertEqual(calls, [1])
+
+        # Setting the contents replaces the download
+        a = LazyAttachment('data.bin', fetch)
+        a.file = b'other'
+        self.assertTrue(a.loaded)
+        self.assertEqual(a.file, b'other')
+        self.assertEqual(calls, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
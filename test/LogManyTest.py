@@ -0,0 +1,133 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import io
+import json
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from pyOlog import LogEntry, Logbook, Attachment, LogManyError
+from pyOlog.retry import RetryPolicy
+
+from _testOlog import FakeResponse, client
+
+
+class FakeOlog(object):
+    """Session creating the posted log entries
+
+    :ivar fail: Maps the number of a log entry POST to the status it is
+                answered with, without creating the entries, or to the
+                exception raised after creating them.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.posts = []
+        self.fail = {}
+        self.uploads = []
+        self.upload_status = 200
+
+    def get(self, url, params=None, **kwargs):
+        if url.endswith('/resources/properties'):
+            return FakeResponse({'property': [
+                {'name': 'dedupe', 'attributes': {'key': ''}}]})
+        return FakeResponse(self.entries)
+
+    def post(self, url, data=None, files=None, **kwargs):
+        if '/resources/attachments/' in url:
+            self.uploads.append((int(url.rsplit('/', 1)[1]),
+                                 files['file'][0]))
+            return FakeResponse({}, self.upload_status)
+
+        entries = json.loads(data)
+        self.posts.append(len(entries))
+        failure = self.fail.get(len(self.posts))
+        if isinstance(failure, int):
+            return FakeResponse({}, failure)
+        created = [dict(e, id=len(self.entries) + n + 1, createdDate=0,
+                        modifiedDate=0) for n, e in enumerate(entries)]
+        self.entries.extend(created)
+        if failure is not None:
+            raise failure
+        return FakeResponse({'log': created})
+
+
+def entries(count, attachments=False):
+    return [LogEntry('entry {}'.format(n), owner='controls',
+                     logbooks=[Logbook('Operations', 'controls')],
+                     attachments=[Attachment(io.BytesIO(b'data'),
+                                             'data{}.txt'.format(n))]
+                     if attachments else [])
+            for n in range(count)]
+
+
+class TestLogMany(unittest.TestCase):
+
+    def client(self, olog, dedupe_property=None, spool=None):
+        return client(olog, spool=spool,
+                      retry=RetryPolicy(backoff_factor=0,
+                                        dedupe_property=dedupe_property))
+
+    def testChunks(self):
+        olog = FakeOlog()
+        ids = self.client(olog).log_many(entries(7, True), chunk_size=3)
+        self.assertEqual(ids, list(range(1, 8)))
+        self.assertEqual(olog.posts, [3, 3, 1])
+        self.assertEqual([e['description'] for e in olog.entries],
+                         ['entry {}'.format(n) for n in range(7)])
+        self.assertEqual(sorted(olog.uploads),
+                         [(n + 1, 'data{}.txt'.format(n)) for n in range(7)])
+
+    def testPartialFailure(self):
+        olog = FakeOlog()
+        olog.fail[2] = 400
+        with self.assertRaises(LogManyError) as cm:
+            self.client(olog).log_many(entries(7), chunk_size=3)
+        self.assertEqual(cm.exception.ids, [1, 2, 3])
+        self.assertIsInstance(cm.exception.error,
+                              requests.exceptions.HTTPError)
+        self.assertEqual(olog.posts, [3, 3])
+
+    def testAttachmentFailure(self):
+        olog = FakeOlog()
+        olog.upload_status = 400
+        with self.assertRaises(LogManyError) as cm:
+            self.client(olog).log_many(entries(4, True), chunk_size=2)
+        # The entries of the chunk are created, their attachments are not
+        self.assertEqual(cm.exception.ids, [1, 2])
+        self.assertEqual(len(olog.entries), 2)
+
+    def testSpooled(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        olog = FakeOlog()
+        olog.fail[2] = 503
+        c = self.client(olog, spool=path)
+        ids = c.log_many(entries(7), chunk_size=3)
+        self.assertEqual(ids, [1, 2, 3] + [None] * 4)
+        self.assertEqual(len(c.spool), 4)
+
+        # Later entries go behind the spooled ones
+        self.assertEqual(c.log_many(entries(1)), [None])
+        self.assertEqual(c.spool.flush(c), [4, 5, 6, 7, 8])
+        self.assertEqual([e['description'] for e in olog.entries],
+                         ['entry {}'.format(n) for n in range(7)]
+                         + ['entry 0'])
+
+    def testDedupe(self):
+        olog = FakeOlog()
+        olog.fail[1] = requests.exceptions.ReadTimeout('response lost')
+        c = self.client(olog, dedupe_property='dedupe')
+        self.assertEqual(c.log_many(entries(3)), [1, 2, 3])
+        self.assertEqual(olog.posts, [3])
+        self.assertEqual(len(olog.entries), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
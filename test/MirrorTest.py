@@ -0,0 +1,160 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from contextlib import closing
+
+from pyOlog import LogEntry, Logbook, Tag, Property
+from pyOlog.mirror import Mirror
+
+
+def logEntry(id, text, tag='RF', created=None, modified=None):
+    created = created or 1500000000000 + id * 1000
+    return LogEntry(text, 'controls',
+                    logbooks=[Logbook('Operations', 'controls')],
+                    tags=[Tag(tag)],
+                    properties=[Property('Ticket', {'Id': str(id)})],
+                    id=id, create_time=created,
+                    modify_time=modified or created)
+
+
+class FakeClient(object):
+
+    def __init__(self, entries):
+        self.up = True
+        self.entries = entries
+        self.searches = []
+
+    def iter_find(self, page_size=100, **kwds):
+        if not self.up:
+            raise IOError('Olog is down')
+        self.searches.append(kwds)
+        start = kwds.get('start', 0) * 1000
+        return iter([e for e in self.entries if e.create_time >= start])
+
+
+class TestMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.client = FakeClient([logEntry(1, 'Timing system reset'),
+                                  logEntry(2, 'Vacuum 50% ok', tag='Vacuum'),
+                                  logEntry(3, 'beam timing drift')])
+        self.mirror = Mirror(self.client,
+                             os.path.join(self.path, 'mirror.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def ids(self, **kwds):
+        return [e.id for e in self.mirror.query(**kwds)]
+
+    def testQuery(self):
+        self.assertEqual(self.mirror.sync(), 3)
+        self.assertEqual(self.ids(), [3, 2, 1])
+        self.assertEqual(self.ids(search='timing'), [3, 1])
+        self.assertEqual(self.ids(search='*reset'), [1])
+        self.assertEqual(self.ids(search='50%'), [2])
+        self.assertEqual(self.ids(tag='vac*'), [2])
+        self.assertEqual(self.ids(logbook='Operations', limit=2, page=2), [1])
+        self.assertEqual(self.ids(property='Ticket', id=2), [2])
+        self.assertEqual(self.ids(start=1500000002), [3, 2])
+        entry = self.mirror.query(id=1)[0]
+        self.assertEqual(entry.tags, [Tag('RF')])
+        self.assertEqual(entry.properties[0].attributes, {'Id': '1'})
+        self.assertRaises(ValueError, self.mirror.query, owner='controls')
+
+    def testIncrementalSync(self):
+        self.mirror.sync()
+        self.client.entries[2] = logEntry(3, 'beam drift fixed',
+                                          modified=1500000009000)
+        self.client.entries.append(logEntry(4, 'new entry'))
+        self.assertEqual(self.mirror.sync(), 2)
+        self.assertIn('start', self.client.searches[-1])
+        self.assertEqual(self.ids(search='fixed'), [3])
+        self.assertEqual(self.ids(search='timing'), [1])
+        self.assertEqual(len(self.mirror), 4)
+
+    def testFreshness(self):
+        self.client.up = False
+        self.assertRaises(IOError, self.mirror.find, search='timing')
+        self.client.up = True
+        self.assertEqual(len(self.mirror.find(search='timing')), 2)
+        self.mirror.find(max_age=60)
+        self.assertEqual(len(self.client.searches), 1)
+        self.client.up = False
+        # Stale results are served when the Olog is down
+        self.assertEqual(len(self.mirror.find(max_age=0, tag='RF')), 2)
+
+    def testFullSync(self):
+        self.client.entries.append(logEntry(4, 'new entry',
+                                            created=1600000000000))
+        self.mirror.find()
+        # Edited long after it was created, an incremental sync misses it
+        self.client.entries[0] = logEntry(1, 'Timing system replaced',
+                                          modified=1600000000000)
+        self.mirror.find(max_age=0)
+        self.assertIn('start', self.client.searches[-1])
+        self.assertEqual(self.ids(search='replaced'), [])
+
+        self.assertEqual(self.mirror.full_interval, 3600)
+        with closing(self.mirror._connect()) as conn, conn:
+            self.mirror._set_meta(conn, 'last_full_sync', time.time() - 3601)
+        self.mirror.find(max_age=0)
+        self.assertEqual(self.client.searches[-1], {})
+        self.assertEqual(self.ids(search='replaced'), [1])
+
+    def testDeleted(self):
+        self.mirror.sync()
+        del self.client.entries[1]
+        # An incremental sync cannot tell the entry was deleted
+        self.mirror.sync()
+        self.assertEqual(self.ids(), [3, 2, 1])
+        self.assertEqual(self.mirror.sync(full=True), 1)
+        self.assertEqual(self.ids(), [3, 1])
+        self.assertEqual(self.ids(search='Vacuum'), [])
+        self.assertEqual(self.ids(tag='Vacuum'), [])
+        self.assertEqual(self.ids(property='Ticket'), [3, 1])
+        with closing(self.mirror._connect()) as conn:
+            for table in ('entry_logbooks', 'entry_tags',
+                          'entry_properties'):
+                self.assertEqual(conn.execute(
+                    'SELECT COUNT(*) FROM {} WHERE id = 2'.format(table))
+                    .fetchone()[0], 0, table)
+            if self.mirror._fts:
+                self.assertEqual(conn.execute(
+                    'SELECT COUNT(*) FROM entries_fts').fetchone()[0], 2)
+
+        # A full sync with nothing deleted removes nothing
+        self.assertEqual(self.mirror.sync(full=True), 0)
+        self.assertEqual(len(self.mirror), 2)
+
+        # Nor does one which fails part way through
+        iter_find = self.client.iter_find
+
+        def failing(**kwds):
+            yield next(iter_find(**kwds))
+            raise IOError('connection lost')
+        self.client.iter_find = failing
+        self.assertRaises(IOError, self.mirror.sync, full=True)
+        self.assertEqual(len(self.mirror), 2)
+
+    def testNoFullSync(self):
+        mirror = Mirror(self.client, os.path.join(self.path, 'other.db'),
+                        full_interval=None)
+        mirror.find()
+        with closing(mirror._connect()) as conn, conn:
+            mirror._set_meta(conn, 'last_full_sync', 0)
+        mirror.find(max_age=0)
+        self.assertIn('start', self.client.searches[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
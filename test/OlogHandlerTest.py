@@ -0,0 +1,109 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import logging
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pyOlog.OlogHandler import OlogHandler
+
+
+class FakeClient(object):
+    """SimpleOlogClient recording the batches, which wait for release"""
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+
+    def log_many(self, entries, chunk_size=100):
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        self.batches.append([e['text'] for e in entries])
+        return list(range(len(entries)))
+
+
+class TestOlogHandler(unittest.TestCase):
+
+    def handler(self, **kwargs):
+        with mock.patch('pyOlog.OlogHandler.SimpleOlogClient', FakeClient):
+            handler = OlogHandler(logbooks=['Operations'], queued=True,
+                                  **kwargs)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.addCleanup(handler.close)
+        logger = logging.getLogger('OlogHandlerTest.{}'.format(id(handler)))
+        logger.propagate = False
+        logger.addHandler(handler)
+        return handler, logger
+
+    def texts(self, handler):
+        return [text for batch in handler.session.batches for text in batch]
+
+    def testFormattedWhenLogged(self):
+        handler, logger = self.handler(flush_interval=0.01)
+        handler.session.release.clear()
+        values = [1]
+        logger.warning('values %s', values)
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception('failed')
+        values.append(2)
+        handler.session.release.set()
+        handler.flush()
+
+        texts = self.texts(handler)
+        self.assertEqual(texts[0], 'WARNING values [1]')
+        self.assertTrue(texts[1].startswith('ERROR failed\nTraceback'))
+        self.assertIn('ZeroDivisionError', texts[1])
+
+    def testQueueFull(self):
+        handler, logger = self.handler(queue_size=1, batch_size=1)
+        handler.session.release.clear()
+        logger.warning('sent')
+        self.assertTrue(handler.session.started.wait(5))
+        logger.warning('queued')
+        logger.warning('dropped')
+        self.assertEqual(handler.dropped, 1)
+
+        handler.session.release.set()
+        handler.close()
+        self.assertEqual(self.texts(handler),
+                         ['WARNING sent', 'WARNING queued'])
+        self.assertEqual((handler.sent, handler.failed), (2, 0))
+
+    def testCloseFlushes(self):
+        handler, logger = self.handler(flush_interval=60)
+        for n in range(3):
+            logger.warning('record %d', n)
+        started = time.monotonic()
+        handler.close()
+        self.assertLess(time.monotonic() - started, 30)
+        self.assertFalse(handler._worker.is_alive())
+        self.assertEqual(self.texts(handler),
+                         ['WARNING record 0', 'WARNING record 1',
+                          'WARNING record 2'])
+        self.assertEqual(handler.sent, 3)
+
+    def testFailure(self):
+        handler, logger = self.handler(flush_interval=0.01)
+        handler.session.error = IOError('Olog is down')
+        logging.getLogger('pyOlog.OlogHandler').disabled = True
+        self.addCleanup(setattr, logging.getLogger('pyOlog.OlogHandler'),
+                        'disabled', False)
+        logger.warning('lost')
+        handler.flush()
+        self.assertEqual((handler.sent, handler.failed), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
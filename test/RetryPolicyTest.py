@@ -0,0 +1,170 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import io
+import json
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from pyOlog import LogEntry, Logbook, Attachment, StreamingAttachment
+from pyOlog.retry import RetryPolicy, RetryBudget
+
+from _testOlog import FakeResponse, httpError, client
+
+
+class FlakySession(object):
+    """Reads the body of every POST as requests would, failing the first
+    attempts with a connect timeout"""
+
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.bodies = []
+
+    def post(self, url, timeout=None, stream=False, data=None, files=None,
+             headers=None):
+        if files is not None:
+            filename, f, mime_type = files['file']
+            body = f if isinstance(f, bytes) else f.read()
+        else:
+            body = b''.join(data)
+        self.bodies.append(body)
+        if len(self.bodies) <= self.failures:
+            raise requests.exceptions.ConnectTimeout('no connection')
+        return FakeResponse()
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def testIdempotency(self):
+        policy = RetryPolicy()
+        reset = requests.exceptions.ConnectionError('reset')
+        self.assertTrue(policy.should_retry('GET', reset, 1))
+        self.assertFalse(policy.should_retry('POST', reset, 1))
+        self.assertTrue(policy.should_retry('POST', reset, 1, idempotent=True))
+        connect = requests.exceptions.ConnectTimeout('no connection')
+        self.assertTrue(policy.should_retry('POST', connect, 1))
+
+    def testStatus(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.should_retry('GET', httpError(503), 1))
+        self.assertFalse(policy.should_retry('GET', httpError(404), 1))
+        self.assertFalse(policy.should_retry('GET', ValueError(), 1))
+
+    def testMaxRetries(self):
+        policy = RetryPolicy(max_retries=2)
+        self.assertTrue(policy.should_retry('GET', httpError(503), 2))
+        self.assertFalse(policy.should_retry('GET', httpError(503), 3))
+
+    def testBackoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.backoff(n) for n in range(1, 5)],
+                         [1, 2, 4, 5])
+        policy = RetryPolicy(backoff_factor=1, jitter=True)
+        self.assertTrue(0 <= policy.backoff(3) <= 4)
+
+    def testBudget(self):
+        policy = RetryPolicy(budget=RetryBudget(ratio=0.5, minimum=1))
+        self.assertTrue(policy.should_retry('GET', httpError(503), 1))
+        self.assertFalse(policy.should_retry('GET', httpError(503), 1))
+        policy.budget.deposit()
+        policy.budget.deposit()
+        self.assertTrue(policy.should_retry('GET', httpError(503), 1))
+
+    def testCall(self):
+        policy = RetryPolicy(backoff_factor=0)
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise httpError(502)
+            return 'ok'
+
+        self.assertEqual(policy.call('GET', flaky), 'ok')
+        self.assertEqual(len(calls), 3)
+        calls[:] = []
+        self.assertRaises(requests.exceptions.HTTPError,
+                          policy.call, 'POST', flaky)
+        self.assertEqual(len(calls), 1)
+
+
+class LossyOlog(object):
+    """Session of an Olog which, while down, creates the posted log
+    entries but loses the responses and cannot be searched"""
+
+    def __init__(self):
+        self.down = True
+        self.posts = []
+        self.entries = []
+
+    def get(self, url, params=None, **kwargs):
+        if url.endswith('/resources/properties'):
+            return FakeResponse({'property': [
+                {'name': 'dedupe', 'attributes': {'key': ''}}]})
+        if self.down:
+            raise requests.exceptions.ConnectionError('unreachable')
+        return FakeResponse(self.entries)
+
+    def post(self, url, data=None, **kwargs):
+        entry = json.loads(data)[0]
+        self.posts.append(entry)
+        entry = dict(entry, id=len(self.entries) + 1, createdDate=0,
+                     modifiedDate=0)
+        self.entries.append(entry)
+        if self.down:
+            raise requests.exceptions.ReadTimeout('response lost')
+        return FakeResponse({'log': [entry]})
+
+
+class TestClientRetry(unittest.TestCase):
+
+    def client(self, session):
+        return client(session, retry=RetryPolicy(backoff_factor=0))
+
+    def testUploadRewound(self):
+        session = FlakySession(failures=2)
+        c = self.client(session)
+        f = io.BytesIO(b'header' + b'x' * 1000)
+        f.read(6)
+        c._post_attachment('/resources/attachments/1',
+                           Attachment(f, 'data.txt'))
+        self.assertEqual(len(session.bodies), 3)
+        for body in session.bodies:
+            self.assertEqual(body, b'x' * 1000)
+
+    def testStreamNotRetried(self):
+        session = FlakySession()
+        c = self.client(session)
+        attachment = StreamingAttachment(io.BytesIO(b'data'), 'data.txt')
+        self.assertRaises(requests.exceptions.ConnectTimeout,
+                          c._post_attachment, '/resources/attachments/1',
+                          attachment)
+        self.assertEqual(len(session.bodies), 1)
+
+    def testSpooledDedupeKey(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        olog = LossyOlog()
+        c = client(olog, spool=path,
+                   retry=RetryPolicy(backoff_factor=0,
+                                     dedupe_property='dedupe'))
+
+        self.assertIsNone(c.log(LogEntry('beam lost', owner='controls',
+                                         logbooks=[Logbook('Operations')])))
+        self.assertEqual(len(olog.posts), 1)
+
+        # The replay finds the entry created by the lost request
+        olog.down = False
+        self.assertEqual(c.spool.flush(c), [1])
+        self.assertEqual(len(olog.posts), 1)
+        self.assertEqual(len(c.spool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
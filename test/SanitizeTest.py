@@ -0,0 +1,54 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import string
+import unittest
+
+from pyOlog import LogEntry, Logbook
+from pyOlog import sanitize
+
+TEXT = u'Scan 12\x00\x07 th=1.5° µA\tok\r\n\x0b\x0c\x7f\x85​\ud800end'
+
+
+class TestSanitize(unittest.TestCase):
+
+    def testAscii(self):
+        expected = ''.join(c for c in TEXT if c in string.printable)
+        self.assertEqual(sanitize.ascii_strict(TEXT), expected)
+        ascii_text = ''.join(chr(i) for i in range(128))
+        self.assertEqual(sanitize.ascii_strict(ascii_text),
+                         ''.join(c for c in ascii_text
+                                 if c in string.printable))
+
+    def testUnicode(self):
+        self.assertEqual(sanitize.unicode_preserving(TEXT),
+                         TEXT.replace(u'\x00', u'').replace(u'\ud800', u''))
+
+    def testControl(self):
+        self.assertEqual(sanitize.strip_control(TEXT),
+                         u'Scan 12 th=1.5° µA\tok\r\n​\ud800end')
+        self.assertEqual(sanitize.strip_control('a\x00b\tc\x7f'), 'ab\tc')
+
+    def testLogEntry(self):
+        logbooks = [Logbook('Operations', 'controls')]
+        entry = LogEntry(u'café', owner='controls', logbooks=logbooks)
+        self.assertEqual(entry.text, 'caf')
+        entry = LogEntry(u'café', owner='controls', logbooks=logbooks,
+                         sanitize='unicode')
+        self.assertEqual(entry.text, u'café')
+        entry = LogEntry(u'café', owner='controls', logbooks=logbooks,
+                         sanitize=str.upper)
+        self.assertEqual(entry.text, u'CAFÉ')
+        self.assertRaises(ValueError, LogEntry, 'text', owner='controls',
+                          logbooks=logbooks, sanitize='nonexistent')
+
+    def testRegister(self):
+        sanitize.register('upper', str.upper)
+        self.assertIs(sanitize.get_sanitizer('upper'), str.upper)
+
+
+if __name__ == "__main__":
+    unittest.main()
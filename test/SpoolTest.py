@@ -0,0 +1,150 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import io
+import json
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from pyOlog import LogEntry, Logbook, Attachment
+from pyOlog.OlogClient import LogEntryEncoder
+from pyOlog.spool import Spool
+
+from _testOlog import httpError
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.up = True
+        self.rejected = set()
+        self.entries = []
+        self.attachments = []
+
+    def _create(self, data, since=None):
+        if not self.up:
+            raise requests.exceptions.ConnectionError('Olog is down')
+        entry = json.loads(data)[0]
+        if entry['description'] in self.rejected:
+            raise httpError(400, 'Bad request')
+        self.entries.append(entry['description'])
+        return len(self.entries)
+
+    def _post_attachments(self, id, attachments):
+        if not self.up:
+            raise requests.exceptions.ConnectionError('Olog is down')
+        for a in attachments:
+            filename, f, mime_type = a.get_file_post()
+            self.attachments.append((id, filename, f.read()))
+
+
+class TestSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def spoolEntry(self, spool, text, attachments=()):
+        log_entry = LogEntry(text, owner='controls',
+                             logbooks=[Logbook('Operations', 'controls')],
+                             attachments=list(attachments))
+        return spool.put(LogEntryEncoder().encode(log_entry),
+                         log_entry.attachments)
+
+    def testFlushInOrder(self):
+        spool = Spool(self.path)
+        self.spoolEntry(spool, 'first',
+                        [Attachment(io.BytesIO(b'data'), 'data.txt')])
+        self.spoolEntry(spool, 'second')
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(spool.status()['bytes'], 4)
+
+        client = FakeClient()
+        self.assertEqual(spool.flush(client), [1, 2])
+        self.assertEqual(client.entries, ['first', 'second'])
+        self.assertEqual(client.attachments, [(1, 'data.txt', b'data')])
+        self.assertEqual(len(spool), 0)
+
+    def testFailureKeepsEntries(self):
+        spool = Spool(self.path)
+        self.spoolEntry(spool, 'first')
+        client = FakeClient()
+        client.up = False
+        self.assertRaises(IOError, spool.flush, client)
+        self.assertEqual(len(Spool(self.path)), 1)
+        self.assertEqual(spool.status()['attempts'], 1)
+
+        client.up = True
+        self.assertEqual(spool.flush(client), [1])
+
+    def testRejectedEntrySkipped(self):
+        spool = Spool(self.path)
+        for text in ('first', 'bad', 'third'):
+            self.spoolEntry(spool, text)
+        client = FakeClient()
+        client.rejected.add('bad')
+        self.assertEqual(spool.flush(client), [1, 2])
+        self.assertEqual(client.entries, ['first', 'third'])
+        self.assertEqual(len(spool), 0)
+        status = spool.status()
+        self.assertEqual(status['entries'], 0)
+        self.assertEqual(status['failed'], 1)
+        failed = spool.failed()
+        self.assertEqual([e['seq'] for e in failed], [2])
+        self.assertEqual(failed[0]['attempts'], 1)
+        self.assertIn('HTTPError', failed[0]['last_error'])
+
+        # Failed entries are not sent again until retried
+        self.assertEqual(spool.flush(client), [])
+        client.rejected.clear()
+        self.assertEqual(spool.retry(), 1)
+        self.assertEqual(len(spool), 1)
+        self.assertEqual(spool.flush(client), [3])
+        self.assertEqual(spool.status()['failed'], 0)
+
+    def testDropFailed(self):
+        spool = Spool(self.path)
+        self.spoolEntry(spool, 'bad',
+                        [Attachment(io.BytesIO(b'data'), 'data.txt')])
+        self.spoolEntry(spool, 'worse')
+        self.spoolEntry(spool, 'pending')
+        client = FakeClient()
+        client.rejected.update(['bad', 'worse'])
+        client.up = False
+        self.assertRaises(IOError, spool.flush, client)
+        client.up = True
+        # Only the failed entries can be dropped or retried
+        self.assertEqual(spool.drop([3]), 0)
+        self.assertEqual(spool.retry([3]), 0)
+
+        spool.flush(client)
+        self.assertEqual(spool.status()['failed'], 2)
+        self.assertEqual(spool.drop([1]), 1)
+        self.assertEqual(spool.status()['attachments'], 0)
+        self.assertEqual([e['seq'] for e in spool.failed()], [2])
+        self.assertEqual(spool.drop(), 1)
+        self.assertEqual(spool.failed(), [])
+        self.assertEqual(client.entries, ['pending'])
+
+    def testAttachmentsOfCreatedEntry(self):
+        spool = Spool(self.path)
+        log_entry = LogEntry('first', owner='controls',
+                             logbooks=[Logbook('Operations', 'controls')])
+        spool.put(LogEntryEncoder().encode(log_entry),
+                  [Attachment(io.BytesIO(b'data'), 'data.txt')], log_id=42)
+        client = FakeClient()
+        self.assertEqual(spool.flush(client), [42])
+        self.assertEqual(client.entries, [])
+        self.assertEqual(client.attachments, [(42, 'data.txt', b'data')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import io
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from email.parser import BytesParser
+
+import requests
+
+from pyOlog import (LogEntry, Logbook, StreamingAttachment,
+                    AttachmentUploadError)
+from pyOlog.cli.utils import get_screenshot
+
+from _testOlog import FakeResponse, client
+
+CREATED = {'log': [{'id': 1}]}
+
+
+class FakeSession(object):
+
+    def post(self, url, timeout=None, stream=False, data=None, headers=None,
+             files=None):
+        self.data = data
+        self.headers = headers
+        self.body = b''.join(data)
+        return FakeResponse(CREATED)
+
+
+class UnreachableUploads(object):
+    """Session creating log entries, the uploads fail after reading the
+    body"""
+
+    def __init__(self, olog_up=True):
+        self.olog_up = olog_up
+        self.uploads = 0
+
+    def post(self, url, timeout=None, stream=False, data=None, headers=None,
+             files=None):
+        if url.endswith('/resources/logs'):
+            if not self.olog_up:
+                raise requests.exceptions.ConnectionError('unreachable')
+            return FakeResponse(CREATED)
+        self.uploads += 1
+        b''.join(data)
+        raise requests.exceptions.ConnectionError('connection reset')
+
+
+class TestStreamingAttachment(unittest.TestCase):
+
+    def testMultipartStream(self):
+        session = FakeSession()
+        c = client(session)
+        data = b'\x89PNG' + b'x' * 100000
+        stream = io.BufferedReader(io.BytesIO(data))
+        attachment = StreamingAttachment(stream, 'screen "1".png',
+                                         chunk_size=4096)
+        c._post_attachment('/resources/attachments/1', attachment)
+
+        # Sent as a generator, so with chunked transfer encoding
+        self.assertIsInstance(session.data, types.GeneratorType)
+        self.assertTrue(stream.closed)
+        message = BytesParser().parsebytes(
+            b'Content-Type: ' + session.headers['content-type'].encode()
+            + b'\r\n\r\n' + session.body)
+        part = message.get_payload()[0]
+        self.assertEqual(part.get_param('name', header='content-disposition'),
+                         'file')
+        self.assertEqual(part.get_filename(), 'screen %221%22.png')
+        self.assertEqual(part.get_content_type(), 'image/png')
+        self.assertEqual(part.get_payload(decode=True), data)
+
+    def spoolingClient(self, session):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        return client(session, spool=path)
+
+    def logStream(self, c, data):
+        attachment = StreamingAttachment(io.BytesIO(data), 'screen.png')
+        return c.log(LogEntry('screenshot', owner='controls',
+                              logbooks=[Logbook('Operations')],
+                              attachments=[attachment]))
+
+    def testFailedUploadNotSpooled(self):
+        session = UnreachableUploads()
+        c = self.spoolingClient(session)
+        with self.assertRaises(AttachmentUploadError) as cm:
+            self.logStream(c, b'image')
+        self.assertIsInstance(cm.exception.failures[0][1],
+                              requests.exceptions.ConnectionError)
+        self.assertEqual(session.uploads, 1)
+        self.assertEqual(len(c.spool), 0)
+
+    def testSpooledBeforeUpload(self):
+        # The stream is read into the spool when the entry is not created
+        c = self.spoolingClient(UnreachableUploads(olog_up=False))
+        self.assertIsNone(self.logStream(c, b'image'))
+        status = c.spool.status()
+        self.assertEqual((status['attachments'], status['bytes']), (1, 5))
+
+    @unittest.skipUnless(os.name == 'posix', 'needs a shell script')
+    def testScreenshotBuffered(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        command = os.path.join(path, 'import')
+        with open(command, 'w') as f:
+            f.write('#!/bin/sh\nprintf image\n')
+        os.chmod(command, 0o755)
+        self.addCleanup(os.environ.__setitem__, 'PATH', os.environ['PATH'])
+        os.environ['PATH'] = path + os.pathsep + os.environ['PATH']
+
+        attachment = get_screenshot()
+        self.assertNotIsInstance(attachment, StreamingAttachment)
+        self.assertEqual(attachment.file, b'image')
+        self.assertEqual(attachment.get_file_post()[0], 'screenshot.png')
+        attachment = get_screenshot(stream=True)
+        self.assertIsInstance(attachment, StreamingAttachment)
+        with attachment.file:
+            self.assertEqual(attachment.file.read(), b'image')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+@author: shroffk
+'''
+import unittest
+
+from pyOlog import Tag, Logbook, Property, SimpleOlogClient
+from pyOlog.vocabulary import VocabularyCache
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.tags = ['Timing', 'Magnets']
+
+    def list_logbooks(self):
+        self.calls += 1
+        return [Logbook('Operations', owner='controls')]
+
+    def list_tags(self):
+        self.calls += 1
+        return [Tag(name) for name in self.tags]
+
+    def list_properties(self):
+        self.calls += 1
+        return [Property('Ticket', attributes={'Id': ''})]
+
+
+class TestVocabularyCache(unittest.TestCase):
+
+    def testMembership(self):
+        client = FakeClient()
+        cache = VocabularyCache(client, ttl=60)
+        self.assertIn('Timing', cache.tags)
+        self.assertIn('Magnets', cache.tags)
+        self.assertNotIn('RF', cache.tags)
+        self.assertIn('Operations', cache.logbooks)
+        self.assertIn('Ticket', cache.properties)
+        self.assertEqual(client.calls, 3, 'Vocabulary fetched more than once')
+
+    def testInvalidate(self):
+        client = FakeClient()
+        cache = VocabularyCache(client, ttl=60)
+        cache.tags
+        cache.invalidate('tags')
+        cache.tags
+        self.assertEqual(client.calls, 2)
+        cache.invalidate()
+        cache.tags
+        self.assertEqual(client.calls, 3)
+
+    def testCreatedElsewhere(self):
+        client = FakeClient()
+        cache = VocabularyCache(client, ttl=60)
+        self.assertTrue(cache.contains('tags', 'Timing'))
+        self.assertFalse(cache.contains('tags', 'RF'))
+        self.assertEqual(client.calls, 2)
+
+        # Created by another client while the names are cached
+        client.tags.append('RF')
+        self.assertTrue(cache.contains('tags', 'RF'))
+        self.assertEqual(client.calls, 3)
+        self.assertTrue(cache.contains('tags', 'RF'))
+        self.assertEqual(client.calls, 3)
+
+    def testBuildEntry(self):
+        client = FakeClient()
+        soc = SimpleOlogClient(url='http://olog', username=None, ask=False,
+                               http_cache=False)
+        soc.session.vocabulary = VocabularyCache(client, ttl=60)
+        created = []
+        soc.create_tag = created.append
+        soc._build_entry('text', ['Operations'], ['Timing'], None, None,
+                         True, False)
+
+        client.tags.append('RF')
+        log_entry = soc._build_entry('text', ['Operations'], ['RF'], None,
+                                     None, True, False)
+        self.assertEqual(log_entry.tags, [Tag('RF')])
+        client.tags.append('Vacuum')
+        soc._build_entry('text', ['Operations'], ['Vacuum'], None, None,
+                         False, True)
+        self.assertEqual(created, [])
+
+    def testDisabled(self):
+        client = FakeClient()
+        cache = VocabularyCache(client, ttl=0)
+        cache.tags
+        cache.tags
+        self.assertEqual(client.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+'''
+Copyright (c) 2010 Brookhaven National Laboratory
+All rights reserved. Use is subject to license terms and conditions.
+
+Internal module
+Fakes of the Olog shared by the tests of the clients, the tests pass a
+session object answering like requests.Session to :func client:.
+
+@author: shroffk
+'''
+import json
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from pyOlog import OlogClient
+
+URL = 'http://olog'
+
+
+class FakeResponse(object):
+    """Response of a fake Olog
+
+    :param value: JSON of the body, returned by json().
+    :param status_code: HTTP status, raise_for_status raises HTTPError
+                        from 400.
+    :param headers: Response headers.
+    :param body: Body as bytes or text, by default the JSON of value.
+    """
+    encoding = 'utf-8'
+
+    def __init__(self, value=None, status_code=200, headers=None,
+                 body=None):
+        self.value = value
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        if body is None:
+            body = json.dumps(value) if value is not None else ''
+        self.body = body
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                '{} Error'.format(self.status_code), response=self)
+
+    def json(self):
+        # A new copy for every call, as requests decodes the body again
+        return json.loads(self.text)
+
+    @property
+    def text(self):
+        if isinstance(self.body, bytes):
+            return self.body.decode(self.encoding)
+        return self.body
+
+    @property
+    def content(self):
+        if isinstance(self.body, bytes):
+            return self.body
+        return self.body.encode(self.encoding)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        body = self.text if decode_unicode else self.content
+        chunk_size = chunk_size or len(body) or 1
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def httpError(status_code, text=''):
+    """HTTPError raised for a response with status_code"""
+    return requests.exceptions.HTTPError(
+        response=FakeResponse(status_code=status_code, body=text))
+
+
+def jsonLogEntry(id, text=None, created=None, modified=None, tags=(),
+                 properties=()):
+    """A log entry as sent by the Olog"""
+    created = id if created is None else created
+    return {'id': id,
+            'description': 'entry {}'.format(id) if text is None else text,
+            'owner': 'controls',
+            'createdDate': created,
+            'modifiedDate': created if modified is None else modified,
+            'logbooks': [{'name': 'Operations', 'owner': 'controls'}],
+            'tags': [{'name': t, 'state': 'Active'} for t in tags],
+            'properties': list(properties)}
+
+
+def client(session, **kwargs):
+    """OlogClient of http://olog sending its requests to session
+
+    The keyword arguments are passed to OlogClient, the http_cache is
+    off unless one is given. The background flusher of a spool is
+    stopped, the tests flush the spool themselves.
+    """
+    kwargs.setdefault('http_cache', False)
+    c = OlogClient(url=URL, username=None, ask=False, **kwargs)
+    c._session = session
+    if c._flusher is not None:
+        c._flusher.stop()
+        c._flusher.join()
+    return c